@@ -0,0 +1,375 @@
+# Pipeline Benchmark: synthetic tweet corpora, per-stage timings and regression baselines
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import peak_rss_mb
+from sentiment_engine import categorize_scores, get_backend, score_texts
+from sentiment_pipeline import CsvSink, derive_features
+from tweet_fetcher import PAGE_SIZE, v2_page_columns
+from tweet_normalizer import clean_tweets
+from tweet_records import TweetColumns
+from tweet_store import TWITTER_EPOCH_MS
+
+# ========================================================================
+# CONFIGURATION
+# ========================================================================
+
+SAMPLE_CSV = "twitter_sentiment_Tesla_20251024_212058.csv"  # Schema and text style to imitate
+BASELINE_PATH = "benchmark_baselines.json"
+BENCHMARK_SIZES = [1_000, 10_000, 100_000]  # Rows per corpus (up to 10M; generated in chunks)
+CHUNK_ROWS = 100_000        # Rows generated and pushed through the stages at a time
+REGRESSION_TOLERANCE = 0.25  # Fail when throughput drops (or peak RSS grows) by more than this
+MIN_STAGE_SECONDS = 0.1     # Stages faster than this in total are too noisy to gate on
+BENCHMARK_BRAND = "Tesla"
+
+STAGES = ['fetch', 'clean', 'score', 'categorize', 'derive', 'write']
+COMPARE_ENGINES = ["textblob", "lexicon", "vader", "onnx"]  # The first one is the agreement reference
+COMPARE_ROWS = 10_000  # Synthetic tweets scored for the throughput column
+COMPARE_REPEAT = 3     # Best-of runs per engine
+
+# ========================================================================
+# SYNTHETIC CORPUS
+# ========================================================================
+
+class CorpusModel:
+    """Token, length and metric distributions learned from the sample CSV"""
+
+    def __init__(self, path=SAMPLE_CSV):
+        sample = pd.read_csv(path)
+        tokens = pd.Series(sample['text'].astype(str).str.split().explode().dropna().tolist())
+        is_url = tokens.str.startswith('http')
+        is_mention = tokens.str.startswith('@')
+        is_hashtag = tokens.str.startswith('#')
+        is_word = ~(is_url | is_mention | is_hashtag)
+
+        self.words = tokens[is_word].to_numpy(dtype=object)
+        self.hashtags = tokens[is_hashtag].to_numpy(dtype=object)
+        self.kind_probs = np.array([is_word.mean(), is_mention.mean(),
+                                    is_hashtag.mean(), is_url.mean()])
+        self.lengths = sample['text'].astype(str).str.split().str.len().to_numpy()
+        self.metrics = sample[['retweet_count', 'reply_count', 'like_count', 'quote_count']].to_numpy()
+        self.followers = sample['user_followers'].to_numpy()
+        self.verified = sample['user_verified'].to_numpy(dtype=bool)
+        self.languages = sample['language'].to_numpy(dtype=object)
+        self.newest = pd.Timestamp(sample['created_at'].max())
+
+def _stub_page(tweets, users):
+    """Object shaped like a tweepy search_recent_tweets response (the stubbed client)"""
+    return SimpleNamespace(data=tweets, includes={'users': users})
+
+def synthetic_pages(n, model, seed=0, chunk_rows=CHUNK_ROWS, page_size=PAGE_SIZE):
+    """
+    Yield chunks of stub API pages for `n` synthetic tweets, as
+    (rows, [page, ...]) with at most `chunk_rows` rows per chunk.
+    Same seed, same corpus.
+    """
+    rng = np.random.default_rng(seed)
+    n_users = max(100, n // 20)
+    usernames = np.array([f"user{k}" for k in range(n_users)], dtype=object)
+    user_followers = rng.choice(model.followers, n_users)
+    user_verified = rng.choice(model.verified, n_users)
+    urls = np.array([f"https://t.co/{k:010x}" for k in rng.integers(0, 16**10, 5000)], dtype=object)
+    newest_ms = int(model.newest.timestamp() * 1000)
+    window_ms = 7 * 24 * 3600 * 1000
+
+    done = 0
+    while done < n:
+        rows = min(chunk_rows, n - done)
+        lengths = rng.choice(model.lengths, rows)
+        kinds = rng.choice(4, lengths.sum(), p=model.kind_probs)
+        tokens = np.empty(len(kinds), dtype=object)
+        for kind, pool in enumerate([model.words, '@' + usernames, model.hashtags, urls]):
+            where = kinds == kind
+            tokens[where] = pool[rng.integers(0, len(pool), where.sum())]
+        ends = np.cumsum(lengths)
+        texts = [' '.join(tokens[end - length:end]) for end, length in zip(ends, lengths)]
+
+        authors = rng.zipf(1.5, rows) % n_users
+        created_ms = np.sort(newest_ms - rng.integers(0, window_ms, rows))
+        ids = ((created_ms - TWITTER_EPOCH_MS) << 22) + np.arange(done, done + rows) % (1 << 22)
+        metrics = model.metrics[rng.integers(0, len(model.metrics), rows)]
+        languages = rng.choice(model.languages, rows)
+
+        pages = []
+        for start in range(0, rows, page_size):
+            tweets, users = [], {}
+            for i in range(start, min(start + page_size, rows)):
+                author = int(authors[i])
+                tweets.append(SimpleNamespace(
+                    id=int(ids[i]), author_id=author, text=texts[i], lang=languages[i],
+                    created_at=pd.Timestamp(int(created_ms[i]), unit='ms', tz='UTC'),
+                    public_metrics={'retweet_count': int(metrics[i, 0]), 'reply_count': int(metrics[i, 1]),
+                                    'like_count': int(metrics[i, 2]), 'quote_count': int(metrics[i, 3])}
+                ))
+                users[author] = SimpleNamespace(
+                    id=author, username=usernames[author], name=usernames[author].title(),
+                    verified=bool(user_verified[author]),
+                    public_metrics={'followers_count': int(user_followers[author])}
+                )
+            pages.append(_stub_page(tweets, list(users.values())))
+        yield rows, pages
+        done += rows
+
+# ========================================================================
+# STAGES
+# ========================================================================
+
+def run_stages(pages, engine, csv_path, timer):
+    """Push one chunk of stub pages through every pipeline stage, timing each"""
+    with timer('fetch'):
+        columns = TweetColumns()
+        for page in pages:
+            columns.extend(v2_page_columns(page))
+        raw = columns.to_frame()
+    with timer('clean'):
+        cleaned_text = clean_tweets(raw['text'])
+    with timer('score'):
+        polarity, subjectivity = score_texts(cleaned_text.tolist(), engine)
+    with timer('categorize'):
+        category = categorize_scores(polarity, engine)
+    scores = pd.DataFrame({'sentiment_score': polarity, 'sentiment_subjectivity': subjectivity,
+                           'sentiment_category': category}, index=raw.index)
+    with timer('derive'):
+        df = derive_features(raw, cleaned_text, scores, BENCHMARK_BRAND)
+    with timer('write'):
+        CsvSink(csv_path).write(df)
+
+class StageTimer:
+    """Accumulates wall time (and optionally traced allocation peaks) per stage"""
+
+    def __init__(self, trace=False):
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+        self.peak_bytes = dict.fromkeys(STAGES, 0)
+        self.trace = trace
+        self._stage = None
+
+    def __call__(self, stage):
+        self._stage = stage
+        return self
+
+    def __enter__(self):
+        if self.trace:
+            tracemalloc.reset_peak()
+            self._base = tracemalloc.get_traced_memory()[0]
+        self._start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.seconds[self._stage] += time.perf_counter() - self._start
+        if self.trace:
+            peak = tracemalloc.get_traced_memory()[1] - self._base
+            self.peak_bytes[self._stage] = max(self.peak_bytes[self._stage], peak)
+
+# ========================================================================
+# BENCHMARK
+# ========================================================================
+
+def benchmark_size(n, model, engine="textblob", trace_allocations=False, seed=0):
+    """Time every stage over an `n`-row synthetic corpus; returns a result dict"""
+    timer = StageTimer()
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "benchmark.csv")
+        first_chunk = None
+        for rows, pages in synthetic_pages(n, model, seed):
+            run_stages(pages, engine, csv_path, timer)
+            if first_chunk is None:
+                first_chunk = (rows, pages)
+
+        # Allocations are traced on a separate pass so tracing overhead stays out of the timings
+        allocations = None
+        if trace_allocations:
+            rows, pages = first_chunk
+            tracer = StageTimer(trace=True)
+            tracemalloc.start()
+            try:
+                run_stages(pages, engine, os.path.join(tmp, "traced.csv"), tracer)
+            finally:
+                tracemalloc.stop()
+            allocations = {stage: tracer.peak_bytes[stage] / rows for stage in STAGES}
+
+    return {
+        'rows': n,
+        'engine': engine,
+        'seconds': timer.seconds,
+        'rows_per_sec': {stage: n / s if s else float('inf') for stage, s in timer.seconds.items()},
+        'peak_rss_mb': peak_rss_mb(),
+        'alloc_bytes_per_row': allocations,
+    }
+
+def _baseline_key(result):
+    return f"{result['engine']}/{result['rows']}"
+
+def check_regressions(results, baselines, tolerance=REGRESSION_TOLERANCE):
+    """List of human-readable regressions against the stored baselines"""
+    failures = []
+    for result in results:
+        baseline = baselines.get(_baseline_key(result))
+        if baseline is None:
+            continue
+        for stage, expected in baseline['rows_per_sec'].items():
+            if result['seconds'].get(stage, 0.0) < MIN_STAGE_SECONDS:
+                continue
+            actual = result['rows_per_sec'][stage]
+            if actual < expected * (1 - tolerance):
+                failures.append(f"{_baseline_key(result)} {stage}: "
+                                f"{actual:,.0f} rows/s < baseline {expected:,.0f} rows/s")
+        expected_rss, actual_rss = baseline.get('peak_rss_mb'), result['peak_rss_mb']
+        if expected_rss and actual_rss and actual_rss > expected_rss * (1 + tolerance):
+            failures.append(f"{_baseline_key(result)} peak RSS: "
+                            f"{actual_rss:,.0f} MB > baseline {expected_rss:,.0f} MB")
+    return failures
+
+def print_result(result):
+    rss = result['peak_rss_mb']
+    print(f"\n{result['rows']:,} rows ({result['engine']}), peak RSS "
+          f"{f'{rss:,.0f} MB' if rss is not None else 'n/a'}")
+    for stage in STAGES:
+        line = (f"  {stage:10s} {result['seconds'][stage]:9.3f} s "
+                f"{result['rows_per_sec'][stage]:14,.0f} rows/s")
+        if result['alloc_bytes_per_row']:
+            line += f" {result['alloc_bytes_per_row'][stage]:10,.0f} B/row peak alloc"
+        print(line)
+
+# ========================================================================
+# ENGINE COMPARISON
+# ========================================================================
+
+def compare_engines(engines, model, rows=COMPARE_ROWS, repeat=COMPARE_REPEAT, sample_path=SAMPLE_CSV):
+    """
+    Side-by-side engine results: load time, best-of-`repeat` scoring
+    throughput on `rows` synthetic tweets, and on the sample CSV the
+    category agreement and polarity correlation with the first engine plus
+    agreement with the categories stored in the CSV. Engines whose
+    dependencies are missing are reported instead of failing the run.
+    """
+    sample = pd.read_csv(sample_path)
+    sample_texts = clean_tweets(sample['text'].astype(str)).tolist()
+    stored = sample['sentiment_category'].to_numpy(dtype=object)
+    columns = TweetColumns()
+    for _, pages in synthetic_pages(rows, model):
+        for page in pages:
+            columns.extend(v2_page_columns(page))
+    texts = clean_tweets(columns.to_frame()['text']).tolist()
+
+    results, reference = [], None
+    for engine in engines:
+        start = time.perf_counter()
+        try:
+            get_backend(engine).load()
+        except (ImportError, OSError, LookupError) as e:
+            results.append({'engine': engine, 'error': str(e).splitlines()[0]})
+            continue
+        load_seconds = time.perf_counter() - start
+
+        seconds = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            score_texts(texts, engine)
+            seconds = min(seconds, time.perf_counter() - start)
+
+        polarity, _ = score_texts(sample_texts, engine)
+        categories = np.asarray(categorize_scores(polarity, engine))
+        if reference is None:
+            reference = (engine, polarity, categories)
+        result = {
+            'engine': engine,
+            'load_seconds': load_seconds,
+            'rows_per_sec': len(texts) / seconds if seconds else float('inf'),
+            'agreement': float(np.mean(categories == reference[2])),
+            'correlation': float(np.corrcoef(polarity, reference[1])[0, 1]) if np.std(polarity) else float('nan'),
+            'stored_agreement': float(np.mean(categories == stored)),
+            'distribution': {c: float(np.mean(categories == c)) for c in ("Positive", "Neutral", "Negative")},
+        }
+        results.append(result)
+    return (reference[0] if reference else None), results
+
+def print_comparison(reference, results, rows):
+    print(f"\nEngines: throughput on {rows:,} synthetic tweets, agreement on {SAMPLE_CSV} "
+          f"(vs {reference} and vs the stored categories)")
+    print(f"  {'engine':10s} {'load s':>7s} {'rows/s':>10s} {'agree':>7s} {'corr':>6s} "
+          f"{'stored':>7s}   pos/neu/neg")
+    for r in results:
+        if 'error' in r:
+            print(f"  {r['engine']:10s} unavailable: {r['error']}")
+            continue
+        mix = '/'.join(f"{r['distribution'][c]:.0%}" for c in ("Positive", "Neutral", "Negative"))
+        print(f"  {r['engine']:10s} {r['load_seconds']:7.2f} {r['rows_per_sec']:10,.0f} "
+              f"{r['agreement']:7.0%} {r['correlation']:6.2f} {r['stored_agreement']:7.0%}   {mix}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the sentiment pipeline offline")
+    parser.add_argument('sizes', nargs='*', type=int, default=BENCHMARK_SIZES,
+                        help="corpus sizes in rows (default: %(default)s)")
+    parser.add_argument('--engine', default="textblob", help="sentiment engine to score with")
+    parser.add_argument('--trace-allocations', action='store_true',
+                        help="also trace per-stage allocation peaks with tracemalloc")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="baseline JSON file")
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="store these results as the new baseline instead of checking")
+    parser.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE)
+    parser.add_argument('--compare-engines', nargs='*', metavar='ENGINE',
+                        help=f"compare engines side by side instead (default: {' '.join(COMPARE_ENGINES)})")
+    parser.add_argument('--compare-rows', type=int, default=COMPARE_ROWS,
+                        help="synthetic tweets scored per engine for the throughput column")
+    args = parser.parse_args(argv)
+
+    model = CorpusModel()
+    if args.compare_engines is not None:
+        reference, results = compare_engines(args.compare_engines or COMPARE_ENGINES, model, args.compare_rows)
+        print_comparison(reference, results, args.compare_rows)
+        return 0
+
+    if not args.save_baseline and not os.path.exists(args.baseline):
+        # Without a baseline the regression gate would pass without checking anything
+        print(f"No baseline at {args.baseline}: record one on this machine with --save-baseline "
+              f"before using the benchmark as a regression gate.", file=sys.stderr)
+        return 2
+
+    results = []
+    for n in sorted(args.sizes):  # ascending, so the process-wide RSS peak belongs to this size
+        result = benchmark_size(n, model, args.engine, args.trace_allocations)
+        print_result(result)
+        results.append(result)
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baselines = json.load(f)
+
+    if args.save_baseline:
+        for result in results:
+            baselines[_baseline_key(result)] = {
+                'rows_per_sec': result['rows_per_sec'], 'peak_rss_mb': result['peak_rss_mb']
+            }
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baselines, f, indent=2)
+        print(f"\nSaved baseline to: {args.baseline}")
+        return 0
+
+    unchecked = [_baseline_key(result) for result in results if _baseline_key(result) not in baselines]
+    if unchecked:
+        print(f"\nWarning: {args.baseline} has no baseline for {', '.join(unchecked)} "
+              f"(add one with --save-baseline)", file=sys.stderr)
+    if len(unchecked) == len(results):
+        return 2
+
+    failures = check_regressions(results, baselines, args.tolerance)
+    if failures:
+        print("\nRegressions:")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print("\nNo regressions against the stored baseline.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
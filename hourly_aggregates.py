@@ -0,0 +1,174 @@
+# Incremental Per-brand, Per-hour Sentiment Aggregates (the dashboard summary table)
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from near_duplicates import duplicate_weights
+from tweet_schema import time_columns
+from tweet_store import CountedRanges
+
+# ========================================================================
+# CONFIGURATION
+# ========================================================================
+
+KEY_COLUMNS = ['brand', 'hour_start']
+# Additive columns: a bucket's totals are the sum of the totals of its parts
+SUM_COLUMNS = [
+    'tweets', 'positive', 'neutral', 'negative',
+    'score_sum', 'score_sq_sum', 'engagement', 'weighted_score_sum', 'engagement_weight',
+]
+ROLLING_WINDOW = "24h"  # Window of the rolling_* columns in the summary table
+
+# ========================================================================
+# AGGREGATION
+# ========================================================================
+
+def aggregate_hourly(df, weights=None):
+    """
+    Per-brand, per-hour additive totals for a batch of scored tweets.
+
+    weighted_score_sum weights each tweet by engagement + 1 (summed in
+    engagement_weight), so tweets with no engagement still count once and
+    the weighted mean is always defined. Optional per-row `weights` (e.g.
+    duplicate_weights) scale every tweet's contribution except engagement.
+    """
+    created_at = pd.to_datetime(df['created_at'], utc=True)
+    score = df['sentiment_score'].astype(float).to_numpy()
+    engagement = df['engagement'].astype('int64').to_numpy()
+    category = df['sentiment_category'].astype(str).to_numpy()
+    weight = np.ones(len(df), dtype='int64') if weights is None else np.asarray(weights)
+    parts = pd.DataFrame({
+        'brand': df['brand'].astype(str).to_numpy(),
+        'hour_start': created_at.dt.floor('h').to_numpy(),
+        'tweets': weight,
+        'positive': weight * (category == "Positive"),
+        'neutral': weight * (category == "Neutral"),
+        'negative': weight * (category == "Negative"),
+        'score_sum': weight * score,
+        'score_sq_sum': weight * score * score,
+        'engagement': engagement,
+        'weighted_score_sum': weight * score * (engagement + 1),
+        'engagement_weight': weight * (engagement + 1),
+        'max_tweet_id': df['tweet_id'].astype('int64').to_numpy(),
+    })
+    totals = {column: 'sum' for column in SUM_COLUMNS}
+    totals['max_tweet_id'] = 'max'
+    return parts.groupby(KEY_COLUMNS, sort=False).agg(totals)
+
+def counted_ranges_path(path):
+    """Sidecar file holding the tweet-ID ranges already counted into the CSV at `path`"""
+    return f"{os.path.splitext(path)[0]}_counted.json"
+
+class HourlyAggregates:
+    """
+    Running per-brand, per-hour totals, optionally persisted as a CSV.
+
+    Used as a pipeline sink: write() folds in each scored batch and close()
+    saves. Only tweets outside the tweet-ID ranges already counted are
+    aggregated (see CountedRanges), so re-fetched tweets are never counted
+    twice, a refresh that fills a gap still counts the older tweets, and the
+    cost grows with the new rows, not with the history.
+    """
+
+    def __init__(self, path=None, downweight_duplicates=False):
+        self.path = path
+        self.downweight_duplicates = downweight_duplicates
+        self.table = aggregate_hourly(pd.DataFrame(columns=[
+            'brand', 'created_at', 'sentiment_score', 'engagement', 'sentiment_category', 'tweet_id'
+        ]))
+        self.counted = CountedRanges()
+        if path and os.path.exists(path):
+            stored = pd.read_csv(path, usecols=KEY_COLUMNS + SUM_COLUMNS + ['max_tweet_id'])
+            stored['hour_start'] = pd.to_datetime(stored['hour_start'], utc=True)
+            self.table = stored.set_index(KEY_COLUMNS)
+            if os.path.exists(counted_ranges_path(path)):
+                with open(counted_ranges_path(path), encoding='utf-8') as f:
+                    self.counted = CountedRanges(json.load(f))
+            else:
+                # Written before the ranges were kept: everything up to the newest tweet was counted
+                self.counted = CountedRanges.up_to(self.watermarks().to_dict())
+
+    def watermarks(self):
+        """Newest counted tweet_id per brand"""
+        return self.table['max_tweet_id'].groupby(level='brand').max()
+
+    def update(self, df, weights=None):
+        """Fold newly scored tweets into the totals; returns the number of tweets counted"""
+        if df.empty:
+            return 0
+        new = self.counted.take(df['brand'].astype(str), df['tweet_id'].astype('int64'))
+        if not new.any():
+            return 0
+
+        parts = aggregate_hourly(df[new], None if weights is None else np.asarray(weights)[new])
+        existing = parts.index.isin(self.table.index)
+        if existing.any():
+            # Fractional weights turn the integer totals into floats
+            widened = {column: parts[column].dtype for column in SUM_COLUMNS
+                       if parts[column].dtype != self.table[column].dtype and parts[column].dtype.kind == 'f'}
+            if widened:
+                self.table = self.table.astype(widened)
+            keys = parts.index[existing]
+            self.table.loc[keys, SUM_COLUMNS] += parts.loc[existing, SUM_COLUMNS].to_numpy()
+            self.table.loc[keys, 'max_tweet_id'] = np.maximum(
+                self.table.loc[keys, 'max_tweet_id'].to_numpy(),
+                parts.loc[existing, 'max_tweet_id'].to_numpy()
+            )
+        if not existing.all():
+            self.table = pd.concat([self.table, parts[~existing]])
+        return int(new.sum())
+
+    def write(self, df):
+        """Sink interface: fold in one scored batch"""
+        self.update(df, duplicate_weights(df) if self.downweight_duplicates else None)
+
+    def close(self):
+        """Sink interface: record the ranges counted this run and save"""
+        self.counted.commit()
+        if self.path:
+            self.save()
+
+    def summary(self, window=ROLLING_WINDOW):
+        """The dashboard table: totals plus means, spread and rolling-window columns"""
+        table = self.table.reset_index().sort_values(KEY_COLUMNS, ignore_index=True)
+        table['hour_start'] = pd.to_datetime(table['hour_start'], utc=True)  # object when still empty
+        tweets = table['tweets'].astype(float)
+        mean = table['score_sum'] / tweets
+        # Same date / hour / day_of_week dtypes as the dataset
+        table[['date', 'hour', 'day_of_week']] = time_columns(table['hour_start'])
+        table['mean_score'] = mean
+        table['score_std'] = np.sqrt((table['score_sq_sum'] / tweets - mean ** 2).clip(lower=0))
+        table['engagement_weighted_score'] = table['weighted_score_sum'] / table['engagement_weight']
+
+        if not table.empty:
+            rolling = (table.set_index('hour_start')
+                       .groupby('brand', sort=False)[['tweets', 'score_sum']]
+                       .rolling(window).sum())
+            table[f'rolling_tweets_{window}'] = rolling['tweets'].to_numpy()
+            table[f'rolling_mean_score_{window}'] = (rolling['score_sum'] / rolling['tweets']).to_numpy()
+        return table
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        self.table.reset_index().to_csv(tmp_path, index=False)
+        os.replace(tmp_path, self.path)
+        tmp_path = f"{counted_ranges_path(self.path)}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.counted.to_dict(), f)
+        os.replace(tmp_path, counted_ranges_path(self.path))
+
+def update_hourly_aggregates(path, df, downweight_duplicates=False):
+    """
+    Load the stored totals, fold in `df`, save them, and return the summary
+    table. With downweight_duplicates each near-duplicate cluster counts as
+    one tweet, in the hour of its representative (needs dup_rank from a dedup run).
+    The scripts add HourlyAggregates to their sinks instead, so only the
+    tweets fetched by a run are aggregated.
+    """
+    aggregates = HourlyAggregates(path, downweight_duplicates)
+    aggregates.write(df)
+    aggregates.close()
+    return aggregates.summary()
@@ -0,0 +1,349 @@
+# Influence Ranking: bounded top-k heaps over tweets and an array-backed author table
+#
+# Answers "most influential negative voices this hour" from heaps of at most
+# TOP_K entries, so a query costs the same however large the corpus grows.
+
+import heapq
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from tweet_store import CountedRanges
+
+# ========================================================================
+# CONFIGURATION
+# ========================================================================
+
+TOP_K = 20  # Entries kept per ranking
+FOLLOWER_WEIGHT = 0.5  # Weight of log(followers) relative to log(engagement) in reach
+VERIFIED_BOOST = 1.25  # Reach multiplier for verified authors
+RETAIN_HOURS = 7 * 24  # Hourly tweet rankings kept, counted back from the newest hour
+CATEGORIES = ("All", "Positive", "Neutral", "Negative")
+
+TWEET_FIELDS = [
+    'tweet_id', 'created_at', 'brand', 'username', 'text', 'sentiment_score',
+    'sentiment_category', 'engagement', 'user_followers', 'user_verified', 'influence',
+]
+
+# ========================================================================
+# SCORING
+# ========================================================================
+
+def influence_scores(df):
+    """
+    Reach (log engagement + FOLLOWER_WEIGHT * log followers, boosted for
+    verified authors) times the magnitude of the sentiment score.
+    """
+    reach = (np.log1p(df['engagement'].to_numpy(dtype=float)) +
+             FOLLOWER_WEIGHT * np.log1p(df['user_followers'].to_numpy(dtype=float)))
+    reach = np.where(df['user_verified'].to_numpy(dtype=bool), reach * VERIFIED_BOOST, reach)
+    return reach * np.abs(df['sentiment_score'].to_numpy(dtype=float))
+
+# ========================================================================
+# TOP-K STRUCTURES
+# ========================================================================
+
+class TopK:
+    """The k largest (score, item) pairs seen, in a min-heap of at most k entries"""
+
+    def __init__(self, k=TOP_K):
+        self.k = k
+        self.heap = []
+        self._seq = 0  # tie-breaker, so items themselves are never compared
+
+    def push(self, score, item):
+        entry = (score, self._seq, item)
+        self._seq += 1
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, entry)
+        elif score > self.heap[0][0]:
+            heapq.heapreplace(self.heap, entry)
+
+    def items(self):
+        """(score, item) pairs, highest score first"""
+        return [(score, item) for score, _, item in sorted(self.heap, reverse=True)]
+
+class RisingTopK:
+    """
+    The k highest-scoring keys when scores only ever increase (running sums
+    of non-negative values). A key in the top k can only move up, so the
+    set stays exact; superseded heap entries are skipped lazily.
+    """
+
+    def __init__(self, k=TOP_K):
+        self.k = k
+        self.heap = []
+        self.members = {}  # key -> current score
+
+    def _prune(self):
+        while self.heap and self.members.get(self.heap[0][1]) != self.heap[0][0]:
+            heapq.heappop(self.heap)
+
+    def update(self, key, score):
+        if key in self.members:
+            self.members[key] = score
+            heapq.heappush(self.heap, (score, key))
+            if len(self.heap) > 4 * self.k:
+                self.heap = [(s, k) for k, s in self.members.items()]
+                heapq.heapify(self.heap)
+            return
+        if len(self.members) >= self.k:
+            self._prune()
+            if score <= self.heap[0][0]:
+                return
+            _, evicted = heapq.heappop(self.heap)
+            del self.members[evicted]
+        self.members[key] = score
+        heapq.heappush(self.heap, (score, key))
+
+    def items(self):
+        """(score, key) pairs, highest score first"""
+        return sorted(((s, k) for k, s in self.members.items()), reverse=True)
+
+# ========================================================================
+# AUTHOR TABLE
+# ========================================================================
+
+class AuthorTable:
+    """Per-(brand, username) running totals in NumPy columns that grow by doubling"""
+
+    DTYPES = {
+        'tweets': 'int64', 'engagement': 'int64', 'user_followers': 'int64',
+        'user_verified': 'bool', 'score_sum': 'float64', 'negative': 'int64',
+        'positive': 'int64', 'influence': 'float64', 'negative_influence': 'float64',
+        'positive_influence': 'float64',
+    }
+    # Latest value wins for these; every other column is summed
+    LATEST = ('user_followers', 'user_verified')
+
+    def __init__(self, capacity=1024):
+        self.index = {}  # (brand, username) -> row
+        self.keys = []
+        self.columns = {name: np.zeros(capacity, dtype) for name, dtype in self.DTYPES.items()}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _rows(self, keys):
+        rows = np.empty(len(keys), dtype=np.int64)
+        for i, key in enumerate(keys):
+            row = self.index.get(key)
+            if row is None:
+                row = self.index[key] = len(self.keys)
+                self.keys.append(key)
+            rows[i] = row
+        capacity = len(next(iter(self.columns.values())))
+        if len(self.keys) > capacity:
+            while capacity < len(self.keys):
+                capacity *= 2
+            for name, values in self.columns.items():
+                grown = np.zeros(capacity, values.dtype)
+                grown[:len(values)] = values
+                self.columns[name] = grown
+        return rows
+
+    def add(self, df, influence):
+        """Fold a batch in; returns the touched rows"""
+        category = df['sentiment_category'].astype(str).to_numpy()
+        batch = pd.DataFrame({
+            'brand': df['brand'].astype(str).to_numpy(),
+            'username': df['username'].astype(str).to_numpy(),
+            'tweets': 1,
+            'engagement': df['engagement'].to_numpy(dtype='int64'),
+            'user_followers': df['user_followers'].to_numpy(dtype='int64'),
+            'user_verified': df['user_verified'].to_numpy(dtype=bool),
+            'score_sum': df['sentiment_score'].to_numpy(dtype=float),
+            'negative': (category == "Negative").astype('int64'),
+            'positive': (category == "Positive").astype('int64'),
+            'influence': influence,
+            'negative_influence': np.where(category == "Negative", influence, 0.0),
+            'positive_influence': np.where(category == "Positive", influence, 0.0),
+        })
+        totals = {name: ('last' if name in self.LATEST else 'sum') for name in self.DTYPES}
+        grouped = batch.groupby(['brand', 'username'], sort=False).agg(totals)
+        rows = self._rows(grouped.index.tolist())
+        for name in self.DTYPES:
+            values = grouped[name].to_numpy()
+            if name in self.LATEST:
+                self.columns[name][rows] = values
+            else:
+                self.columns[name][rows] += values
+        return rows
+
+    def frame(self, rows=None):
+        rows = np.arange(len(self.keys)) if rows is None else np.asarray(rows, dtype=np.int64)
+        keys = [self.keys[row] for row in rows]
+        df = pd.DataFrame({
+            'brand': [brand for brand, _ in keys],
+            'username': [username for _, username in keys],
+        })
+        for name, values in self.columns.items():
+            df[name] = values[rows]
+        df['mean_score'] = df['score_sum'] / df['tweets']
+        return df
+
+# ========================================================================
+# INDEX
+# ========================================================================
+
+class InfluenceIndex:
+    """
+    Top-k tweets per (brand, category, hour) and top-k authors per
+    (brand, category), updated batch by batch.
+
+    Usable as a pipeline sink (write/close); with a `path` the index is
+    pickled on close and reloaded by `InfluenceIndex.load`. Tweets inside the
+    tweet-ID ranges indexed by earlier runs (or already indexed in this one)
+    are skipped, so re-fetched tweets are never counted twice while older
+    tweets filling a gap still are; batches may arrive in any order.
+    """
+
+    def __init__(self, k=TOP_K, path=None):
+        self.k = k
+        self.path = path
+        self.authors = AuthorTable()
+        self.author_rankings = {}  # (brand, category) -> RisingTopK of author rows
+        self.tweet_rankings = {}   # (brand, category, hour_start) -> TopK of tweet records
+        self.counted = CountedRanges()  # tweet-ID ranges indexed, per brand
+        self.newest_hour = None
+
+    @classmethod
+    def load(cls, path, k=TOP_K):
+        if path and os.path.exists(path):
+            with open(path, 'rb') as f:
+                index = pickle.load(f)
+            index.path = path
+            return index
+        return cls(k, path)
+
+    def update(self, df):
+        """Index a batch of scored tweets; returns the number of tweets added"""
+        if df.empty:
+            return 0
+        df = df[self.counted.take(df['brand'].astype(str), df['tweet_id'].astype('int64'))]
+        if df.empty:
+            return 0
+
+        influence = influence_scores(df)
+        self._rank_authors(self.authors.add(df, influence))
+        self._rank_tweets(df, influence)
+        return len(df)
+
+    write = update
+
+    def _rank_authors(self, rows):
+        columns = self.authors.columns
+        for row in rows.tolist():
+            brand = self.authors.keys[row][0]
+            for category, column in (("All", 'influence'), ("Negative", 'negative_influence'),
+                                     ("Positive", 'positive_influence')):
+                score = float(columns[column][row])
+                if score > 0:
+                    ranking = self.author_rankings.setdefault((brand, category), RisingTopK(self.k))
+                    ranking.update(row, score)
+
+    def _rank_tweets(self, df, influence):
+        hours = pd.to_datetime(df['created_at'], utc=True).dt.floor('h')
+        candidates = pd.DataFrame({
+            'brand': df['brand'].astype(str).to_numpy(),
+            'hour_start': hours.to_numpy(),
+            'sentiment_category': df['sentiment_category'].astype(str).to_numpy(),
+            'influence': influence,
+        }).sort_values('influence', ascending=False)
+        # Only the k best of each group can enter its heap, so only those become records
+        groups = [['brand', 'hour_start'], ['brand', 'hour_start', 'sentiment_category']]
+        tops = [candidates.groupby(keys, sort=False).head(self.k).index.to_numpy() for keys in groups]
+        positions = np.union1d(*tops)
+        selected = df.iloc[positions].assign(influence=influence[positions])
+        records = dict(zip(positions.tolist(), zip(*(selected[f].tolist() for f in TWEET_FIELDS))))
+
+        for top, by_category in zip(tops, (False, True)):
+            rows = candidates.loc[top]
+            categories = rows['sentiment_category'].tolist() if by_category else ["All"] * len(rows)
+            for position, brand, hour, category in zip(top.tolist(), rows['brand'].tolist(),
+                                                       rows['hour_start'].tolist(), categories):
+                ranking = self.tweet_rankings.get((brand, category, hour))
+                if ranking is None:
+                    ranking = self.tweet_rankings[(brand, category, hour)] = TopK(self.k)
+                record = records[position]
+                ranking.push(record[-1], record)
+
+        newest = hours.max()
+        if self.newest_hour is None or newest > self.newest_hour:
+            self.newest_hour = newest
+            oldest = newest - pd.Timedelta(hours=RETAIN_HOURS)
+            self.tweet_rankings = {key: ranking for key, ranking in self.tweet_rankings.items()
+                                   if key[2] >= oldest}
+
+    def close(self):
+        """Commit this run's tweet-ID ranges and save the index (if it has a path)"""
+        self.counted.commit()
+        if self.path:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['path'] = None
+        return state
+
+    def __setstate__(self, state):
+        if 'watermarks' in state:
+            # Pickled before ranges were kept: everything up to each brand's newest tweet was indexed
+            state['counted'] = CountedRanges.up_to(state.pop('watermarks'))
+            state.pop('run_ids', None)
+            state.pop('run_newest', None)
+        self.__dict__.update(state)
+
+    # --------------------------------------------------------------------
+    # QUERIES (each touches at most k entries)
+    # --------------------------------------------------------------------
+
+    def top_tweets(self, brand, category="All", hour=None):
+        """Most influential tweets of one hour (default: the newest hour indexed)"""
+        hour = self.newest_hour if hour is None else pd.Timestamp(hour).floor('h')
+        ranking = self.tweet_rankings.get((brand, category, hour))
+        records = [record for _, record in ranking.items()] if ranking else []
+        return pd.DataFrame(records, columns=TWEET_FIELDS)
+
+    def top_voices(self, brand, category="Negative", hour=None):
+        """Distinct authors of the most influential tweets of one hour"""
+        tweets = self.top_tweets(brand, category, hour)
+        return (tweets.groupby('username', sort=False)
+                .agg(tweets=('tweet_id', 'size'), influence=('influence', 'sum'),
+                     user_followers=('user_followers', 'last'), user_verified=('user_verified', 'last'))
+                .sort_values('influence', ascending=False).reset_index())
+
+    def top_authors(self, brand, category="All"):
+        """Authors with the highest accumulated influence (overall, Negative or Positive)"""
+        ranking = self.author_rankings.get((brand, category))
+        rows = [row for _, row in ranking.items()] if ranking else []
+        return self.authors.frame(rows)
+
+    # --------------------------------------------------------------------
+    # POWER BI TABLES
+    # --------------------------------------------------------------------
+
+    def tweets_table(self):
+        """Every hourly ranking, flattened, with a 1-based `rank` column"""
+        rows = []
+        for (brand, category, hour), ranking in self.tweet_rankings.items():
+            for rank, (_, record) in enumerate(ranking.items(), 1):
+                rows.append((category, hour, rank) + record)
+        return pd.DataFrame(rows, columns=['ranking', 'hour_start', 'rank'] + TWEET_FIELDS)
+
+    def authors_table(self):
+        """Every author ranking, flattened, with a 1-based `rank` column"""
+        frames = []
+        for (brand, category), ranking in self.author_rankings.items():
+            frame = self.authors.frame([row for _, row in ranking.items()])
+            frame.insert(0, 'ranking', category)
+            frame.insert(1, 'rank', np.arange(1, len(frame) + 1))
+            frames.append(frame)
+        if not frames:
+            return pd.DataFrame(columns=['ranking', 'rank'] + list(self.authors.frame([]).columns))
+        return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,255 @@
+# Pipeline Instrumentation: per-stage timings, JSON/Prometheus metrics and profiling hooks
+
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ========================================================================
+# CONFIGURATION
+# ========================================================================
+
+METRIC_PREFIX = "tweet_sentiment"
+PROFILE_TOP_N = 25  # Functions / allocation sites shown in profile reports
+PROFILE_MODES = (None, "cprofile", "tracemalloc")
+
+# ========================================================================
+# MEMORY
+# ========================================================================
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def current_rss():
+    """Resident set size of this process in bytes, or None where it can't be read cheaply"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far (None where unavailable)"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+# ========================================================================
+# METRICS
+# ========================================================================
+
+class StageStats:
+    """Totals for one pipeline stage across all the batches of a run"""
+
+    __slots__ = ('seconds', 'calls', 'rows', 'memory_delta', 'extra')
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.calls = 0
+        self.rows = 0
+        self.memory_delta = 0   # bytes of RSS growth while inside the stage
+        self.extra = {}         # stage-specific values, e.g. rate-limit waits
+
+    def as_dict(self):
+        return {'seconds': round(self.seconds, 6), 'calls': self.calls, 'rows': self.rows,
+                'rows_per_sec': round(self.rows / self.seconds, 1) if self.seconds else None,
+                'memory_delta_bytes': self.memory_delta, **self.extra}
+
+class _StageTimer:
+    def __init__(self, stats, rows):
+        self.stats = stats
+        self.rows = rows
+
+    def __enter__(self):
+        self.rss = current_rss()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        stats = self.stats
+        stats.seconds += time.perf_counter() - self.start
+        stats.calls += 1
+        stats.rows += self.rows
+        if self.rss is not None:
+            stats.memory_delta += current_rss() - self.rss
+
+class PipelineMetrics:
+    """
+    Wall time, rows, calls and memory delta per stage for one run.
+
+    Use `with metrics.stage('score', rows=len(batch)):` around each piece of
+    work; `rows` can also be set on the returned timer once it is known.
+    """
+
+    def __init__(self, run_name):
+        self.run_name = run_name
+        self.started = datetime.now(timezone.utc)
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def _stats(self, name):
+        stats = self.stages.get(name)
+        if stats is None:
+            with self._lock:
+                stats = self.stages.setdefault(name, StageStats())
+        return stats
+
+    def stage(self, name, rows=0):
+        return _StageTimer(self._stats(name), rows)
+
+    def record(self, name, **values):
+        """Attach stage-specific values (overwrites values of the same name)"""
+        self._stats(name).extra.update(values)
+
+    def as_dict(self):
+        return {
+            'run': self.run_name,
+            'started': self.started.isoformat(),
+            'total_seconds': round(sum(s.seconds for s in self.stages.values()), 6),
+            'stages': {name: stats.as_dict() for name, stats in self.stages.items()},
+        }
+
+    def summary(self):
+        """Human-readable per-stage table for the debug log"""
+        lines = [f"{'stage':10s} {'seconds':>9s} {'rows':>9s} {'rows/s':>11s} {'mem delta':>11s}"]
+        for name, stats in self.stages.items():
+            rate = f"{stats.rows / stats.seconds:,.0f}" if stats.seconds and stats.rows else "-"
+            lines.append(f"{name:10s} {stats.seconds:9.3f} {stats.rows:9,d} {rate:>11s} "
+                         f"{stats.memory_delta / 2**20:9.1f}MB")
+            for key, value in stats.extra.items():
+                lines.append(f"  {key}: {value}")
+        return "\n".join(lines)
+
+    def write_json(self, path):
+        """Append this run as one JSON line"""
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(self.as_dict()) + "\n")
+
+    def prometheus_text(self):
+        """Metrics in the Prometheus text exposition format"""
+        lines = []
+        stages = list(self.stages.items())  # may be scraped from another thread mid-run
+        fields = [('seconds', 'seconds', "Wall time spent in the stage"),
+                  ('rows', 'rows', "Rows processed by the stage"),
+                  ('calls', 'calls', "Times the stage ran"),
+                  ('memory_delta_bytes', 'memory_delta', "RSS growth while in the stage")]
+        for metric, attr, help_text in fields:
+            name = f"{METRIC_PREFIX}_stage_{metric}"
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+            for stage, stats in stages:
+                lines.append(f'{name}{{run="{self.run_name}",stage="{stage}"}} {getattr(stats, attr)}')
+        for stage, stats in stages:
+            for key, value in list(stats.extra.items()):
+                if isinstance(value, (int, float)):
+                    lines.append(f'{METRIC_PREFIX}_{key}{{run="{self.run_name}",stage="{stage}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Write a node_exporter textfile-collector file (atomically)"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+class _NullStage:
+    rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+class NullMetrics:
+    """Stand-in used when instrumentation is off: every call is a no-op"""
+
+    _stage = _NullStage()
+
+    def stage(self, name, rows=0):
+        return self._stage
+
+    def record(self, name, **values):
+        pass
+
+NULL_METRICS = NullMetrics()
+
+# ========================================================================
+# PROMETHEUS ENDPOINT
+# ========================================================================
+
+def start_metrics_server(metrics, port, host="127.0.0.1"):
+    """Serve metrics.prometheus_text() at http://host:port/metrics from a daemon thread"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.prometheus_text().encode('utf-8')
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# ========================================================================
+# PROFILING
+# ========================================================================
+
+@contextmanager
+def profiled(mode, output_prefix="pipeline_profile", report=print):
+    """
+    Run the enclosed block under cProfile or tracemalloc (mode=None: no-op).
+    cProfile stats are saved to `<output_prefix>.prof` for snakeviz/pstats.
+    """
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Unknown profile mode: {mode!r} (expected one of {PROFILE_MODES})")
+    if mode is None:
+        yield
+        return
+
+    if mode == "cprofile":
+        import cProfile
+        import io
+        import pstats
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(f"{output_prefix}.prof")
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_TOP_N)
+            report(out.getvalue())
+            report(f"Saved profile to: {output_prefix}.prof")
+    else:
+        import tracemalloc
+        tracemalloc.start()
+        try:
+            yield
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            report(f"tracemalloc: current {current / 2**20:.1f} MB, peak {peak / 2**20:.1f} MB")
+            for stat in snapshot.statistics("lineno")[:PROFILE_TOP_N]:
+                report(f"  {stat}")
@@ -0,0 +1,219 @@
+# Mock Twitter API: replay recorded v2 responses from a local HTTP server (offline runs and tests)
+#
+#   python mock_twitter_api.py tests/fixtures/search_recent_tesla.json --port 8000
+#
+# then set API_BASE_URL = "http://localhost:8000" in a script. Recorded pages
+# are served by pagination token, and the server keeps its own rate-limit
+# window so the fetcher's budget handling runs exactly as against the API.
+# With --stream FILE it also serves the ndjson lines of FILE on the filtered
+# stream (one connection, closed at the end of the file):
+#
+#   python mock_twitter_api.py tests/fixtures/search_recent_tesla.json --stream tweets.ndjson
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# ========================================================================
+# CONFIGURATION
+# ========================================================================
+
+REQUESTS_PER_WINDOW = 450  # Recent search quota per window (app auth)
+WINDOW_SECONDS = 900       # Rate-limit window length
+
+STREAM_PATH = "/2/tweets/search/stream"
+RULES_PATH = "/2/tweets/search/stream/rules"
+
+# ========================================================================
+# RECORDINGS
+# ========================================================================
+
+def load_recordings(path):
+    """
+    Read recorded responses: {"responses": [{"path", "pagination_token",
+    "status", "body"}, ...]}. The first page of a search has a null token.
+    """
+    with open(path, encoding='utf-8') as f:
+        responses = json.load(f)['responses']
+    return {(r['path'], r.get('pagination_token')): (r.get('status', 200), r['body']) for r in responses}
+
+# ========================================================================
+# SERVER
+# ========================================================================
+
+class MockTwitterAPI:
+    """
+    Serve recorded responses on host:port from a daemon thread (port 0 picks
+    a free port; see `url`). Each endpoint gets `requests_per_window` calls
+    per window with x-rate-limit-* headers; once spent it answers 429 until
+    the window resets. `requests` lists the (path, params) received.
+
+    `streams` scripts the filtered stream, one entry per connection: an
+    iterable of ndjson lines is sent and the connection closed, an int is
+    answered as that HTTP status. Once they run out it answers 404. Stream
+    rules added by POST are kept in `rules`.
+    """
+
+    def __init__(self, recordings, requests_per_window=REQUESTS_PER_WINDOW,
+                 window_seconds=WINDOW_SECONDS, host="127.0.0.1", port=0, clock=time.time,
+                 streams=()):
+        self.recordings = load_recordings(recordings) if isinstance(recordings, str) else recordings
+        self.streams = list(streams)
+        self.rules = []
+        self.requests_per_window = requests_per_window
+        self.window_seconds = window_seconds
+        self.clock = clock
+        self.requests = []
+        self._windows = {}     # path -> (remaining, reset_epoch)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self.url = f"http://{host}:{self._server.server_address[1]}"
+        self._thread = None
+
+    def _rate_limit(self, path):
+        """Spend one call of this path's window: (allowed, remaining, reset)"""
+        with self._lock:
+            now = self.clock()
+            remaining, reset = self._windows.get(path, (self.requests_per_window, None))
+            if reset is None or now >= reset:
+                remaining, reset = self.requests_per_window, int(now) + self.window_seconds
+            allowed = remaining > 0
+            if allowed:
+                remaining -= 1
+            self._windows[path] = (remaining, reset)
+            return allowed, remaining, reset
+
+    def respond(self, path, params):
+        """(status, headers, body) for one GET request"""
+        self.requests.append((path, params))
+        allowed, remaining, reset = self._rate_limit(path)
+        headers = {
+            'x-rate-limit-limit': str(self.requests_per_window),
+            'x-rate-limit-remaining': str(remaining),
+            'x-rate-limit-reset': str(reset),
+        }
+        if not allowed:
+            return 429, headers, {'title': 'Too Many Requests', 'detail': 'Too Many Requests', 'status': 429}
+        if path == RULES_PATH:
+            return 200, headers, {'data': self.rules, 'meta': {'result_count': len(self.rules)}}
+        if path == STREAM_PATH:
+            return self._stream_connection(headers)
+        token = params.get('pagination_token', params.get('next_token'))
+        if (path, token) not in self.recordings:
+            return 404, headers, {'title': 'Not Found', 'detail': f"No recorded response for {path} token={token}"}
+        status, body = self.recordings[(path, token)]
+        return status, headers, body
+
+    def _stream_connection(self, headers):
+        """(status, headers, body) for the next scripted stream connection; body is the lines on a 200"""
+        with self._lock:
+            connection = self.streams.pop(0) if self.streams else None
+        if connection is None:
+            return 404, headers, {'title': 'Not Found', 'detail': "No more scripted stream connections"}
+        if isinstance(connection, int):
+            return connection, headers, {'title': 'Stream Error', 'detail': f"Scripted {connection}",
+                                         'status': connection}
+        return 200, headers, connection
+
+    def add_rules(self, body):
+        """Response body for a POST to the stream rules endpoint"""
+        with self._lock:
+            added = [{'id': str(len(self.rules) + i + 1), 'value': rule['value']}
+                     for i, rule in enumerate(body.get('add', []))]
+            self.rules.extend(added)
+        return {'data': added, 'meta': {'summary': {'created': len(added)}}}
+
+    def _handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlsplit(self.path)
+                params = {key: values[0] for key, values in parse_qs(url.query).items()}
+                status, headers, body = api.respond(url.path, params)
+                if url.path == STREAM_PATH and status == 200:
+                    self.send_stream(headers, body)
+                else:
+                    self.send_json(status, headers, body)
+
+            def do_POST(self):
+                url = urlsplit(self.path)
+                if url.path != RULES_PATH:
+                    self.send_json(404, {}, {'title': 'Not Found', 'detail': f"No POST endpoint {url.path}"})
+                    return
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                api.requests.append((url.path, body))
+                self.send_json(201, {}, api.add_rules(body))
+
+            def send_json(self, status, headers, body):
+                payload = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def send_stream(self, headers, lines):
+                # No Content-Length: the client reads lines until the connection closes
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                try:
+                    for line in lines:
+                        self.wfile.write(line.encode('utf-8') + b'\r\n')
+                        self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client went away mid-stream
+                self.close_connection = True
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve recorded Twitter API v2 responses locally")
+    parser.add_argument('recordings', help="JSON file of recorded responses")
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--requests-per-window', type=int, default=REQUESTS_PER_WINDOW)
+    parser.add_argument('--window-seconds', type=int, default=WINDOW_SECONDS)
+    parser.add_argument('--stream', help="ndjson file to serve once on the filtered stream")
+    args = parser.parse_args(argv)
+    streams = []
+    if args.stream:
+        with open(args.stream, encoding='utf-8') as f:
+            streams.append(f.read().splitlines())
+    api = MockTwitterAPI(args.recordings, args.requests_per_window, args.window_seconds, args.host, args.port,
+                         streams=streams)
+    print(f"Serving {len(api.recordings)} recorded responses at {api.url} (Ctrl+C to stop)")
+    try:
+        api._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+# Near-duplicate Collapsing: MinHash signatures and an LSH index over cleaned tweets
+#
+# Bot and giveaway posts that differ only in a word or two are grouped into
+# one cluster; only the first tweet of each cluster (its representative) is
+# scored and the rest copy its score. A word or two can flip the sentiment
+# ("...it is great" / "...it is terrible"), so tweets only share a cluster
+# when their sentiment-bearing words and exclamation marks are the same, in
+# the same order.
+
+import re
+import string
+
+import numpy as np
+import pandas as pd
+
+from sentiment_engine import sentiment_words
+from tweet_schema import DUPLICATE_SCHEMA
+
+# ========================================================================
+# CONFIGURATION
+# ========================================================================
+
+SHINGLE_SIZE = 3  # Words per shingle (shorter tweets use the whole text as one shingle)
+NUM_PERMUTATIONS = 64  # MinHash signature length
+LSH_BANDS = 16  # 16 bands x 4 rows: pairs above ~0.5 Jaccard usually share a bucket
+SIMILARITY_THRESHOLD = 0.8  # Estimated Jaccard similarity needed to join a cluster
+_WORD = re.compile(r"\w+(?:'\w+)*")  # shingles ignore punctuation: "fast!" == "fast"
+
+# ========================================================================
+# MINHASH
+# ========================================================================
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Word `size`-grams of a cleaned tweet (lower-cased, punctuation dropped)"""
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        return [' '.join(words)] if words else []
+    return [' '.join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+class MinHasher:
+    """MinHash signatures from multiply-shift hashes of 64-bit shingle hashes"""
+
+    def __init__(self, num_perm=NUM_PERMUTATIONS, seed=1):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, 2**63, num_perm, dtype=np.uint64) | np.uint64(1)
+        self.b = rng.integers(0, 2**63, num_perm, dtype=np.uint64)
+        self.num_perm = num_perm
+
+    def signatures(self, texts):
+        """
+        (len(texts), num_perm) uint32 signatures and a mask of texts that had
+        any shingles (empty texts get an all-zero row and must not be matched).
+        """
+        grams = [shingles(text) for text in texts]
+        counts = np.fromiter((len(g) for g in grams), dtype=np.int64, count=len(grams))
+        has_shingles = counts > 0
+        sigs = np.zeros((len(grams), self.num_perm), dtype=np.uint32)
+        if not has_shingles.any():
+            return sigs, has_shingles
+
+        flat = np.array([gram for g in grams for gram in g], dtype=object)
+        hashes = pd.util.hash_array(flat)
+        # Products wrap around in uint64; the high 32 bits are the permuted hash
+        permuted = ((hashes[:, None] * self.a + self.b) >> np.uint64(32)).astype(np.uint32)
+        starts = np.concatenate(([0], np.cumsum(counts[has_shingles])[:-1]))
+        sigs[has_shingles] = np.minimum.reduceat(permuted, starts, axis=0)
+        return sigs, has_shingles
+
+# ========================================================================
+# LSH INDEX
+# ========================================================================
+
+class NearDuplicateIndex:
+    """
+    Assigns every tweet of a run to a near-duplicate cluster.
+
+    Each representative's signature is split into LSH_BANDS bands; a new
+    tweet is compared only with the representatives it shares a band with,
+    so assignment stays roughly linear in the number of tweets. The index
+    persists across batches, as do the representatives' scores.
+    """
+
+    def __init__(self, threshold=SIMILARITY_THRESHOLD, num_perm=NUM_PERMUTATIONS,
+                 bands=LSH_BANDS, seed=1, sentiment_vocabulary=None):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.hasher = MinHasher(num_perm, seed)
+        self.threshold = threshold
+        self.bands = bands
+        # One random multiplier per signature position folds each band into a single key
+        rng = np.random.default_rng(seed + 1)
+        self.band_mix = rng.integers(1, 2**63, num_perm, dtype=np.uint64).reshape(bands, -1)
+        self.sentiment_vocabulary = sentiment_vocabulary  # loaded on first use
+        self.buckets = {}     # (band, band key) -> cluster_ids
+        self.signatures = {}  # cluster_id -> representative signature
+        self.keys = {}        # cluster_id -> representative's sentiment-bearing words
+        self.sizes = {}       # cluster_id -> tweets assigned so far
+        self.scores = {}      # cluster_id -> representative's score columns
+        self.tweets = 0
+
+    def sentiment_key(self, text):
+        """
+        The tokens of a text that move its score, in order: sentiment-bearing
+        words (emoticons and negations included) and runs of "!", which boost
+        the preceding word ("great" and "great!!!" score differently).
+        """
+        if self.sentiment_vocabulary is None:
+            self.sentiment_vocabulary = sentiment_words()
+        vocabulary = self.sentiment_vocabulary
+        key = []
+        for token in text.lower().split():
+            word = token if token in vocabulary else token.strip(string.punctuation)
+            if word in vocabulary or word.endswith("n't"):
+                key.append(word)
+            if token not in vocabulary and '!' in token:
+                key.append('!' * token.count('!'))
+        return tuple(key)
+
+    def _band_keys(self, sigs):
+        rows = sigs.reshape(len(sigs), self.bands, -1).astype(np.uint64)
+        return (rows * self.band_mix).sum(axis=2, dtype=np.uint64).tolist()
+
+    def assign(self, tweet_ids, texts):
+        """
+        Cluster a batch of cleaned texts. Returns a DataFrame aligned to `texts`
+        with cluster_id (the representative's tweet_id), dup_rank (the tweet's
+        position in its cluster, in arrival order; 0 = representative) and a
+        `representative` flag marking the rows that still need scoring.
+        """
+        texts = pd.Series(texts).fillna('')
+        sigs, has_shingles = self.hasher.signatures(texts.tolist())
+        band_keys = self._band_keys(sigs)
+        cluster_ids, dup_ranks = [], []
+        for tweet_id, text, sig, keys, matchable in zip(tweet_ids, texts, sigs, band_keys, has_shingles):
+            cluster = None
+            if matchable:
+                sentiment = self.sentiment_key(text)
+                checked = set()
+                for band, key in enumerate(keys):
+                    for candidate in self.buckets.get((band, key), ()):
+                        if candidate in checked:
+                            continue
+                        checked.add(candidate)
+                        if (np.count_nonzero(self.signatures[candidate] == sig) >= self.threshold * len(sig)
+                                and self.keys[candidate] == sentiment):
+                            cluster = candidate
+                            break
+                    if cluster is not None:
+                        break
+            if cluster is None:
+                cluster = tweet_id
+                self.sizes[cluster] = 0
+                if matchable:
+                    self.signatures[cluster] = sig
+                    self.keys[cluster] = sentiment
+                    for band, key in enumerate(keys):
+                        self.buckets.setdefault((band, key), []).append(cluster)
+            cluster_ids.append(cluster)
+            dup_ranks.append(self.sizes[cluster])
+            self.sizes[cluster] += 1
+        self.tweets += len(cluster_ids)
+
+        dup_ranks = np.array(dup_ranks, dtype=np.int64)
+        clusters = pd.DataFrame({
+            'cluster_id': cluster_ids,
+            'dup_rank': dup_ranks,
+        }, index=texts.index).astype(DUPLICATE_SCHEMA)
+        clusters['representative'] = dup_ranks == 0
+        return clusters
+
+    def fill_scores(self, clusters, scores):
+        """Remember the representatives' scores and copy them to every row of `clusters`"""
+        representatives = clusters.loc[clusters['representative'], 'cluster_id']
+        for cluster, row in zip(representatives, scores.itertuples(index=False)):
+            self.scores[cluster] = tuple(row)
+        rows = [self.scores[cluster] for cluster in clusters['cluster_id']]
+        filled = pd.DataFrame(rows, columns=scores.columns, index=clusters.index)
+        return filled.astype(scores.dtypes.to_dict())
+
+    def summary(self):
+        collapsed = self.tweets - len(self.sizes)
+        share = collapsed / self.tweets * 100 if self.tweets else 0.0
+        return (f"Near-duplicates: {collapsed} of {self.tweets} tweets ({share:.1f}%) "
+                f"collapsed into {len(self.sizes)} clusters")
+
+# ========================================================================
+# WEIGHTS
+# ========================================================================
+
+def duplicate_weights(df):
+    """
+    1 for each cluster's representative (dup_rank 0) and for rows without a
+    rank, 0 for the other members, so every near-duplicate cluster counts as
+    one tweet in weighted aggregates. Each row's weight is fixed when it is
+    scored, so updates within one run count a cluster once. The index is not
+    kept between runs: a cluster whose tweets arrive over several refreshes
+    counts once per refresh.
+    """
+    if 'dup_rank' not in df.columns:
+        return pd.Series(1, index=df.index, dtype='int64')
+    rank = df['dup_rank']
+    return (rank.isna() | (rank == 0)).astype('int64')
@@ -0,0 +1,183 @@
+# Partitioned Parquet Store: brand/date partitions with compact column dtypes
+
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+from tweet_schema import apply_schema, empty_dataset
+
+# ========================================================================
+# CONFIGURATION
+# ========================================================================
+
+PARTITION_COLUMNS = ['brand', 'date']
+PARTITION_FILE = "part-0.parquet"  # One file per partition, merged in place on append
+
+# Dtypes applied before writing (and after reading back); anything not listed keeps its dtype
+COMPACT_DTYPES = {
+    'hour': 'int8',
+    'day_of_week': 'category',
+    'brand': 'category',
+    'sentiment_category': 'category',
+    'retweet_count': 'int32',
+    'reply_count': 'int32',
+    'like_count': 'int32',
+    'quote_count': 'int32',
+    'engagement': 'int32',
+    'user_followers': 'int32',
+    'user_verified': 'bool',
+    'language': 'category',
+}
+
+# ========================================================================
+# DTYPES
+# ========================================================================
+
+def compact_dtypes(df):
+    """Cast the output columns to small ints and categoricals (returns a new DataFrame)"""
+    df = df.astype({col: dtype for col, dtype in COMPACT_DTYPES.items() if col in df.columns})
+    if 'tweet_id' in df.columns:
+        df['tweet_id'] = df['tweet_id'].astype(str)
+    if 'created_at' in df.columns:
+        created_at = pd.to_datetime(df['created_at'])
+        if created_at.dt.tz is None:
+            created_at = created_at.dt.tz_localize('UTC')
+        df['created_at'] = created_at.dt.tz_convert('UTC')
+    return df
+
+def _parquet_schema(pa):
+    """Arrow schema of the files inside a partition (partition columns live in the path)"""
+    category = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ('tweet_id', pa.string()),
+        ('created_at', pa.timestamp('us', tz='UTC')),
+        ('hour', pa.int8()),
+        ('day_of_week', category),
+        ('username', pa.string()),
+        ('user_display_name', pa.string()),
+        ('text', pa.string()),
+        ('cleaned_text', pa.string()),
+        ('sentiment_score', pa.float64()),
+        ('sentiment_subjectivity', pa.float64()),
+        ('sentiment_category', category),
+        ('retweet_count', pa.int32()),
+        ('reply_count', pa.int32()),
+        ('like_count', pa.int32()),
+        ('quote_count', pa.int32()),
+        ('engagement', pa.int32()),
+        ('user_followers', pa.int32()),
+        ('user_verified', pa.bool_()),
+        ('language', category),
+        # Near-duplicate runs only; null elsewhere
+        ('cluster_id', pa.string()),
+        ('dup_rank', pa.int32()),
+    ])
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("The Parquet store needs pyarrow. Install with: pip install pyarrow")
+    return pyarrow, pyarrow.parquet
+
+def partition_path(root, brand, date):
+    return os.path.join(root, f"brand={brand}", f"date={pd.Timestamp(date):%Y-%m-%d}")
+
+# ========================================================================
+# SINK
+# ========================================================================
+
+class PartitionedParquetSink:
+    """
+    Writes batches into `root/brand=<brand>/date=<YYYY-MM-DD>/part-0.parquet`.
+
+    Each touched partition is streamed into a pending file during the run;
+    on close the pending rows are merged into the partition file, skipping
+    tweet_ids it already holds, so repeated runs append instead of adding files.
+    With replace=True the new rows win instead (re-scoring an archive).
+    """
+
+    def __init__(self, root, replace=False):
+        self.pa, self.pq = _import_pyarrow()
+        self.schema = _parquet_schema(self.pa)
+        self.root = root
+        self.replace = replace
+        self.run_id = f"{os.getpid()}-{time.time_ns()}"
+        self.writers = {}  # partition dir -> (ParquetWriter, pending path)
+        self.rows = 0
+
+    def write(self, df):
+        df = compact_dtypes(df)
+        for (brand, date), part in df.groupby(PARTITION_COLUMNS, observed=True, sort=False):
+            directory = partition_path(self.root, brand, date)
+            if directory not in self.writers:
+                os.makedirs(directory, exist_ok=True)
+                pending = os.path.join(directory, f".pending-{self.run_id}.parquet")
+                self.writers[directory] = (self.pq.ParquetWriter(pending, self.schema), pending)
+            table = self.pa.Table.from_pandas(
+                part.reindex(columns=self.schema.names), schema=self.schema, preserve_index=False
+            )
+            self.writers[directory][0].write_table(table)
+        self.rows += len(df)
+
+    def close(self):
+        for directory, (writer, pending) in self.writers.items():
+            writer.close()
+            self._merge(directory, pending)
+        self.writers = {}
+
+    def _read(self, path):
+        """A partition file in the current schema (columns added since it was written are null)"""
+        table = self.pq.read_table(path)
+        for field in self.schema:
+            if field.name not in table.column_names:
+                table = table.append_column(field, self.pa.nulls(len(table), field.type))
+        return table.select(self.schema.names).cast(self.schema)
+
+    def _merge(self, directory, pending):
+        target = os.path.join(directory, PARTITION_FILE)
+        if not os.path.exists(target):
+            os.replace(pending, target)
+            return
+        tables = [self._read(target), self._read(pending)]
+        if self.replace:
+            tables.reverse()
+        table = self.pa.concat_tables(tables)
+        df = table.to_pandas().drop_duplicates('tweet_id')
+        merged = self.pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
+        tmp_path = f"{target}.tmp"
+        self.pq.write_table(merged, tmp_path)
+        os.replace(tmp_path, target)
+        os.remove(pending)
+
+# ========================================================================
+# READING
+# ========================================================================
+
+def load_parquet_store(root, columns, brand=None, days_back=None):
+    """
+    Read the partitioned store back with compact dtypes, optionally for one
+    brand and the last `days_back` days. Only matching partitions are opened.
+    """
+    if not os.path.isdir(root):
+        return empty_dataset(columns)
+    pa, pq = _import_pyarrow()
+    filters = []
+    if brand is not None:
+        filters.append(('brand', '=', brand))
+    if days_back is not None:
+        oldest = datetime.now(timezone.utc) - timedelta(days=days_back)
+        filters.append(('date', '>=', oldest.date().isoformat()))
+    partition_schema = pa.schema([('brand', pa.string()), ('date', pa.string())])
+    partitioning = pa.dataset.partitioning(partition_schema, flavor='hive')
+    # An explicit schema, so files written before a column existed read it as null
+    schema = pa.unify_schemas([_parquet_schema(pa), partition_schema])
+    table = pq.read_table(root, partitioning=partitioning, filters=filters or None, schema=schema)
+    df = table.to_pandas()
+    if days_back is not None:
+        df = df[df['created_at'] >= oldest]
+    return compact_dtypes(apply_schema(df, columns)).reset_index(drop=True)
@@ -0,0 +1,139 @@
+# Offline Replay Ingest: re-score archived CSV / ndjson / Parquet exports in bounded memory
+#
+#   python replay_ingest.py archive/*.csv --output rescored.parquet
+#   python replay_ingest.py exports/ --output twitter_sentiment_parquet --engine lexicon
+#
+# Inputs are read a page at a time and go through the same clean -> score ->
+# derive stages as a live refresh, so memory stays at one batch however big
+# the archive is. Handy after a threshold or model change, and as a
+# deterministic input for performance testing.
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+from instrumentation import PipelineMetrics, peak_rss_mb
+from parquet_store import PartitionedParquetSink
+from sentiment_cache import SentimentCache
+from sentiment_pipeline import BATCH_SIZE, CsvSink, ParquetSink, run_pipeline
+from tweet_fetcher import PAGE_SIZE, iter_replay_pages
+from tweet_normalizer import clean_tweets
+
+# ========================================================================
+# CONFIGURATION
+# ========================================================================
+
+ARCHIVE_EXTENSIONS = ('.csv', '.csv.gz', '.ndjson', '.ndjson.gz', '.jsonl', '.jsonl.gz', '.json', '.parquet')
+DEFAULT_BRAND = "unknown"  # For archives without a brand column and no --brand
+REPLAY_CACHE_SIZE = 100000  # Scored texts kept in memory; archives repeat bot text a lot
+
+# ========================================================================
+# INPUTS
+# ========================================================================
+
+def _is_parquet_store(path):
+    return any(name.startswith(('brand=', 'date=')) for name in os.listdir(path))
+
+def expand_inputs(paths):
+    """
+    Files and globs as given; a directory is either a partitioned Parquet
+    store (read as one dataset) or a folder whose archives are read in name order.
+    """
+    files = []
+    for path in paths:
+        matches = sorted(glob.glob(path)) or [path]
+        for match in matches:
+            if os.path.isdir(match) and not _is_parquet_store(match):
+                files += sorted(os.path.join(match, name) for name in os.listdir(match)
+                                if name.lower().endswith(ARCHIVE_EXTENSIONS))
+            else:
+                files.append(match)
+    return files
+
+def iter_archive_pages(files, brand=None, max_tweets=None, page_size=PAGE_SIZE):
+    """Pages from every archive in turn; `brand` overrides (or fills in) the brand column"""
+    remaining = max_tweets
+    for path in files:
+        for page in iter_replay_pages(path, remaining, page_size=page_size):
+            if brand is not None or page.brand is None:
+                page.tag(brand or DEFAULT_BRAND)
+            yield page
+            if remaining is not None:
+                remaining -= len(page)
+        if remaining is not None and remaining <= 0:
+            return
+
+# ========================================================================
+# OUTPUTS
+# ========================================================================
+
+def make_sink(output, overwrite=False):
+    """.csv -> one CSV, .parquet -> one Parquet file, anything else -> partitioned store (rows replaced)"""
+    name = output.lower()
+    if name.endswith(('.csv', '.parquet')):
+        if os.path.exists(output):
+            if not overwrite:
+                raise FileExistsError(f"{output} exists (use --overwrite to replace it)")
+            os.remove(output)
+        return CsvSink(output) if name.endswith('.csv') else ParquetSink(output)
+    return PartitionedParquetSink(output, replace=True)
+
+# ========================================================================
+# MAIN
+# ========================================================================
+
+def replay(files, output, brand=None, engine="textblob", workers=1, batch_size=BATCH_SIZE,
+           max_tweets=None, overwrite=False, metrics=None):
+    """Re-score `files` into `output`; returns (rows, seconds)"""
+    metrics = metrics or PipelineMetrics("replay")
+    sink = make_sink(output, overwrite)
+    start = time.perf_counter()
+    rows = run_pipeline(
+        iter_archive_pages(files, brand, max_tweets, page_size=batch_size), [sink], None, clean_tweets,
+        batch_size=batch_size, metrics=metrics, engine=engine, workers=workers, expected_rows=max_tweets,
+        cache=SentimentCache(max_entries=REPLAY_CACHE_SIZE)
+    )
+    return rows, time.perf_counter() - start
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-score archived tweet exports offline")
+    parser.add_argument('inputs', nargs='+', help="CSV/ndjson/Parquet files, globs or directories")
+    parser.add_argument('--output', required=True,
+                        help="output .csv or .parquet file, or a partitioned Parquet store directory")
+    parser.add_argument('--brand', help="brand for every row (default: the archive's brand column)")
+    parser.add_argument('--engine', default="textblob", help="sentiment engine to score with")
+    parser.add_argument('--workers', type=int, default=1, help="scoring processes (0 = all cores)")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                        help="tweets cleaned, scored and written together (bounds memory)")
+    parser.add_argument('--max-tweets', type=int, help="stop after this many tweets")
+    parser.add_argument('--overwrite', action='store_true', help="replace an existing output file")
+    parser.add_argument('--metrics', help="append the run's stage metrics to this JSON-lines file")
+    args = parser.parse_args(argv)
+
+    files = expand_inputs(args.inputs)
+    missing = [path for path in files if not os.path.exists(path)]
+    if missing:
+        parser.error(f"no such input: {', '.join(missing)}")
+
+    if args.output.lower().endswith(('.csv', '.parquet')) and os.path.exists(args.output) and not args.overwrite:
+        parser.error(f"{args.output} exists (use --overwrite to replace it)")
+
+    metrics = PipelineMetrics("replay")
+    rows, seconds = replay(
+        files, args.output, brand=args.brand, engine=args.engine, workers=args.workers or None,
+        batch_size=args.batch_size, max_tweets=args.max_tweets, overwrite=args.overwrite,
+        metrics=metrics
+    )
+    rss = peak_rss_mb()
+    print(f"Re-scored {rows:,} tweets from {len(files)} archive(s) into {args.output} "
+          f"in {seconds:.1f}s ({rows / seconds if seconds else 0:,.0f} tweets/s"
+          + (f", peak RSS {rss:,.0f} MB)" if rss else ")"))
+    print(metrics.summary())
+    if args.metrics:
+        metrics.write_json(args.metrics)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+# Content-addressed Sentiment Cache (in-memory LRU + optional SQLite store)
+
+import hashlib
+import sqlite3
+from collections import OrderedDict
+
+# ========================================================================
+# CONFIGURATION
+# ========================================================================
+
+DEFAULT_MAX_ENTRIES = 100000  # Entries kept in memory before LRU eviction
+SQLITE_BATCH_SIZE = 500       # Keys per SELECT ... IN (...) lookup
+
+# ========================================================================
+# CACHE
+# ========================================================================
+
+def text_key(text, engine="textblob"):
+    """Hash of the scoring engine and cleaned text, used as the cache key"""
+    return hashlib.sha1(f"{engine}\0{text}".encode('utf-8')).hexdigest()
+
+class SentimentCache:
+    """
+    Cache of (polarity, subjectivity, category) keyed by a hash of cleaned_text.
+
+    Lookups hit the bounded in-memory LRU first, then the optional SQLite
+    file at `path`, which survives between Power BI refreshes.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, path=None):
+        self.max_entries = max_entries
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sentiment ("
+                "key TEXT PRIMARY KEY, polarity REAL, subjectivity REAL, category TEXT)"
+            )
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remember(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, text, engine="textblob"):
+        """Return the cached (polarity, subjectivity, category) or None"""
+        return self.get_many([text], engine).get(text)
+
+    def get_many(self, texts, engine="textblob"):
+        """Return {text: (polarity, subjectivity, category)} for every cached text"""
+        found, pending = {}, {}
+        for text in texts:
+            key = text_key(text, engine)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                found[text] = self._entries[key]
+            else:
+                pending[key] = text
+
+        if self._db is not None and pending:
+            keys = list(pending)
+            for i in range(0, len(keys), SQLITE_BATCH_SIZE):
+                batch = keys[i:i + SQLITE_BATCH_SIZE]
+                rows = self._db.execute(
+                    "SELECT key, polarity, subjectivity, category FROM sentiment "
+                    f"WHERE key IN ({','.join('?' * len(batch))})", batch
+                )
+                for key, polarity, subjectivity, category in rows:
+                    value = (polarity, subjectivity, category)
+                    self._remember(key, value)
+                    found[pending[key]] = value
+
+        self.hits += len(found)
+        self.misses += len(texts) - len(found)
+        return found
+
+    def put(self, text, value, engine="textblob"):
+        """Store (polarity, subjectivity, category) for one text"""
+        self.put_many({text: value}, engine)
+
+    def put_many(self, values, engine="textblob"):
+        """Store {text: (polarity, subjectivity, category)} in memory and on disk"""
+        rows = []
+        for text, value in values.items():
+            key = text_key(text, engine)
+            self._remember(key, tuple(value))
+            rows.append((key, *value))
+        if self._db is not None and rows:
+            with self._db:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO sentiment VALUES (?, ?, ?, ?)", rows
+                )
+
+    def summary(self):
+        """One-line hit/miss report for the run summary"""
+        total = self.hits + self.misses
+        rate = (self.hits / total * 100) if total else 0.0
+        return f"Sentiment cache: {self.hits} hits, {self.misses} misses ({rate:.1f}% hit rate)"
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
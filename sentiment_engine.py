@@ -0,0 +1,604 @@
+# Batch Sentiment Scoring Engine shared by tweepy_scrapper_v1.py and tweepy_scrapper_v2.py
+#
+# Engines: "textblob" (reference), "lexicon" (TextBlob's numbers, vectorized),
+# "vader" (NLTK, social-media tuned) and "onnx" (optional transformer on CPU)
+
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from tweet_schema import SENTIMENT_CATEGORIES, SENTIMENT_CATEGORY_DTYPE
+
+# ========================================================================
+# CONFIGURATION
+# ========================================================================
+
+POSITIVE_THRESHOLD = 0.1   # TextBlob polarity above this is "Positive"
+NEGATIVE_THRESHOLD = -0.1  # TextBlob polarity below this is "Negative"
+
+# (negative, positive) category thresholds per engine, since every backend
+# puts polarity on its own scale. Unlisted engines use TextBlob's.
+ENGINE_THRESHOLDS = {
+    "textblob": (NEGATIVE_THRESHOLD, POSITIVE_THRESHOLD),
+    "lexicon": (NEGATIVE_THRESHOLD, POSITIVE_THRESHOLD),
+    "vader": (-0.05, 0.05),  # VADER's recommended cut-offs on the compound score
+    "onnx": (-0.25, 0.25),   # P(positive) - P(negative) from the classifier
+}
+
+# Optional transformer backend: a sequence classifier exported to ONNX plus
+# its Hugging Face tokenizer.json (needs onnxruntime and tokenizers)
+ONNX_MODEL_PATH = os.environ.get("SENTIMENT_ONNX_MODEL", "sentiment_model.onnx")
+ONNX_TOKENIZER_PATH = os.environ.get("SENTIMENT_ONNX_TOKENIZER", "tokenizer.json")
+ONNX_LABELS = ("negative", "neutral", "positive")  # Order of the model's output logits
+ONNX_MAX_LENGTH = 128  # Tokens per tweet (longer ones are truncated)
+ONNX_BATCH_SIZE = 64   # Texts per inference call
+ONNX_THREADS = None    # onnxruntime intra-op threads (None = runtime default)
+
+# Process pool for large backfills. Runs with fewer texts to score than
+# PARALLEL_MIN_ROWS stay serial so they don't pay the process startup cost.
+PARALLEL_MIN_ROWS = 20000
+PARALLEL_CHUNK_SIZE = 5000
+
+# ========================================================================
+# ANALYZER LOADING
+# ========================================================================
+#
+# TextBlob (and its NLTK imports) and the pattern lexicon are loaded on first
+# use rather than at import, so a refresh can start fetching first. preload()
+# does the loading on a background thread; scoring blocks on the same lock
+# until it is done, so nothing is loaded twice.
+
+_load_lock = threading.RLock()
+_analyzer = None
+
+def _pattern_analyzer():
+    """The pattern sentiment analyzer TextBlob uses, imported and loaded once"""
+    global _analyzer
+    if _analyzer is None:
+        with _load_lock:
+            if _analyzer is None:
+                from textblob.en import sentiment
+                sentiment.load()
+                _analyzer = sentiment
+    return _analyzer
+
+def preload(engine="textblob"):
+    """Load the backend for `engine` on a daemon thread; returns the thread"""
+    backend = get_backend(engine)
+
+    def load():
+        try:
+            backend.load()
+        except Exception:
+            pass  # scoring loads again and raises where the caller can handle it
+
+    thread = threading.Thread(target=load, name="sentiment-preload", daemon=True)
+    thread.start()
+    return thread
+
+# ========================================================================
+# BACKENDS
+# ========================================================================
+#
+# A backend turns a list of cleaned texts into (polarity, subjectivity)
+# float arrays in one call, so each can batch however suits its model.
+# score_sentiment_batch picks one by engine name; register_backend() adds
+# more. Backends must be safe to load() repeatedly and from several threads.
+
+class SentimentBackend:
+    """Base class: override load() (expensive setup, once) and score(texts)"""
+
+    name = None
+
+    def load(self):
+        pass
+
+    def score(self, texts):
+        raise NotImplementedError
+
+class TextBlobBackend(SentimentBackend):
+    """TextBlob's pattern analyzer, text by text (the reference numbers)"""
+
+    name = "textblob"
+
+    def load(self):
+        return _pattern_analyzer()
+
+    def score(self, texts):
+        analyzer = self.load()
+        scores = np.array([analyze_text(text, analyzer) for text in texts], dtype=float).reshape(-1, 2)
+        return scores[:, 0], scores[:, 1]
+
+class LexiconBackend(SentimentBackend):
+    """The pattern rules re-implemented over the whole batch with NumPy (same numbers, faster)"""
+
+    name = "lexicon"
+
+    def load(self):
+        return _load_lexicon()
+
+    def score(self, texts):
+        return score_lexicon_batch(texts)
+
+class VaderBackend(SentimentBackend):
+    """
+    NLTK's VADER, tuned for social media text (emoji, caps, slang).
+    Polarity is the compound score; subjectivity is the share of the text
+    rated positive or negative. Needs `python -m nltk.downloader vader_lexicon`.
+    """
+
+    name = "vader"
+
+    def __init__(self):
+        self._analyzer = None
+
+    def load(self):
+        if self._analyzer is None:
+            with _load_lock:
+                if self._analyzer is None:
+                    from nltk.sentiment.vader import SentimentIntensityAnalyzer
+                    try:
+                        self._analyzer = SentimentIntensityAnalyzer()
+                    except LookupError:
+                        raise LookupError("VADER needs its lexicon: "
+                                          "python -m nltk.downloader vader_lexicon") from None
+        return self._analyzer
+
+    def score(self, texts):
+        analyzer = self.load()
+        scores = [analyzer.polarity_scores(text) for text in texts]
+        polarity = np.fromiter((s['compound'] for s in scores), dtype=float, count=len(scores))
+        subjectivity = np.fromiter((s['pos'] + s['neg'] for s in scores), dtype=float, count=len(scores))
+        return polarity, subjectivity
+
+class OnnxBackend(SentimentBackend):
+    """
+    A small transformer classifier exported to ONNX, run batched on CPU.
+    Polarity is P(positive) - P(negative); subjectivity is 1 - P(neutral)
+    (|polarity| for two-label models). Texts are sorted by length before
+    batching so each batch pads to a similar length.
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_path=ONNX_MODEL_PATH, tokenizer_path=ONNX_TOKENIZER_PATH,
+                 labels=ONNX_LABELS, max_length=ONNX_MAX_LENGTH, batch_size=ONNX_BATCH_SIZE):
+        self.model_path = model_path
+        self.tokenizer_path = tokenizer_path
+        self.labels = list(labels)
+        self.max_length = max_length
+        self.batch_size = batch_size
+        self._session = None
+
+    def load(self):
+        if self._session is None:
+            with _load_lock:
+                if self._session is None:
+                    import onnxruntime
+                    from tokenizers import Tokenizer
+                    tokenizer = Tokenizer.from_file(self.tokenizer_path)
+                    tokenizer.enable_truncation(self.max_length)
+                    tokenizer.enable_padding()  # to the longest text of each batch
+                    options = onnxruntime.SessionOptions()
+                    if ONNX_THREADS:
+                        options.intra_op_num_threads = ONNX_THREADS
+                    session = onnxruntime.InferenceSession(
+                        self.model_path, options, providers=["CPUExecutionProvider"]
+                    )
+                    self._input_names = {i.name for i in session.get_inputs()}
+                    self._tokenizer = tokenizer
+                    self._session = session
+        return self._session
+
+    def score(self, texts):
+        session = self.load()
+        negative, positive = self.labels.index("negative"), self.labels.index("positive")
+        neutral = self.labels.index("neutral") if "neutral" in self.labels else None
+        polarity, subjectivity = np.zeros(len(texts)), np.zeros(len(texts))
+        order = np.argsort([len(text) for text in texts], kind='stable')
+        for start in range(0, len(order), self.batch_size):
+            rows = order[start:start + self.batch_size]
+            encodings = self._tokenizer.encode_batch([texts[i] for i in rows])
+            inputs = {
+                'input_ids': np.array([e.ids for e in encodings], dtype=np.int64),
+                'attention_mask': np.array([e.attention_mask for e in encodings], dtype=np.int64),
+                'token_type_ids': np.array([e.type_ids for e in encodings], dtype=np.int64),
+            }
+            logits = session.run(None, {k: v for k, v in inputs.items() if k in self._input_names})[0]
+            probs = np.exp(logits - logits.max(axis=1, keepdims=True))
+            probs /= probs.sum(axis=1, keepdims=True)
+            polarity[rows] = probs[:, positive] - probs[:, negative]
+            subjectivity[rows] = 1.0 - probs[:, neutral] if neutral is not None else np.abs(polarity[rows])
+        return polarity, subjectivity
+
+SENTIMENT_BACKENDS = {}
+
+def register_backend(backend):
+    """Make `backend` available as engine=backend.name (set ENGINE_THRESHOLDS for its scale)"""
+    SENTIMENT_BACKENDS[backend.name] = backend
+    return backend
+
+def get_backend(engine):
+    try:
+        return SENTIMENT_BACKENDS[engine]
+    except KeyError:
+        raise ValueError(f"Unknown sentiment engine: {engine!r}") from None
+
+for _backend in (TextBlobBackend(), LexiconBackend(), VaderBackend(), OnnxBackend()):
+    register_backend(_backend)
+
+# ========================================================================
+# SCORING
+# ========================================================================
+
+def categorize_sentiment(score, engine="textblob"):
+    """Categorize sentiment into Positive, Negative, or Neutral using `engine`'s thresholds"""
+    negative, positive = engine_thresholds(engine)
+    if score > positive:
+        return "Positive"
+    elif score < negative:
+        return "Negative"
+    else:
+        return "Neutral"
+
+def engine_thresholds(engine):
+    """(negative, positive) category thresholds for `engine`"""
+    return ENGINE_THRESHOLDS.get(engine, (NEGATIVE_THRESHOLD, POSITIVE_THRESHOLD))
+
+_CATEGORY_CODES = [SENTIMENT_CATEGORIES.index(c) for c in ("Positive", "Negative", "Neutral")]
+
+def categorize_scores(polarity, engine="textblob"):
+    """categorize_sentiment for a whole array at once; returns a Categorical of SENTIMENT_CATEGORIES"""
+    negative, positive = engine_thresholds(engine)
+    polarity = np.asarray(polarity, dtype=float)
+    positive_code, negative_code, neutral_code = _CATEGORY_CODES
+    codes = np.select([polarity > positive, polarity < negative], [positive_code, negative_code],
+                      default=neutral_code)
+    return pd.Categorical.from_codes(codes, dtype=SENTIMENT_CATEGORY_DTYPE)
+
+def analyze_text(text, analyzer=None):
+    """Return (polarity, subjectivity) for one text with a single analyzer pass.
+
+    This is the same pattern analyzer TextBlob(text).sentiment uses, called
+    directly so the text is tokenized once instead of once per score.
+    """
+    try:
+        polarity, subjectivity = (analyzer or _pattern_analyzer())(text)
+        return polarity, subjectivity
+    except Exception:
+        return 0.0, 0.0
+
+def score_texts(texts, engine="textblob"):
+    """Return (polarity, subjectivity) arrays for a list of texts, in order"""
+    return get_backend(engine).score(texts)
+
+def score_sentiment_batch(texts, engine="textblob", workers=1, chunk_size=PARALLEL_CHUNK_SIZE,
+                          cache=None, pool=None):
+    """Score a whole column of cleaned tweets in one pass.
+
+    Each distinct text is analyzed only once (brand searches are full of
+    repeated giveaway/reply text) and the results are mapped back in order.
+    With a ScoringPool (one per run, see run_pipeline) misses are scored in
+    its worker processes; without one, workers > 1 starts a pool for this
+    call alone when it has at least PARALLEL_MIN_ROWS distinct texts.
+    An optional SentimentCache is checked first; only misses are scored.
+    Returns a DataFrame with sentiment_score, sentiment_subjectivity and
+    sentiment_category aligned to the input index.
+    """
+    get_backend(engine)  # unknown engines fail before any work is done
+    texts = pd.Series(texts).fillna('')
+    codes, unique_texts = pd.factorize(texts)
+    unique_texts = list(unique_texts)
+
+    cached = cache.get_many(unique_texts, engine) if cache is not None else {}
+    hits = [i for i, text in enumerate(unique_texts) if text in cached]
+    misses = [i for i, text in enumerate(unique_texts) if text not in cached]
+    missing = [unique_texts[i] for i in misses]
+
+    if pool is not None:
+        polarity, subjectivity = pool.score(missing)
+    elif workers != 1 and len(missing) >= PARALLEL_MIN_ROWS:
+        polarity, subjectivity = score_texts_parallel(missing, engine, workers, chunk_size)
+    else:
+        polarity, subjectivity = score_texts(missing, engine)
+
+    # (polarity, subjectivity) per distinct text, categorized in one vectorized pass
+    unique_scores = np.zeros((len(unique_texts), 2))
+    unique_scores[misses, 0] = polarity
+    unique_scores[misses, 1] = subjectivity
+    if hits:
+        unique_scores[hits] = [cached[unique_texts[i]][:2] for i in hits]
+    categories = categorize_scores(unique_scores[:, 0], engine)
+
+    if cache is not None and missing:
+        cache.put_many({
+            text: (p, s, c) for text, (p, s), c in
+            zip(missing, unique_scores[misses].tolist(), np.asarray(categories[misses]).tolist())
+        }, engine)
+
+    return pd.DataFrame({
+        'sentiment_score': unique_scores[codes, 0],
+        'sentiment_subjectivity': unique_scores[codes, 1],
+        'sentiment_category': categories[codes],
+    }, index=texts.index)
+
+# ========================================================================
+# PARALLEL SCORING
+# ========================================================================
+
+def _init_worker(engine):
+    """Load the backend once per worker process, not once per chunk"""
+    get_backend(engine).load()
+
+def _score_chunk(texts, engine):
+    return score_texts(texts, engine)
+
+class ScoringPool:
+    """
+    A process pool kept for a whole run, so each worker loads the backend
+    once instead of once per batch.
+
+    Scoring goes parallel only when the run's work reaches `min_rows`
+    (PARALLEL_MIN_ROWS): from the first batch when `expected_rows` (e.g.
+    MAX_TWEETS) says so, otherwise once the texts scored so far add up to
+    it. Each call is split over the workers in pieces of at most
+    `chunk_size`. A run that stays serial is reported on close().
+    """
+
+    def __init__(self, workers=None, engine="textblob", chunk_size=PARALLEL_CHUNK_SIZE,
+                 expected_rows=None, min_rows=None, report=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.engine = engine
+        self.chunk_size = chunk_size
+        self.expected_rows = expected_rows
+        self.min_rows = PARALLEL_MIN_ROWS if min_rows is None else min_rows
+        self.report = report
+        self.scored = 0   # texts scored so far, serially or not
+        self._executor = None
+
+    @property
+    def parallel(self):
+        """Whether the next call is scored in the worker processes"""
+        if self.workers <= 1:
+            return False
+        if self.expected_rows is not None and self.expected_rows >= self.min_rows:
+            return True
+        return self.scored >= self.min_rows
+
+    @property
+    def started(self):
+        return self._executor is not None
+
+    def score(self, texts):
+        """(polarity, subjectivity) arrays for texts, in order"""
+        texts = list(texts)
+        if not texts or not self.parallel:
+            self.scored += len(texts)
+            return score_texts(texts, self.engine)
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                                 initargs=(self.engine,))
+            if self.report:
+                self.report(f"Scoring in {self.workers} worker processes")
+        size = min(self.chunk_size, -(-len(texts) // self.workers))
+        chunks = [texts[i:i + size] for i in range(0, len(texts), size)]
+        results = list(self._executor.map(_score_chunk, chunks, [self.engine] * len(chunks)))
+        self.scored += len(texts)
+        return np.concatenate([r[0] for r in results]), np.concatenate([r[1] for r in results])
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        elif self.workers > 1 and self.report:
+            self.report(f"Scored {self.scored:,} texts serially: {self.workers} workers only pay off "
+                        f"from {self.min_rows:,} texts per run")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def score_texts_parallel(texts, engine="textblob", workers=None, chunk_size=PARALLEL_CHUNK_SIZE):
+    """Score texts in a process pool and return arrays in the original order.
+
+    workers=None uses every core. Each chunk keeps its position, so results
+    are stitched back exactly as the serial path would return them.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    if not chunks:
+        return np.zeros(0), np.zeros(0)
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks)),
+                             initializer=_init_worker, initargs=(engine,)) as pool:
+        results = list(pool.map(_score_chunk, chunks, [engine] * len(chunks)))
+    polarity = np.concatenate([r[0] for r in results])
+    subjectivity = np.concatenate([r[1] for r in results])
+    return polarity, subjectivity
+
+# ========================================================================
+# VECTORIZED LEXICON ENGINE
+# ========================================================================
+#
+# Re-implements the pattern analyzer's rules (intensifiers, negation,
+# exclamation boosts, emoticons) as NumPy array operations over every token
+# in the batch. Tokens are factorized into a vocabulary first, so string
+# work and lexicon lookups happen once per distinct token, not per tweet.
+#
+# Tolerance: identical to TextBlob (max abs error 0.0 on polarity and
+# subjectivity) for both `text` and `cleaned_text` of the bundled
+# twitter_sentiment_Tesla_*.csv export, including negation after an -ly
+# adverb ("really not like"). On 10k synthetic tweets (benchmark.py corpus,
+# seed 0) 3 differ, 1 in category. Known gaps, all from pattern's
+# tokenizer: periods glued to a word ("etc.", "it........"), an emoticon
+# glued to punctuation ("bridging):"), "( ! )" written with spaces, and an
+# emoticon sitting between an adverb and the word it modifies.
+
+_PUNCTUATION = r"""[,;:!?()\[\]{}`'"@#$^&*+\-|=~_]"""
+# leading punctuation (periods stay attached), word, trailing punctuation
+_CHUNK_PATTERN = r"^(%s*)(.*?)(%s*)$" % (_PUNCTUATION, _PUNCTUATION[:-1] + ".]")
+_QUOTE_SPACING = str.maketrans({q: f" {q} " for q in "“”‘’'\""})
+_EXCLAMATION_BOOST = 1.25  # each "!" boosts the preceding word
+_NEGATION_FACTOR = -0.5    # "not good" = slightly bad
+
+_lexicon = None
+
+def _load_lexicon():
+    """Build the hash index over the pattern lexicon (once per process)"""
+    global _lexicon
+    if _lexicon is not None:
+        return _lexicon
+    with _load_lock:
+        if _lexicon is not None:
+            return _lexicon
+        from textblob._text import EMOTICONS
+        pattern_sentiment = _pattern_analyzer()
+        words, rows = [], []
+        # columns: polarity, subjectivity, intensity, is_adverb, is_emoticon
+        for word in pattern_sentiment.keys():
+            entry = pattern_sentiment[word]
+            polarity, subjectivity, intensity = entry[None]
+            words.append(word)
+            rows.append((polarity, subjectivity, intensity, 'RB' in entry, False))
+        for (_, polarity), faces in EMOTICONS.items():
+            for face in faces:
+                words.append(face.lower())
+                rows.append((polarity, 1.0, 1.0, False, True))
+        words.append("(!)")  # sarcasm marker
+        rows.append((0.0, 1.0, 1.0, False, True))
+
+        index = pd.Index(words)
+        keep = ~index.duplicated()
+        values = np.array(rows, dtype=float)[keep]
+        _lexicon = {
+            'index': index[keep],
+            'values': values,
+            'emoticons': index[keep][values[:, 4] > 0],
+            'negations': pd.Index(list(pattern_sentiment.negations)),
+        }
+    return _lexicon
+
+def sentiment_words():
+    """
+    Lower-case tokens that move pattern-lexicon scores: rated words and
+    emoticons, intensifiers and negations (near_duplicates keeps tweets
+    that differ in any of them apart)
+    """
+    lexicon = _load_lexicon()
+    values = lexicon['values']
+    rated = (values[:, 0] != 0) | (values[:, 1] != 0) | (values[:, 3] > 0)
+    return frozenset(lexicon['index'][rated]) | frozenset(lexicon['negations'])
+
+def _last_before(flags, pos, first, inclusive=False):
+    """Position of the last flagged token before each token in the same tweet, or -1"""
+    last = np.maximum.accumulate(np.where(flags, pos, -1))
+    if not inclusive:
+        last = np.r_[-1, last[:-1]]
+    return np.where(last >= first, last, -1)
+
+def score_lexicon_batch(texts):
+    """Return (polarity, subjectivity) arrays for a batch of texts using NumPy"""
+    lexicon = _load_lexicon()
+    texts = pd.Series(texts, dtype=object).fillna('').reset_index(drop=True)
+    doc_codes, docs = pd.factorize(texts)
+    n_docs = len(docs)
+    if n_docs == 0:
+        return np.zeros(len(texts)), np.zeros(len(texts))
+
+    # ---- Tokenize the batch once, the same way pattern's tokenizer does
+    norm = (pd.Series(docs, dtype=object)
+            .str.replace("n't", " n't", regex=False)
+            .str.translate(_QUOTE_SPACING)
+            .str.lower()
+            .str.replace(r"(?:\r?\n){2,}", " end-of-sentence ", regex=True))
+    chunks = norm.str.split().explode().dropna()
+    if chunks.empty:
+        return np.zeros(len(texts)), np.zeros(len(texts))
+    doc = chunks.index.to_numpy()
+    codes, vocab = pd.factorize(chunks)
+
+    # ---- Per-vocabulary features, gathered back to tokens through `codes`
+    vocab = pd.Series(vocab, dtype=object)
+    parts = vocab.str.extract(_CHUNK_PATTERN)
+    v_emoticon = lexicon['emoticons'].get_indexer(vocab) >= 0
+    v_word = pd.Series(np.where(v_emoticon, vocab, parts[1]), dtype=object)
+    v_ids = lexicon['index'].get_indexer(v_word)
+    v_known = v_ids >= 0
+    v_values = np.where(v_known[:, None], lexicon['values'][np.maximum(v_ids, 0)],
+                        [0.0, 0.0, 1.0, 0.0, 0.0])
+    v_lead_bangs = np.where(v_emoticon, 0, parts[0].str.count('!').to_numpy())
+    v_trail_bangs = np.where(v_emoticon, 0, parts[2].str.count('!').to_numpy())
+
+    p, s, intensity = (v_values[:, k][codes] for k in range(3))
+    known = v_known[codes]
+    emoticon = known & (v_values[:, 4][codes] > 0)
+    word = known & ~emoticon
+    adverb = word & (v_values[:, 3][codes] > 0)
+    ly_adverb = adverb & v_word.str.endswith('ly').to_numpy()[codes]
+    length = parts[1].str.len().to_numpy()[codes]
+    stripped_length = parts[1].str.strip("'").str.len().to_numpy()[codes]
+    negation = (lexicon['negations'].get_indexer(parts[1]) >= 0)[codes]
+
+    n_tokens = len(codes)
+    pos = np.arange(n_tokens)
+    starts = np.flatnonzero(np.r_[True, doc[1:] != doc[:-1]])
+    first = starts[np.searchsorted(starts, pos, side='right') - 1]
+
+    # ---- Negation: carried across short words ("not a good")
+    carrier = _last_before(word | negation | (stripped_length > 1), pos, first)
+    negated_before = (carrier >= 0) & negation[np.maximum(carrier, 0)]
+
+    # ---- Intensifiers: an adverb modifies the next known word, across
+    # words of two letters or less ("really is a good") and across an
+    # unknown negation after an -ly adverb ("really not good")
+    last_word = _last_before(word, pos, first)
+    after_ly = (last_word >= 0) & ly_adverb[np.maximum(last_word, 0)]
+    breaker = word | (~known & (length > 2) & ~(negation & after_ly))
+    modifier = _last_before(breaker, pos, first)
+    modified = word & (modifier >= 0) & adverb[np.maximum(modifier, 0)]
+    # An unknown negation after an -ly adverb negates the adverb's own
+    # assessment, even when no known word follows ("kindly not", "really not like")
+    ly_negation = negation & ~known & (modifier >= 0) & ly_adverb[np.maximum(modifier, 0)]
+    modifier = np.maximum(modifier, 0)
+
+    head = word & ~modified
+    head_pos = np.flatnonzero(head)
+    chain = np.maximum(np.cumsum(head) - 1, 0)
+    chain_head = head_pos[chain] if len(head_pos) else pos
+    head_negated = negated_before[chain_head]
+    # a negated head inverts its intensity ("not very good")
+    boost = np.where(head_negated & (modifier == chain_head),
+                     1.0 / intensity[modifier], intensity[modifier])
+    p = np.where(modified, np.clip(p * boost, -1.0, 1.0), p)
+    s = np.where(modified, np.clip(s * boost, -1.0, 1.0), s)
+    absorbed = np.zeros(n_tokens, dtype=bool)
+    absorbed[modifier[modified]] = True
+    assessed = (word & ~absorbed) | emoticon
+
+    negations_seen = np.cumsum(negation)
+    ly_negated = modified & (negations_seen[np.maximum(pos - 1, 0)] - negations_seen[modifier] > 0)
+    chain_ly_negated = np.bincount(np.r_[chain[ly_negated], chain[modifier[ly_negation]]],
+                                   minlength=len(head_pos)) > 0
+    negated = word & head_negated
+    if len(head_pos):
+        negated |= word & chain_ly_negated[chain]
+
+    # ---- Exclamation marks boost the preceding assessment
+    bangs = np.zeros(n_tokens)
+    for counts, inclusive in ((v_lead_bangs[codes], False), (v_trail_bangs[codes], True)):
+        target = _last_before(word | emoticon, pos, first, inclusive)
+        hit = (counts > 0) & (target >= 0)
+        bangs += np.bincount(target[hit], weights=counts[hit], minlength=n_tokens)
+    p = np.clip(p * _EXCLAMATION_BOOST ** (bangs * assessed), -1.0, 1.0)
+    p = np.where(negated, p * _NEGATION_FACTOR, p)
+
+    # ---- Average the assessments of each text, then expand duplicates
+    owner = doc[assessed]
+    counts = np.maximum(np.bincount(owner, minlength=n_docs), 1)
+    polarity = np.bincount(owner, weights=p[assessed], minlength=n_docs) / counts
+    subjectivity = np.bincount(owner, weights=s[assessed], minlength=n_docs) / counts
+    return polarity[doc_codes], subjectivity[doc_codes]
@@ -0,0 +1,224 @@
+# Streaming Sentiment Pipeline: fetch -> clean -> score -> sink, one micro-batch at a time
+
+import os
+
+import pandas as pd
+
+from instrumentation import NULL_METRICS
+from sentiment_engine import PARALLEL_CHUNK_SIZE, PARALLEL_MIN_ROWS, ScoringPool, score_sentiment_batch
+from tweet_records import TweetColumns
+from tweet_schema import empty_dataset, time_columns
+
+# ========================================================================
+# CONFIGURATION
+# ========================================================================
+
+BATCH_SIZE = 500  # Tweets cleaned and scored together
+# Output columns and dtypes: see tweet_schema.OUTPUT_SCHEMA
+
+# ========================================================================
+# SINKS
+# ========================================================================
+
+class MemorySink:
+    """Collects batches into one DataFrame (the Power BI `dataset`)"""
+
+    def __init__(self):
+        self.batches = []
+
+    def write(self, df):
+        self.batches.append(df)
+
+    def close(self):
+        pass
+
+    def result(self):
+        if not self.batches:
+            return empty_dataset()
+        return pd.concat(self.batches, ignore_index=True)
+
+class CsvSink:
+    """Appends each batch to a CSV file as soon as it is scored"""
+
+    def __init__(self, path):
+        self.path = path
+        self.header = not os.path.exists(path)
+        self.rows = 0
+
+    def write(self, df):
+        df.to_csv(self.path, mode='a', header=self.header, index=False)
+        self.header = False
+        self.rows += len(df)
+
+    def close(self):
+        pass
+
+class ParquetSink:
+    """Streams batches into one Parquet file (requires pyarrow)"""
+
+    def __init__(self, path):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("ParquetSink needs pyarrow. Install with: pip install pyarrow")
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.path = path
+        self.writer = None
+        self.rows = 0
+
+    def write(self, df):
+        table = self.pa.Table.from_pandas(df, preserve_index=False)
+        if self.writer is None:
+            self.writer = self.pq.ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table.cast(self.writer.schema))
+        self.rows += len(df)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+# ========================================================================
+# STAGES
+# ========================================================================
+
+def iter_batches(pages, batch_size=BATCH_SIZE):
+    """Regroup fetched TweetColumns pages into batches of `batch_size`"""
+    batch = TweetColumns()
+    for page in pages:
+        batch.extend(page)
+        while len(batch) >= batch_size:
+            yield batch.slice(0, batch_size)
+            batch = batch.slice(batch_size)
+    if len(batch):
+        yield batch
+
+def process_batch(records, brand, clean, engine="textblob", workers=1,
+                  chunk_size=PARALLEL_CHUNK_SIZE, cache=None, metrics=NULL_METRICS, dedup=None, pool=None):
+    """
+    Clean, score and derive features for one batch of tweets (TweetColumns,
+    or a list of tweet dicts). `clean` takes the whole text column and
+    returns the cleaned column.
+    With brand=None each tweet carries its own brand (multi-brand runs).
+    With a NearDuplicateIndex as `dedup`, only one tweet per near-duplicate
+    cluster is scored and cluster_id/dup_rank columns are added.
+    A ScoringPool as `pool` scores in its worker processes (see run_pipeline).
+    """
+    rows = len(records)
+    with metrics.stage('clean', rows):
+        if isinstance(records, TweetColumns):
+            raw = records.to_frame()
+        else:
+            raw = pd.DataFrame.from_records(records)
+        cleaned_text = clean(raw['text'])
+    to_score = cleaned_text
+    clusters = None
+    if dedup is not None:
+        with metrics.stage('dedup', rows):
+            clusters = dedup.assign(raw['tweet_id'], cleaned_text)
+            to_score = cleaned_text[clusters['representative']]
+    with metrics.stage('score', len(to_score)):
+        scores = score_sentiment_batch(
+            to_score, engine=engine, workers=workers,
+            chunk_size=chunk_size, cache=cache, pool=pool
+        )
+        if clusters is not None:
+            scores = dedup.fill_scores(clusters, scores)
+    with metrics.stage('derive', rows):
+        return derive_features(raw, cleaned_text, scores, brand, clusters)
+
+def derive_features(raw, cleaned_text, scores, brand, clusters=None):
+    """
+    Assemble the output columns (tweet_schema.OUTPUT_SCHEMA) from the raw
+    tweets, cleaned text and scores. Every column is computed on whole
+    arrays; the time columns come from one tweet_schema.time_columns pass.
+    """
+    created_at = pd.to_datetime(raw['created_at'], utc=True)
+    times = time_columns(created_at)
+
+    # Built column by column in output order, so no reselect copy is needed
+    df = pd.DataFrame({
+        'tweet_id': raw['tweet_id'],
+        'created_at': created_at,
+        'date': times['date'],
+        'hour': times['hour'],
+        'day_of_week': times['day_of_week'],
+        'brand': raw['brand'] if brand is None else brand,
+        'username': raw['username'],
+        'user_display_name': raw['user_display_name'],
+        'text': raw['text'],
+        'cleaned_text': cleaned_text,
+        'sentiment_score': scores['sentiment_score'],
+        'sentiment_subjectivity': scores['sentiment_subjectivity'],
+        'sentiment_category': scores['sentiment_category'],
+        'retweet_count': raw['retweet_count'],
+        'reply_count': raw['reply_count'],
+        'like_count': raw['like_count'],
+        'quote_count': raw['quote_count'],
+        'engagement': (raw['like_count'] + raw['retweet_count'] +
+                       raw['reply_count'] + raw['quote_count']),
+        'user_followers': raw['user_followers'],
+        'user_verified': raw['user_verified'],
+        'language': raw['language']
+    })
+    if clusters is not None:
+        df['cluster_id'] = clusters['cluster_id']
+        df['dup_rank'] = clusters['dup_rank']
+    return df
+
+def _timed_pages(pages, metrics):
+    """Charge the time spent waiting on each fetched page to the 'fetch' stage"""
+    pages = iter(pages)
+    while True:
+        with metrics.stage('fetch') as timer:
+            page = next(pages, None)
+            if page is not None:
+                timer.rows = len(page)
+        if page is None:
+            return
+        yield page
+
+def run_pipeline(pages, sinks, brand, clean, batch_size=BATCH_SIZE,
+                 metrics=NULL_METRICS, dedup=None, workers=1, chunk_size=PARALLEL_CHUNK_SIZE,
+                 expected_rows=None, report=print, **score_options):
+    """
+    Stream fetched pages through clean/score/derive into every sink.
+    One `dedup` index spans the whole run, so near-duplicates are
+    collapsed across batches too.
+
+    Only one batch is held at a time (plus whatever a MemorySink keeps),
+    and each batch reaches the sinks as soon as it is scored.
+    With workers != 1 one ScoringPool serves the whole run; it goes parallel
+    when the run's work reaches PARALLEL_MIN_ROWS (`expected_rows`, e.g.
+    MAX_TWEETS, decides up front) and batches grow to `batch_size` per
+    worker so every worker gets a share. A run that stays serial is
+    reported through `report`.
+    Per-stage timings go to `metrics` (fetch, clean, dedup, score, derive, export).
+    Returns the number of tweets processed.
+    """
+    if metrics is not NULL_METRICS:
+        pages = _timed_pages(pages, metrics)
+    pool = None
+    if workers != 1:
+        pool = ScoringPool(workers, score_options.get('engine', "textblob"), chunk_size, expected_rows,
+                           report=report)
+        if pool.workers > 1 and (expected_rows is None or expected_rows >= PARALLEL_MIN_ROWS):
+            batch_size *= pool.workers
+    total = 0
+    try:
+        for records in iter_batches(pages, batch_size):
+            df = process_batch(records, brand, clean, metrics=metrics, dedup=dedup, pool=pool, **score_options)
+            with metrics.stage('export', len(df)):
+                for sink in sinks:
+                    sink.write(df)
+            total += len(df)
+    finally:
+        if pool is not None:
+            metrics.record('score', scoring_workers=pool.workers if pool.started else 1)
+            pool.close()
+        with metrics.stage('export'):
+            for sink in sinks:
+                sink.close()
+    return total
@@ -0,0 +1,311 @@
+# Real-Time Filtered-Stream Sentiment with Micro-batching and Rolling Aggregates
+
+import hashlib
+import json
+import queue
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+import requests
+
+from instrumentation import NULL_METRICS, PipelineMetrics, start_metrics_server
+from mock_twitter_api import MockTwitterAPI
+from sentiment_cache import SentimentCache
+from sentiment_pipeline import process_batch
+from tweet_fetcher import TWITTER_API_HOST, v2_payload_row
+from tweet_normalizer import clean_tweets
+from tweet_records import TweetColumns
+from tweet_schema import csv_read_options
+
+# ========================================================================
+# CONFIGURATION
+# ========================================================================
+
+BEARER_TOKEN = "Your_Bearer_Token_Here"  # For API v2
+
+BRAND_NAME = "Brand_Name_Here"  # Change this to any brand you want to track
+STREAM_RULE = f"{BRAND_NAME} -is:retweet lang:en"
+API_BASE_URL = None  # e.g. "http://localhost:8000" to read from mock_twitter_api.py --stream
+
+REPLAY_CSV = None  # e.g. "twitter_sentiment_Tesla_20251024_212058.csv" to replay an export offline
+REPLAY_RATE = 50   # Tweets per second when replaying (served by a local mock_twitter_api stream)
+
+BATCH_MAX_SIZE = 50     # Score as soon as this many tweets are waiting...
+BATCH_MAX_WAIT = 1.0    # ...or this many seconds after the first one arrived
+WINDOW_SECONDS = 300    # Rolling window for published aggregates
+SENTIMENT_ENGINE = "textblob"  # or "lexicon", "vader", "onnx" (see sentiment_engine.py)
+PROMETHEUS_PORT = None  # e.g. 9108 to serve stage timings, window counts and latency at http://127.0.0.1:9108/metrics
+
+STREAM_FIELDS = {
+    'tweet.fields': 'created_at,public_metrics,lang,author_id',
+    'user.fields': 'username,name,verified,public_metrics',
+    'expansions': 'author_id',
+}
+RECONNECT_BACKOFF = (1, 2, 4, 8, 16, 32, 64)  # Seconds between reconnect attempts
+RATE_LIMIT_BACKOFF = (60, 120, 240, 480, 960)  # After HTTP 429: start at a minute and double, as Twitter asks
+
+# ========================================================================
+# STREAM SOURCES
+# ========================================================================
+
+def ensure_stream_rule(bearer_token, rule, api_base_url=None):
+    """Add `rule` to the filtered stream unless it is already active"""
+    url = f"{(api_base_url or TWITTER_API_HOST).rstrip('/')}/2/tweets/search/stream/rules"
+    headers = {"Authorization": f"Bearer {bearer_token}"}
+    active = requests.get(url, headers=headers, timeout=30).json().get('data', [])
+    if any(r['value'] == rule for r in active):
+        return
+    response = requests.post(url, headers=headers, json={'add': [{'value': rule}]}, timeout=30)
+    response.raise_for_status()
+
+def stream_lines(bearer_token, api_base_url=None, sleep=time.sleep):
+    """
+    Yield raw ndjson lines from the v2 filtered stream, reconnecting with
+    backoff when it drops or the server closes it: RATE_LIMIT_BACKOFF after
+    a 429, RECONNECT_BACKOFF otherwise. The backoff resets once a connection
+    delivers data; gives up when the schedule is spent, and at once on
+    other 4xx answers (bad token, missing rules), which a retry won't fix.
+    """
+    url = f"{(api_base_url or TWITTER_API_HOST).rstrip('/')}/2/tweets/search/stream"
+    headers = {"Authorization": f"Bearer {bearer_token}"}
+    attempt = 0
+    while True:
+        try:
+            with requests.get(url, headers=headers, params=STREAM_FIELDS,
+                              stream=True, timeout=(10, 90)) as response:
+                response.raise_for_status()
+                for line in response.iter_lines(decode_unicode=True):
+                    attempt = 0
+                    yield line
+            # A long-running stream should not end: treat a clean close as a drop
+            error = requests.ConnectionError("filtered stream closed by the server")
+        except requests.RequestException as e:
+            error = e
+        status = error.response.status_code if error.response is not None else None
+        if status is not None and 400 <= status < 500 and status != 429:
+            raise error
+        backoff = RATE_LIMIT_BACKOFF if status == 429 else RECONNECT_BACKOFF
+        if attempt >= len(backoff):
+            raise error
+        sleep(backoff[attempt])
+        attempt += 1
+
+def author_id_for(username):
+    """A stable stand-in user ID for an export that only kept the username"""
+    return str(int(hashlib.sha1(username.encode('utf-8')).hexdigest()[:12], 16))
+
+def csv_replay_lines(path, rate=REPLAY_RATE):
+    """
+    Replay an exported CSV as filtered-stream ndjson lines, `rate` tweets per
+    second. Serve them with MockTwitterAPI(streams=...) to read them through
+    stream_lines like the live stream.
+    """
+    df = pd.read_csv(path, dtype={'tweet_id': str}, **csv_read_options(pd.read_csv(path, nrows=0).columns))
+    df = df.sort_values('created_at')
+    for row in df.itertuples(index=False):
+        author_id = author_id_for(row.username)
+        yield json.dumps({
+            'data': {
+                'id': row.tweet_id,
+                'text': row.text,
+                'created_at': pd.Timestamp(row.created_at).strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+                'lang': row.language,
+                'author_id': author_id,
+                'public_metrics': {
+                    'retweet_count': int(row.retweet_count),
+                    'reply_count': int(row.reply_count),
+                    'like_count': int(row.like_count),
+                    'quote_count': int(row.quote_count),
+                },
+            },
+            'includes': {'users': [{
+                'id': author_id,
+                'username': row.username,
+                'name': row.user_display_name,
+                'verified': bool(row.user_verified),
+                'public_metrics': {'followers_count': int(row.user_followers)},
+            }]},
+        })
+        if rate:
+            time.sleep(1.0 / rate)
+
+# ========================================================================
+# MICRO-BATCHING
+# ========================================================================
+
+_END = object()
+
+class _ReaderError:
+    """Carries an exception from the reader thread to the consumer"""
+
+    def __init__(self, error):
+        self.error = error
+
+def iter_micro_batches(lines, max_size=BATCH_MAX_SIZE, max_wait=BATCH_MAX_WAIT):
+    """
+    Yield lists of (arrival_time, tweet dict) once `max_size` tweets are
+    waiting or `max_wait` seconds passed since the first one arrived.
+
+    A reader thread drains the stream into a queue, so a slow batch never
+    stalls the connection and a quiet stream still flushes on time. If the
+    stream raises, the waiting batch is yielded and the error re-raised here.
+    """
+    inbox = queue.Queue()
+
+    def read():
+        try:
+            for line in lines:
+                if line and line.strip():  # blank lines are keep-alives
+                    payload = json.loads(line)
+                    if 'data' in payload:
+                        inbox.put((time.monotonic(), v2_payload_row(payload)))
+        except BaseException as e:
+            inbox.put(_ReaderError(e))
+        else:
+            inbox.put(_END)
+
+    threading.Thread(target=read, daemon=True).start()
+
+    batch, deadline = [], None
+    while True:
+        timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+        try:
+            item = inbox.get(timeout=timeout)
+        except queue.Empty:
+            item = None
+        if item is _END or isinstance(item, _ReaderError):
+            if batch:
+                yield batch
+            if item is _END:
+                return
+            raise item.error
+        if item is not None:
+            batch.append(item)
+            if deadline is None:
+                deadline = item[0] + max_wait
+        if batch and (len(batch) >= max_size or time.monotonic() >= deadline):
+            yield batch
+            batch, deadline = [], None
+
+# ========================================================================
+# ROLLING AGGREGATES AND LATENCY
+# ========================================================================
+
+class RollingAggregates:
+    """Per-category counts, mean polarity and engagement over the last `window` seconds"""
+
+    def __init__(self, window=WINDOW_SECONDS):
+        self.window = window
+        self.buckets = deque()  # (time, counts by category, polarity sum, engagement sum, tweets)
+
+    def add(self, df, now):
+        counts = df['sentiment_category'].value_counts().to_dict()
+        self.buckets.append((now, counts, float(df['sentiment_score'].sum()),
+                             int(df['engagement'].sum()), len(df)))
+        while self.buckets and self.buckets[0][0] < now - self.window:
+            self.buckets.popleft()
+
+    def snapshot(self):
+        counts = {"Positive": 0, "Neutral": 0, "Negative": 0}
+        polarity = engagement = tweets = 0
+        for _, batch_counts, batch_polarity, batch_engagement, batch_tweets in self.buckets:
+            for category, count in batch_counts.items():
+                counts[category] = counts.get(category, 0) + count
+            polarity += batch_polarity
+            engagement += batch_engagement
+            tweets += batch_tweets
+        return {
+            'tweets': tweets,
+            'counts': counts,
+            'mean_polarity': polarity / tweets if tweets else 0.0,
+            'engagement': engagement,
+        }
+
+class LatencyTracker:
+    """Arrival-to-publish latency of the most recent `maxlen` tweets"""
+
+    def __init__(self, maxlen=10000):
+        self.samples = deque(maxlen=maxlen)
+
+    def add(self, arrivals, published):
+        self.samples.extend(published - arrival for arrival in arrivals)
+
+    def percentiles(self, points=(50, 95, 99)):
+        if not self.samples:
+            return {f"p{p}": 0.0 for p in points}
+        values = np.percentile(np.fromiter(self.samples, dtype=float), points)
+        return {f"p{p}": float(v) for p, v in zip(points, values)}
+
+# ========================================================================
+# STREAM RUNNER
+# ========================================================================
+
+def print_snapshot(snapshot):
+    counts = snapshot['counts']
+    latency = snapshot['latency_ms']
+    print(f"[{snapshot['time']}] {snapshot['tweets']} tweets in window | "
+          f"+{counts['Positive']} ={counts['Neutral']} -{counts['Negative']} | "
+          f"mean polarity {snapshot['mean_polarity']:.3f} | engagement {snapshot['engagement']:,} | "
+          f"latency p50 {latency['p50']:.0f}ms p95 {latency['p95']:.0f}ms p99 {latency['p99']:.0f}ms")
+
+def record_snapshot(metrics, snapshot):
+    """Expose the latest rolling window and latency percentiles as 'stream' metrics"""
+    metrics.record('stream', window_tweets=snapshot['tweets'], mean_polarity=snapshot['mean_polarity'],
+                   window_engagement=snapshot['engagement'],
+                   **{f"window_{category.lower()}": count for category, count in snapshot['counts'].items()},
+                   **{f"latency_{point}_ms": value for point, value in snapshot['latency_ms'].items()})
+
+def run_stream(lines, brand=BRAND_NAME, publish=print_snapshot, window=WINDOW_SECONDS,
+               max_size=BATCH_MAX_SIZE, max_wait=BATCH_MAX_WAIT, engine=SENTIMENT_ENGINE,
+               cache=None, metrics=NULL_METRICS):
+    """
+    Score a live stream in micro-batches and publish rolling aggregates
+    after every batch. Runs until the stream ends; returns the final snapshot.
+    Per-stage timings and the latest snapshot are kept in `metrics`.
+    """
+    cache = cache if cache is not None else SentimentCache()
+    aggregates = RollingAggregates(window)
+    latency = LatencyTracker()
+    snapshot = None
+    for batch in iter_micro_batches(lines, max_size, max_wait):
+        arrivals = [arrival for arrival, _ in batch]
+        df = process_batch(TweetColumns.from_rows(row for _, row in batch), brand, clean_tweets,
+                           engine=engine, cache=cache, metrics=metrics)
+        aggregates.add(df, time.monotonic())
+        latency.add(arrivals, time.monotonic())
+        snapshot = aggregates.snapshot()
+        snapshot['time'] = pd.Timestamp.now().strftime('%H:%M:%S')
+        snapshot['latency_ms'] = {k: v * 1000 for k, v in latency.percentiles().items()}
+        record_snapshot(metrics, snapshot)
+        publish(snapshot)
+    return snapshot
+
+# ========================================================================
+# ENTRY POINT
+# ========================================================================
+
+if __name__ == "__main__":
+    api_base_url = API_BASE_URL
+    if REPLAY_CSV:
+        # One scripted connection; the 404 once it closes ends the replay
+        replay = MockTwitterAPI({}, streams=[csv_replay_lines(REPLAY_CSV, REPLAY_RATE)]).start()
+        api_base_url = replay.url
+    ensure_stream_rule(BEARER_TOKEN, STREAM_RULE, api_base_url)
+    source = stream_lines(BEARER_TOKEN, api_base_url)
+    metrics = PipelineMetrics("stream")
+    if PROMETHEUS_PORT:
+        start_metrics_server(metrics, PROMETHEUS_PORT)
+        print(f"Serving metrics at http://127.0.0.1:{PROMETHEUS_PORT}/metrics")
+    try:
+        run_stream(source, metrics=metrics)
+    except KeyboardInterrupt:
+        print("Stream stopped.")
+        print(metrics.summary())
+    except requests.HTTPError as e:
+        if not (REPLAY_CSV and e.response.status_code == 404):
+            raise
+        print("Replay finished.")
+        print(metrics.summary())
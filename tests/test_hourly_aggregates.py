@@ -0,0 +1,44 @@
+import json
+
+import pandas as pd
+
+from hourly_aggregates import HourlyAggregates, counted_ranges_path
+from tweet_schema import time_columns
+
+FIRST_ID = 1981750224470126000  # October 2025, well outside the recent search window
+
+def scored(ids):
+    return pd.DataFrame({
+        'brand': "Tesla",
+        'tweet_id': [str(tweet_id) for tweet_id in ids],
+        'created_at': pd.Timestamp("2025-10-24 21:00", tz="UTC"),
+        'sentiment_score': 0.5,
+        'sentiment_category': "Positive",
+        'engagement': 1,
+    })
+
+def run(path, *batches):
+    aggregates = HourlyAggregates(path)
+    for batch in batches:
+        aggregates.write(scored(batch))
+    aggregates.close()
+    return HourlyAggregates(path)
+
+def test_gap_fill_below_an_old_range_is_counted(tmp_path):
+    path = str(tmp_path / "hourly.csv")
+    # An interrupted refresh counts the newest 30 tweets, newest first
+    run(path, range(FIRST_ID + 99, FIRST_ID + 84, -1), range(FIRST_ID + 84, FIRST_ID + 69, -1))
+    # Later refreshes deliver the older 70, then everything again
+    run(path, range(FIRST_ID + 69, FIRST_ID - 1, -1))
+    aggregates = run(path, range(FIRST_ID + 99, FIRST_ID - 1, -1))
+    assert aggregates.table['tweets'].sum() == 100
+    with open(counted_ranges_path(path)) as f:
+        assert json.load(f) == {"Tesla": [[FIRST_ID, FIRST_ID + 69], [FIRST_ID + 70, FIRST_ID + 99]]}
+
+def test_summary_time_columns_match_the_dataset(tmp_path):
+    aggregates = run(str(tmp_path / "hourly.csv"), range(FIRST_ID, FIRST_ID + 10))
+    summary = aggregates.summary()
+    dataset = time_columns(scored([FIRST_ID])['created_at'])
+    for column in ['date', 'hour', 'day_of_week']:
+        assert summary[column].dtype == dataset[column].dtype
+    assert summary.loc[0, 'day_of_week'] == "Friday"
@@ -0,0 +1,18 @@
+import pandas as pd
+
+from near_duplicates import NearDuplicateIndex
+
+TEMPLATE = "Congratulations you are selected for the Tesla giveaway claim your prize now and {}"
+
+def clusters(*endings):
+    texts = [TEMPLATE.format(ending) for ending in endings]
+    return NearDuplicateIndex().assign([str(i) for i in range(len(texts))], pd.Series(texts))
+
+def test_copies_share_a_cluster():
+    assigned = clusters("it is great", "it is great", "it is great.")
+    assert assigned['cluster_id'].tolist() == ["0", "0", "0"]
+    assert assigned['dup_rank'].tolist() == [0, 1, 2]
+
+def test_sentiment_words_and_exclamations_split_clusters():
+    assigned = clusters("it is great", "it is terrible", "it is great!!!", "it is great !!!", "it is not great")
+    assert assigned['cluster_id'].tolist() == ["0", "1", "2", "2", "4"]
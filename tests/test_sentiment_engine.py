@@ -0,0 +1,30 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from sentiment_engine import score_texts
+from tweet_normalizer import clean_tweets
+
+SAMPLE_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          "twitter_sentiment_Tesla_20251024_212058.csv")
+
+# Modifier and negation patterns of pattern's analyzer
+PHRASES = [
+    "good", "not good", "very good", "not very good", "really not good", "not really good",
+    "really not like", "I really do not like this!!", "Kindly never selected", "Kindly not Trump.",
+    "really is a good", "not a good", "so no good", "really n't", "great!!!", "it is great",
+    "extremely not nice", "truly awful :(", "happy :) day", "(!) sure",
+]
+
+@pytest.mark.parametrize("texts", [
+    PHRASES,
+    pd.read_csv(SAMPLE_CSV, keep_default_na=False)['text'].tolist(),
+], ids=["phrases", "sample_csv"])
+def test_lexicon_engine_matches_textblob(texts):
+    texts = texts + clean_tweets(texts).tolist()
+    expected = score_texts(texts, "textblob")
+    actual = score_texts(texts, "lexicon")
+    np.testing.assert_allclose(actual[0], expected[0], atol=1e-12)
+    np.testing.assert_allclose(actual[1], expected[1], atol=1e-12)
@@ -0,0 +1,54 @@
+import pandas as pd
+
+import sentiment_engine
+from sentiment_pipeline import MemorySink, run_pipeline
+from tweet_normalizer import clean_tweets
+from tweet_records import TweetColumns
+
+WORDS = ["great", "awful", "fine", "terrible", "lovely", "boring", "amazing", "sad"]
+
+def pages(n, page_size=100):
+    for start in range(0, n, page_size):
+        page = TweetColumns()
+        for i in range(start, min(start + page_size, n)):
+            page.append(str(i + 1), pd.Timestamp("2025-10-24 21:00", tz="UTC"), "user", "User",
+                        f"tweet {i} is {WORDS[i % len(WORDS)]}", 0, 0, 0, 0, 0, False, "en")
+        yield page
+
+def run(n, reports=None, **options):
+    sink = MemorySink()
+    run_pipeline(pages(n), [sink], "Tesla", clean_tweets, batch_size=50,
+                 report=(reports.append if reports is not None else print), **options)
+    return sink.result()
+
+def test_one_pool_serves_every_batch(monkeypatch):
+    created = []
+
+    class CountingExecutor(sentiment_engine.ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            created.append(self)
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(sentiment_engine, "ProcessPoolExecutor", CountingExecutor)
+    monkeypatch.setattr(sentiment_engine, "PARALLEL_MIN_ROWS", 100)
+    serial = run(400)
+    parallel = run(400, workers=2, expected_rows=400)
+    assert len(created) == 1
+    pd.testing.assert_frame_equal(parallel, serial)
+
+def test_pool_starts_once_the_run_reaches_the_threshold(monkeypatch):
+    monkeypatch.setattr(sentiment_engine, "PARALLEL_MIN_ROWS", 200)
+    reports = []
+    df = run(600, reports, workers=2)  # no expected_rows, e.g. a replay without --max-tweets
+    assert len(df) == 600
+    assert reports == ["Scoring in 2 worker processes"]
+
+def test_small_run_stays_serial_and_says_so(monkeypatch):
+    def no_pool(*args, **kwargs):
+        raise AssertionError("a 120-tweet run started a process pool")
+
+    monkeypatch.setattr(sentiment_engine, "ProcessPoolExecutor", no_pool)
+    reports = []
+    df = run(120, reports, workers=4, expected_rows=120)
+    assert len(df) == 120
+    assert any("serially" in message for message in reports)
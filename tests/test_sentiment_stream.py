@@ -0,0 +1,102 @@
+import json
+import time
+
+import pandas as pd
+import pytest
+import requests
+
+from mock_twitter_api import MockTwitterAPI
+from sentiment_stream import (RATE_LIMIT_BACKOFF, RECONNECT_BACKOFF, author_id_for, csv_replay_lines,
+                              ensure_stream_rule, iter_micro_batches, run_stream, stream_lines)
+
+FIRST_ID = 1981750224470126000
+
+def payload(tweet_id, text="Tesla is great"):
+    return json.dumps({
+        'data': {'id': str(tweet_id), 'text': text, 'created_at': "2025-10-24T21:00:00.000Z",
+                 'lang': "en", 'author_id': "1",
+                 'public_metrics': {'retweet_count': 0, 'reply_count': 0, 'like_count': 1, 'quote_count': 0}},
+        'includes': {'users': [{'id': "1", 'username': "user", 'name': "User", 'verified': False,
+                                'public_metrics': {'followers_count': 0}}]},
+    })
+
+def read_stream(streams):
+    """Every line stream_lines yields from the scripted connections, the sleeps between them and the final error"""
+    sleeps = []
+    with MockTwitterAPI({}, streams=streams) as api:
+        lines = stream_lines("test", api.url, sleep=sleeps.append)
+        received = []
+        with pytest.raises(requests.HTTPError) as error:
+            for line in lines:
+                received.append(line)
+    return received, sleeps, error.value.response.status_code
+
+def test_reconnects_after_drops_and_server_errors():
+    received, sleeps, status = read_stream([[payload(1), "", payload(2)], 503, [payload(3)]])
+    assert [json.loads(line)['data']['id'] for line in received if line] == ["1", "2", "3"]
+    assert "" in received  # keep-alives reach the reader
+    # Backoff grows across failed attempts and resets once a connection delivers data
+    assert sleeps == [RECONNECT_BACKOFF[0], RECONNECT_BACKOFF[1], RECONNECT_BACKOFF[0]]
+    assert status == 404  # out of scripted connections: not retried
+
+def test_rate_limited_connects_back_off_for_minutes():
+    received, sleeps, _ = read_stream([429, 429, [payload(1)]])
+    assert len(received) == 1
+    assert sleeps == [RATE_LIMIT_BACKOFF[0], RATE_LIMIT_BACKOFF[1], RECONNECT_BACKOFF[0]]
+
+def test_gives_up_when_the_backoff_is_spent():
+    _, sleeps, status = read_stream([503] * (len(RECONNECT_BACKOFF) + 1))
+    assert sleeps == list(RECONNECT_BACKOFF) and status == 503
+
+def test_stream_rule_is_added_once():
+    with MockTwitterAPI({}) as api:
+        ensure_stream_rule("test", "Tesla lang:en", api.url)
+        ensure_stream_rule("test", "Tesla lang:en", api.url)
+    assert [rule['value'] for rule in api.rules] == ["Tesla lang:en"]
+
+def test_batches_flush_at_max_size():
+    batches = list(iter_micro_batches([payload(i) for i in range(5)], max_size=2, max_wait=60))
+    assert [[row[0] for _, row in batch] for batch in batches] == [["0", "1"], ["2", "3"], ["4"]]
+
+def test_quiet_stream_flushes_after_max_wait():
+    def lines():
+        yield payload(1)
+        time.sleep(0.5)
+        yield payload(2)
+
+    started = time.monotonic()
+    batches = iter_micro_batches(lines(), max_size=50, max_wait=0.05)
+    first = next(batches)
+    assert len(first) == 1 and time.monotonic() - started < 0.4
+    assert [len(batch) for batch in batches] == [1]
+
+def test_stream_error_flushes_the_waiting_batch_first():
+    def lines():
+        yield payload(1)
+        raise requests.ConnectionError("dropped")
+
+    batches = iter_micro_batches(lines(), max_size=50, max_wait=60)
+    assert len(next(batches)) == 1
+    with pytest.raises(requests.ConnectionError):
+        next(batches)
+
+def test_csv_replay_runs_through_the_http_stream(tmp_path):
+    export = tmp_path / "tweets.csv"
+    pd.DataFrame({
+        'tweet_id': [str(FIRST_ID + i) for i in range(20)],
+        'created_at': pd.Timestamp("2025-10-24 21:00", tz="UTC"),
+        'username': ["alice", "bob"] * 10, 'user_display_name': "User",
+        'text': ["Tesla is great", "NA", "Tesla is awful", "null"] * 5,
+        'retweet_count': 0, 'reply_count': 0, 'like_count': 1, 'quote_count': 0,
+        'user_followers': 0, 'user_verified': False, 'language': "en",
+    }).to_csv(export, index=False)
+    snapshots = []
+    with MockTwitterAPI({}, streams=[csv_replay_lines(str(export), rate=None)]) as api:
+        with pytest.raises(requests.HTTPError):
+            run_stream(stream_lines("test", api.url, sleep=lambda seconds: None), "Tesla",
+                       publish=snapshots.append, max_size=8, max_wait=60)
+    assert [snapshot['tweets'] for snapshot in snapshots] == [8, 16, 20]
+    assert snapshots[-1]['counts'] == {"Positive": 5, "Neutral": 10, "Negative": 5}
+
+def test_replayed_author_ids_do_not_depend_on_the_process():
+    assert author_id_for("alice") == "90345298343275"
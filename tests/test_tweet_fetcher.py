@@ -0,0 +1,76 @@
+import os
+import warnings
+
+import pytest
+
+from instrumentation import PipelineMetrics
+from mock_twitter_api import MockTwitterAPI
+from tweet_fetcher import FetchProgress, iter_replay_pages, iter_search_pages, make_client
+from tweet_normalizer import clean_tweets
+
+RECORDINGS = os.path.join(os.path.dirname(__file__), "fixtures", "search_recent_tesla.json")
+RECORDED_TWEETS = 25  # 10 + 10 + 5 over three pages
+
+@pytest.fixture(autouse=True)
+def quiet_tweepy():
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        yield
+
+def search(api, max_tweets, max_wait=0, metrics=None):
+    client = make_client(bearer_token="test", max_wait=max_wait, api_base_url=api.url)
+    progress = FetchProgress()
+    pages = list(iter_search_pages(client, "Tesla", max_tweets, page_size=10, progress=progress,
+                                   metrics=metrics or PipelineMetrics("test")))
+    return client, pages, progress
+
+def test_follows_next_token_until_results_run_out():
+    with MockTwitterAPI(RECORDINGS) as api:
+        _, pages, progress = search(api, 100)
+    assert [len(page) for page in pages] == [10, 10, 5]
+    ids = [tweet_id for page in pages for tweet_id in page.tweet_id]
+    assert len(set(ids)) == RECORDED_TWEETS
+    recorded_tokens = [body['meta'].get('next_token') for _, body in api.recordings.values()]
+    assert [params.get('next_token') for _, params in api.requests] == [None] + recorded_tokens[:2]
+    assert progress.complete and progress.stopped is None
+    assert progress.newest_id == max(map(int, ids)) and progress.oldest_id == min(map(int, ids))
+
+def test_stops_at_max_tweets():
+    with MockTwitterAPI(RECORDINGS) as api:
+        _, pages, progress = search(api, 15)
+    assert sum(len(page) for page in pages) == 15
+    assert len(api.requests) == 2
+    assert not progress.complete and progress.stopped == "max_tweets"
+
+def test_budget_exhaustion_keeps_fetched_pages_and_is_recorded():
+    metrics = PipelineMetrics("test")
+    with MockTwitterAPI(RECORDINGS, requests_per_window=2) as api:
+        client, pages, progress = search(api, 100, metrics=metrics)
+    assert [len(page) for page in pages] == [10, 10]
+    # The spent budget stops the fetch before a third request is sent
+    assert len(api.requests) == 2
+    assert not progress.complete and progress.stopped.startswith("rate limit")
+    assert metrics.stages['fetch'].extra['truncated'] == 1
+    assert client.session.budget.waited == 0
+
+def test_budget_waits_for_a_short_window_reset():
+    with MockTwitterAPI(RECORDINGS, requests_per_window=2, window_seconds=1) as api:
+        client, pages, progress = search(api, 100, max_wait=5)
+    assert sum(len(page) for page in pages) == RECORDED_TWEETS
+    assert progress.complete
+    assert len(api.requests) == 3
+    assert client.session.budget.waited > 0
+
+def test_replay_keeps_tweets_that_look_like_missing_values(tmp_path):
+    path = tmp_path / "export.csv"
+    path.write_text(
+        "tweet_id,created_at,username,user_display_name,text,retweet_count,reply_count,"
+        "like_count,quote_count,user_followers,user_verified,language\n"
+        "1,2025-10-24 21:00:00+00:00,null,N/A,NA,0,0,0,0,0,False,en\n"
+        "2,2025-10-24 21:00:00+00:00,nan,,nan,0,0,0,0,0,False,en\n"
+    )
+    page = next(iter_replay_pages(str(path)))
+    assert page.text == ["NA", "nan"] and page.username == ["null", "nan"]
+    assert page.user_display_name == ["N/A", ""]
+    assert clean_tweets(page.text).tolist() == ["NA", "nan"]
+    assert clean_tweets([None, float("nan"), "hi @you"]).tolist() == ["", "", "hi"]
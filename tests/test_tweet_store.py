@@ -0,0 +1,64 @@
+from functools import partial
+
+import pandas as pd
+
+from tweet_fetcher import iter_replay_pages
+from tweet_store import advance_fetch_state, iter_refresh_pages, load_fetch_state, save_fetch_state
+
+FIRST_ID = 1900000000000000000
+
+def write_export(path, ids):
+    """A replay file of tweets with the given IDs, newest first like a search"""
+    ids = sorted(ids, reverse=True)
+    pd.DataFrame({
+        'tweet_id': [str(tweet_id) for tweet_id in ids],
+        'created_at': pd.Timestamp("2025-10-24", tz="UTC"),
+        'username': "user", 'user_display_name': "User", 'text': "Tesla",
+        'retweet_count': 0, 'reply_count': 0, 'like_count': 0, 'quote_count': 0,
+        'user_followers': 0, 'user_verified': False, 'language': "en",
+    }).to_csv(path, index=False)
+
+def refresh(export, state_path, max_tweets):
+    """One incremental refresh against the export; returns the tweet IDs it fetched"""
+    state = load_fetch_state(state_path, "Tesla", "Tesla")
+    searched = []
+    pages = iter_refresh_pages(state, partial(iter_replay_pages, str(export), page_size=10), max_tweets, searched)
+    ids = [int(tweet_id) for page in pages for tweet_id in page.tweet_id]
+    save_fetch_state(state_path, "Tesla", "Tesla", advance_fetch_state(state, searched))
+    return ids
+
+def test_first_refresh_fetches_the_newest_tweets_and_leaves_a_gap(tmp_path):
+    export, state_path = tmp_path / "tweets.csv", tmp_path / "state.json"
+    write_export(export, range(FIRST_ID, FIRST_ID + 50))
+    ids = refresh(export, state_path, 30)
+    assert ids == list(range(FIRST_ID + 49, FIRST_ID + 19, -1))
+    state = load_fetch_state(state_path, "Tesla", "Tesla")
+    assert state == {'newest_id': str(FIRST_ID + 49), 'gaps': [[None, str(FIRST_ID + 20)]]}
+
+def test_gap_closes_once_the_budget_reaches_it(tmp_path):
+    export, state_path = tmp_path / "tweets.csv", tmp_path / "state.json"
+    write_export(export, range(FIRST_ID, FIRST_ID + 50))
+    first = refresh(export, state_path, 30)
+    write_export(export, range(FIRST_ID, FIRST_ID + 60))  # 10 new tweets since
+    second = refresh(export, state_path, 40)
+    # New tweets come first, the rest of the budget fills the gap
+    assert second[:10] == list(range(FIRST_ID + 59, FIRST_ID + 49, -1))
+    assert sorted(first + second) == list(range(FIRST_ID, FIRST_ID + 60))
+    assert load_fetch_state(state_path, "Tesla", "Tesla") == {'newest_id': str(FIRST_ID + 59), 'gaps': []}
+
+def test_gap_persists_while_new_tweets_use_the_budget(tmp_path):
+    export, state_path = tmp_path / "tweets.csv", tmp_path / "state.json"
+    write_export(export, range(FIRST_ID, FIRST_ID + 50))
+    refresh(export, state_path, 30)
+    write_export(export, range(FIRST_ID, FIRST_ID + 100))  # 50 new tweets, more than the budget
+    ids = refresh(export, state_path, 30)
+    # The refresh still returns the newest tweets rather than draining the older gap
+    assert ids == list(range(FIRST_ID + 99, FIRST_ID + 69, -1))
+    state = load_fetch_state(state_path, "Tesla", "Tesla")
+    assert state['newest_id'] == str(FIRST_ID + 99)
+    assert state['gaps'] == [[None, str(FIRST_ID + 20)], [str(FIRST_ID + 49), str(FIRST_ID + 70)]]
+
+def test_older_single_gap_state_is_converted(tmp_path):
+    state_path = tmp_path / "state.json"
+    state_path.write_text('{"Tesla|Tesla": {"since_id": "10", "until_id": "20", "newest_id": "30"}}')
+    assert load_fetch_state(state_path, "Tesla", "Tesla") == {'newest_id': "30", 'gaps': [["10", "20"]]}
@@ -0,0 +1,179 @@
+# Real-Time Twitter Sentiment Analysis for Many Brands in One Run (Power BI and VS Code)
+
+from datetime import datetime, timedelta
+from hourly_aggregates import HourlyAggregates
+from influence_index import InfluenceIndex
+from instrumentation import NULL_METRICS, PipelineMetrics, profiled
+from sentiment_pipeline import CsvSink, MemorySink, run_pipeline
+from sentiment_cache import SentimentCache
+from sentiment_engine import preload
+from near_duplicates import NearDuplicateIndex
+from parquet_store import PartitionedParquetSink
+from tweet_fetcher import iter_brand_pages, make_client
+from tweet_normalizer import clean_tweets
+import warnings
+warnings.filterwarnings('ignore')
+
+# ========================================================================
+# CONFIGURATION
+# ========================================================================
+
+DEBUG = True   # True = VS Code mode (prints + saves CSV)
+               # False = Power BI mode (silent, no prints)
+
+API_KEY = "Your_API_Key_Here"
+API_SECRET = "Your_API_Secret_Here"
+ACCESS_TOKEN = "Your_Access_Token_Here"
+ACCESS_TOKEN_SECRET = "Your_Access_Token_Secret_Here"
+BEARER_TOKEN = "Your_Bearer_Token_Here"  # For API v2
+
+# One (brand, search query) pair per tracked brand; all share the API quota
+BRANDS = [
+    ("Brand_Name_Here", "Brand_Name_Here -is:retweet lang:en"),
+    ("Other_Brand_Here", "Other_Brand_Here -is:retweet lang:en"),
+]
+MAX_TWEETS = 100  # Tweets to fetch per brand per refresh
+DAYS_BACK = 7  # How many days of historical tweets to fetch (Must be <= 7 for free API)
+FETCH_WORKERS = 4  # Brands fetched at the same time over one pooled session
+MAX_RATE_LIMIT_WAIT = 60  # Seconds to wait for a rate-limit reset before returning the pages fetched so far
+API_BASE_URL = None  # e.g. "http://localhost:8000" to replay recorded API responses offline
+SENTIMENT_ENGINE = "textblob"  # "textblob" (reference), "lexicon" (vectorized NumPy, for large backfills), "vader" or "onnx"
+SCORING_WORKERS = 1  # >1 scores in a process pool kept for the run once it has PARALLEL_MIN_ROWS (20000) tweets (None = all cores)
+SCORING_CHUNK_SIZE = 5000  # Texts per worker task in parallel mode
+PIPELINE_BATCH_SIZE = 500  # Tweets cleaned, scored and written together, across brands
+SENTIMENT_CACHE_SIZE = 100000  # Scored texts kept in memory (LRU)
+SENTIMENT_CACHE_PATH = None  # e.g. "sentiment_cache.sqlite" to keep scores between refreshes
+OUTPUT_FORMAT = "csv"  # "csv" (debug-mode log per run) or "parquet" (appends to PARQUET_ROOT)
+PARQUET_ROOT = "twitter_sentiment_parquet"  # Partitioned by brand and date, compact dtypes
+INSTRUMENT = DEBUG  # Per-stage timings, rows and memory (off = no-op in Power BI mode)
+METRICS_LOG_PATH = "pipeline_metrics.jsonl"  # One JSON line per instrumented run
+PROMETHEUS_PATH = None  # e.g. "tweet_sentiment.prom" for the node_exporter textfile collector
+PROFILE = None  # "cprofile" or "tracemalloc" to profile a whole run
+HOURLY_AGGREGATES_PATH = None  # e.g. "twitter_sentiment_multi_hourly.csv" for the `hourly_summary` dashboard table
+NEAR_DUPLICATES = False  # Score one tweet per near-duplicate cluster (MinHash/LSH); adds cluster_id, dup_rank
+DOWNWEIGHT_DUPLICATES = False  # Count each near-duplicate cluster as one tweet in the hourly summary
+INFLUENCE_INDEX_PATH = None  # e.g. "twitter_influence_multi.pkl" for the `top_tweets` / `top_authors` tables
+INFLUENCE_TOP_K = 20  # Tweets per hourly ranking and authors per ranking
+
+# ========================================================================
+# HELPERS
+# ========================================================================
+
+def log(msg):
+    """Conditional print for debug mode"""
+    if DEBUG:
+        print(msg)
+
+SENTIMENT_CACHE = SentimentCache(max_entries=SENTIMENT_CACHE_SIZE, path=SENTIMENT_CACHE_PATH)
+INFLUENCE_INDEX = InfluenceIndex.load(INFLUENCE_INDEX_PATH, INFLUENCE_TOP_K) if INFLUENCE_INDEX_PATH else None
+HOURLY_AGGREGATES = HourlyAggregates(HOURLY_AGGREGATES_PATH, DOWNWEIGHT_DUPLICATES) if HOURLY_AGGREGATES_PATH else None
+
+# ========================================================================
+# TWITTER FETCHING
+# ========================================================================
+
+def iter_all_brand_pages(metrics=NULL_METRICS):
+    """Yield pages for every brand in BRANDS as the concurrent fetches return them"""
+    client = make_client(
+        bearer_token=BEARER_TOKEN,
+        consumer_key=API_KEY,
+        consumer_secret=API_SECRET,
+        access_token=ACCESS_TOKEN,
+        access_token_secret=ACCESS_TOKEN_SECRET,
+        max_wait=MAX_RATE_LIMIT_WAIT,
+        api_base_url=API_BASE_URL,
+        pool_size=FETCH_WORKERS
+    )
+    start_time = datetime.utcnow() - timedelta(days=DAYS_BACK)
+    fetched = {brand: 0 for brand, _ in BRANDS}
+    progress = {}
+    pages = iter_brand_pages(
+        client, BRANDS, MAX_TWEETS,
+        start_time=start_time.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        workers=FETCH_WORKERS,
+        on_error=lambda brand, e: log(f"Fetch error for {brand}: {e}"),
+        progress=progress
+    )
+    for page in pages:
+        brand = page.brand[0]
+        fetched[brand] += len(page)
+        log(f"Fetched page of {len(page)} tweets for {brand} ({fetched[brand]} total)")
+        yield page
+    metrics.record('fetch', rate_limit_wait_seconds=client.session.budget.waited)
+    if client.session.budget.waited:
+        log(f"Waited {client.session.budget.waited:.0f}s for rate-limit resets")
+    truncated = {brand: p.stopped for brand, p in progress.items() if p.stopped and p.stopped != "max_tweets"}
+    for brand, reason in truncated.items():
+        log(f"Fetch for {brand} stopped early ({reason}); older matching tweets were not fetched")
+    if truncated:
+        metrics.record('fetch', truncated_brands=len(truncated), truncated_reason=next(iter(truncated.values())))
+
+# ========================================================================
+# MAIN SENTIMENT PIPELINE
+# ========================================================================
+
+def process_sentiment_data():
+    metrics = PipelineMetrics("multi") if INSTRUMENT else NULL_METRICS
+    preload(SENTIMENT_ENGINE)  # the lexicon loads in the background while pages are fetched
+    # Pages from all brands are scored together in shared batches; `brand` keys the rows
+    dataset_sink = MemorySink()
+    sinks = [dataset_sink]
+    csv_filename = None
+    if OUTPUT_FORMAT == "parquet":
+        sinks.append(PartitionedParquetSink(PARQUET_ROOT))
+    elif DEBUG:
+        csv_filename = f"twitter_sentiment_multi_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        sinks.append(CsvSink(csv_filename))
+    if INFLUENCE_INDEX is not None:
+        sinks.append(INFLUENCE_INDEX)
+    if HOURLY_AGGREGATES is not None:
+        sinks.append(HOURLY_AGGREGATES)
+    dedup = NearDuplicateIndex() if NEAR_DUPLICATES else None
+
+    run_pipeline(
+        iter_all_brand_pages(metrics), sinks, None, clean_tweets,
+        batch_size=PIPELINE_BATCH_SIZE, metrics=metrics, engine=SENTIMENT_ENGINE,
+        workers=SCORING_WORKERS, chunk_size=SCORING_CHUNK_SIZE,
+        expected_rows=MAX_TWEETS * len(BRANDS), report=log,
+        cache=SENTIMENT_CACHE, dedup=dedup
+    )
+    df = dataset_sink.result()
+
+    if df.empty:
+        log("No data fetched.")
+
+    if DEBUG and not df.empty:
+        log(f"\nTotal tweets analyzed: {len(df)}")
+        summary = df.groupby('brand')['sentiment_category'].value_counts().unstack(fill_value=0)
+        log(summary.to_string())
+        log(SENTIMENT_CACHE.summary())
+        if dedup is not None:
+            log(dedup.summary())
+        if csv_filename:
+            log(f"Saved dataset to: {csv_filename}")
+        if OUTPUT_FORMAT == "parquet":
+            log(f"Appended dataset to: {PARQUET_ROOT}")
+
+    if INSTRUMENT:
+        log(f"\n{metrics.summary()}")
+        metrics.write_json(METRICS_LOG_PATH)
+        if PROMETHEUS_PATH:
+            metrics.write_prometheus(PROMETHEUS_PATH)
+    return df
+
+# ========================================================================
+# OUTPUT (Power BI reads these variables)
+# ========================================================================
+
+# Scoring pool workers re-import this script as "__mp_main__" on Windows;
+# only the real run should fetch and score.
+if __name__ != "__mp_main__":
+    with profiled(PROFILE, report=log):
+        dataset = process_sentiment_data()
+    if HOURLY_AGGREGATES is not None:
+        hourly_summary = HOURLY_AGGREGATES.summary()
+        log(f"Updated hourly summary ({len(hourly_summary)} rows): {HOURLY_AGGREGATES_PATH}")
+    if INFLUENCE_INDEX is not None:
+        top_tweets = INFLUENCE_INDEX.tweets_table()
+        top_authors = INFLUENCE_INDEX.authors_table()
+        log(f"Influence rankings: {len(top_tweets)} tweets, {len(top_authors)} authors")
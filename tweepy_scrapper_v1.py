@@ -1,9 +1,22 @@
 # Real-Time Twitter Sentiment Analysis for Power BI using Tweepy
 
-import pandas as pd
 from datetime import datetime, timedelta
-import re
-from textblob import TextBlob
+from functools import partial
+from hourly_aggregates import HourlyAggregates
+from influence_index import InfluenceIndex
+from instrumentation import NULL_METRICS, PipelineMetrics, profiled
+from sentiment_pipeline import MemorySink, run_pipeline
+from sentiment_cache import SentimentCache
+from sentiment_engine import categorize_sentiment as engine_category, preload, score_sentiment_batch
+from near_duplicates import NearDuplicateIndex
+from parquet_store import PartitionedParquetSink
+from tweet_fetcher import (FetchProgress, iter_replay_pages, iter_search_pages, iter_v1_search_pages,
+                           make_client, make_v1_api)
+from tweet_normalizer import clean_tweets
+from tweet_records import TweetColumns
+from tweet_schema import dataset_columns, empty_dataset
+from tweet_store import (advance_fetch_state, append_to_store, iter_refresh_pages, load_fetch_state, load_store,
+                         save_fetch_state)
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -22,69 +35,110 @@ BRAND_NAME = "BRAND_NAME"  # Change this to any brand you want to track
 SEARCH_QUERY = f"{BRAND_NAME} -is:retweet lang:en"  # Exclude retweets, English only
 
 # Scraping parameters
-MAX_TWEETS = 100  # Number of tweets to fetch per refresh (Must be between 10 and 100 for free API)
+MAX_TWEETS = 100  # Number of tweets to fetch per refresh (API v2 pages through 100 per request; free API allows 100)
 DAYS_BACK = 7  # How many days of historical tweets to fetch (Must be <= 7 for free API)
 
 # Use API v2 (recommended) or v1.1
 USE_API_V2 = True  # Set to False if using old API v1.1
+MAX_RATE_LIMIT_WAIT = 60  # Seconds to wait for a rate-limit reset before returning the pages fetched so far
+API_BASE_URL = None  # e.g. "http://localhost:8000" to replay recorded API responses offline
+REPLAY_PATH = None  # e.g. "twitter_sentiment_Tesla_20251024_212058.csv" to re-score an export instead of calling the API
+
+# Sentiment scoring engine
+SENTIMENT_ENGINE = "textblob"  # "textblob" (reference), "lexicon" (vectorized NumPy, for large backfills), "vader" or "onnx"
+SCORING_WORKERS = 1  # >1 scores in a process pool kept for the run once it has PARALLEL_MIN_ROWS (20000) tweets (None = all cores)
+SCORING_CHUNK_SIZE = 5000  # Texts per worker task in parallel mode
+PIPELINE_BATCH_SIZE = 500  # Tweets cleaned, scored and written together (bounds peak memory)
+SENTIMENT_CACHE_SIZE = 100000  # Scored texts kept in memory (LRU)
+SENTIMENT_CACHE_PATH = None  # e.g. "sentiment_cache.sqlite" to keep scores between refreshes
+
+# Incremental refresh: fetch only tweets newer than the last run (since_id)
+# and keep every scored tweet in one store deduplicated on tweet_id
+INCREMENTAL = False
+TWEET_STORE_PATH = f"twitter_sentiment_{BRAND_NAME}_store.csv"
+WATERMARK_PATH = "twitter_watermarks.json"
+
+# Output log: "csv" writes one file per run, "parquet" appends to a dataset
+# partitioned by brand and date with compact dtypes (needs pyarrow)
+OUTPUT_FORMAT = "csv"
+PARQUET_ROOT = "twitter_sentiment_parquet"
+
+# Instrumentation: per-stage wall time, rows, memory delta and rate-limit
+# waits, printed after the run and appended to METRICS_LOG_PATH as JSON
+INSTRUMENT = False
+METRICS_LOG_PATH = "pipeline_metrics.jsonl"
+PROMETHEUS_PATH = None  # e.g. "tweet_sentiment.prom" for the node_exporter textfile collector
+PROFILE = None  # "cprofile" or "tracemalloc" to profile a whole run
+
+# Dashboard summary: per-brand, per-hour counts, score sums and engagement
+# totals, updated with only the new tweets each refresh and exposed to
+# Power BI as a second table (`hourly_summary`)
+HOURLY_AGGREGATES_PATH = None  # e.g. f"twitter_sentiment_{BRAND_NAME}_hourly.csv"
+
+# Near-duplicate collapsing: bot/giveaway posts that differ only in a few
+# words are clustered (MinHash/LSH) and scored once; the dataset gains
+# cluster_id and dup_rank columns
+NEAR_DUPLICATES = False
+DOWNWEIGHT_DUPLICATES = False  # Count each cluster as one tweet in the hourly summary
+DATASET_COLUMNS = dataset_columns(NEAR_DUPLICATES)
+
+# Influence ranking: top tweets per hour and top authors by reach (engagement,
+# followers, verified) times sentiment magnitude, kept in bounded heaps and
+# exposed to Power BI as `top_tweets` and `top_authors`
+INFLUENCE_INDEX_PATH = None  # e.g. f"twitter_influence_{BRAND_NAME}.pkl"
+INFLUENCE_TOP_K = 20
 
 # ============================================================================
 # SENTIMENT ANALYSIS FUNCTIONS
 # ============================================================================
 
-def clean_tweet(tweet):
-    """Clean tweet text for better sentiment analysis"""
-    # Remove URLs
-    tweet = re.sub(r'http\S+|www.\S+', '', tweet)
-    # Remove mentions
-    tweet = re.sub(r'@\w+', '', tweet)
-    # Remove hashtags symbol but keep text
-    tweet = re.sub(r'#(\w+)', r'\1', tweet)
-    # Remove extra whitespace
-    tweet = re.sub(r'\s+', ' ', tweet).strip()
-    return tweet
+SENTIMENT_CACHE = SentimentCache(max_entries=SENTIMENT_CACHE_SIZE, path=SENTIMENT_CACHE_PATH)
+INFLUENCE_INDEX = InfluenceIndex.load(INFLUENCE_INDEX_PATH, INFLUENCE_TOP_K) if INFLUENCE_INDEX_PATH else None
+HOURLY_AGGREGATES = HourlyAggregates(HOURLY_AGGREGATES_PATH, DOWNWEIGHT_DUPLICATES) if HOURLY_AGGREGATES_PATH else None
+
+def get_cached_sentiment(text):
+    """Return (polarity, subjectivity, category) from SENTIMENT_ENGINE, checking the cache first"""
+    scores = score_sentiment_batch([text], engine=SENTIMENT_ENGINE, cache=SENTIMENT_CACHE)
+    return next(scores.itertuples(index=False, name=None))
 
 def get_sentiment_score(text):
-    """Calculate sentiment polarity using TextBlob"""
-    try:
-        blob = TextBlob(text)
-        return blob.sentiment.polarity
-    except:
-        return 0.0
+    """Calculate sentiment polarity using SENTIMENT_ENGINE"""
+    return get_cached_sentiment(text)[0]
 
 def get_sentiment_subjectivity(text):
-    """Calculate sentiment subjectivity using TextBlob"""
-    try:
-        blob = TextBlob(text)
-        return blob.sentiment.subjectivity
-    except:
-        return 0.0
+    """Calculate sentiment subjectivity using SENTIMENT_ENGINE"""
+    return get_cached_sentiment(text)[1]
 
 def categorize_sentiment(score):
-    """Categorize sentiment into Positive, Negative, or Neutral"""
-    if score > 0.1:
-        return "Positive"
-    elif score < -0.1:
-        return "Negative"
-    else:
-        return "Neutral"
+    """Categorize sentiment into Positive, Negative, or Neutral (SENTIMENT_ENGINE's thresholds)"""
+    return engine_category(score, SENTIMENT_ENGINE)
 
 # ============================================================================
 # TWITTER DATA FETCHING WITH TWEEPY
 # ============================================================================
 
-def fetch_tweets_with_tweepy():
+def iter_tweet_pages(since_id=None, metrics=NULL_METRICS, progress=None, until_id=None, max_tweets=MAX_TWEETS):
     """
-    Fetch tweets using Tweepy (Twitter API)
+    Fetch tweets using Tweepy (Twitter API), yielding them page by page
+    as TweetColumns pages so scoring can start before the fetch ends.
+    `progress` (a FetchProgress) says whether the search ran to the end.
     This function runs directly in Power BI!
     """
+    progress = progress if progress is not None else FetchProgress()
+    
+    if REPLAY_PATH:
+        # Offline: re-score a saved export, no credentials needed
+        print(f"Replaying tweets from: {REPLAY_PATH}")
+        yield from iter_replay_pages(REPLAY_PATH, max_tweets, since_id, progress=progress,
+                                     until_id=until_id)
+        return
     
     try:
         import tweepy
     except ImportError:
         print("ERROR: tweepy not installed!")
         print("Install with: pip install tweepy")
-        return pd.DataFrame()
+        return
     
     # Check if API credentials are set
     if API_KEY == "your_api_key_here" or not API_KEY:
@@ -101,104 +155,68 @@ def fetch_tweets_with_tweepy():
         if USE_API_V2:
             print("  - BEARER_TOKEN (for API v2)")
         print("="*70 + "\n")
-        return pd.DataFrame()
+        return
     
-    tweets_data = []
+    fetched = 0
     
     try:
         print(f"Connecting to Twitter API...")
         print(f"Searching for: {SEARCH_QUERY}")
-        print(f"Max tweets: {MAX_TWEETS}")
+        print(f"Max tweets: {max_tweets}")
         
         if USE_API_V2:
             # ===== TWITTER API V2 (RECOMMENDED) =====
             print("Using Twitter API v2...")
             
-            client = tweepy.Client(
+            # Rate limits are scheduled by the fetcher from the x-rate-limit
+            # headers instead of sleeping inside tweepy
+            client = make_client(
                 bearer_token=BEARER_TOKEN,
                 consumer_key=API_KEY,
                 consumer_secret=API_SECRET,
                 access_token=ACCESS_TOKEN,
                 access_token_secret=ACCESS_TOKEN_SECRET,
-                wait_on_rate_limit=True
+                max_wait=MAX_RATE_LIMIT_WAIT,
+                api_base_url=API_BASE_URL
             )
             
             # Calculate start_time (tweets from last X days)
             start_time = datetime.utcnow() - timedelta(days=DAYS_BACK)
             start_time_str = start_time.strftime('%Y-%m-%dT%H:%M:%SZ')
             
-            # Search recent tweets
-            response = client.search_recent_tweets(
-                query=SEARCH_QUERY,
-                max_results=min(MAX_TWEETS, 100),  # API limit is 100 per request
-                tweet_fields=['created_at', 'public_metrics', 'lang', 'author_id'],
-                user_fields=['username', 'name', 'verified', 'public_metrics'],
-                expansions=['author_id'],
-                start_time=start_time_str
+            # Search recent tweets, following next_token up to MAX_TWEETS
+            pages = iter_search_pages(
+                client, SEARCH_QUERY, max_tweets,
+                start_time=start_time_str,
+                since_id=since_id,  # Only tweets newer than the last refresh (incremental mode)
+                until_id=until_id,  # ...or older than where an interrupted refresh stopped
+                progress=progress, metrics=metrics
             )
+            for page in pages:
+                fetched += len(page)
+                print(f"  Fetched page of {len(page)} tweets ({fetched} total)")
+                yield page
+            metrics.record('fetch', rate_limit_wait_seconds=client.session.budget.waited)
+            if progress.stopped and progress.stopped != "max_tweets":
+                print(f"⚠️  Fetch stopped early ({progress.stopped}); older matching tweets were not fetched")
             
-            if response.data:
-                # Create user lookup dictionary
-                users = {user.id: user for user in response.includes['users']}
-                
-                for tweet in response.data:
-                    user = users.get(tweet.author_id)
-                    
-                    tweets_data.append({
-                        'tweet_id': str(tweet.id),
-                        'created_at': tweet.created_at,
-                        'username': user.username if user else 'unknown',
-                        'user_display_name': user.name if user else 'unknown',
-                        'text': tweet.text,
-                        'retweet_count': tweet.public_metrics['retweet_count'],
-                        'reply_count': tweet.public_metrics['reply_count'],
-                        'like_count': tweet.public_metrics['like_count'],
-                        'quote_count': tweet.public_metrics['quote_count'],
-                        'user_followers': user.public_metrics['followers_count'] if user else 0,
-                        'user_verified': user.verified if user else False,
-                        'language': tweet.lang
-                    })
-                
-                print(f"✓ Successfully fetched {len(tweets_data)} tweets using API v2")
+            if fetched:
+                print(f"✓ Successfully fetched {fetched} tweets using API v2")
             else:
                 print("No tweets found matching the search criteria")
-        
         else:
             # ===== TWITTER API V1.1 (LEGACY) =====
             print("Using Twitter API v1.1...")
             
-            auth = tweepy.OAuthHandler(API_KEY, API_SECRET)
-            auth.set_access_token(ACCESS_TOKEN, ACCESS_TOKEN_SECRET)
-            api = tweepy.API(auth, wait_on_rate_limit=True)
-            
-            # Search tweets
-            tweets = tweepy.Cursor(
-                api.search_tweets,
-                q=SEARCH_QUERY,
-                lang='en',
-                tweet_mode='extended',
-                result_type='recent'
-            ).items(MAX_TWEETS)
+            api = make_v1_api(API_KEY, API_SECRET, ACCESS_TOKEN, ACCESS_TOKEN_SECRET)
             
-            for tweet in tweets:
-                tweets_data.append({
-                    'tweet_id': str(tweet.id),
-                    'created_at': tweet.created_at,
-                    'username': tweet.user.screen_name,
-                    'user_display_name': tweet.user.name,
-                    'text': tweet.full_text,
-                    'retweet_count': tweet.retweet_count,
-                    'reply_count': 0,  # Not available in v1.1
-                    'like_count': tweet.favorite_count,
-                    'quote_count': 0,  # Not available in v1.1
-                    'user_followers': tweet.user.followers_count,
-                    'user_verified': tweet.user.verified,
-                    'language': tweet.lang
-                })
+            # Search tweets (reply and quote counts are not available in v1.1)
+            for page in iter_v1_search_pages(api, SEARCH_QUERY, max_tweets, since_id=since_id,
+                                             until_id=until_id, progress=progress, metrics=metrics):
+                fetched += len(page)
+                yield page
             
-            print(f"✓ Successfully fetched {len(tweets_data)} tweets using API v1.1")
-        
-        return pd.DataFrame(tweets_data)
+            print(f"✓ Successfully fetched {fetched} tweets using API v1.1")
         
     except tweepy.TweepyException as e:
         print(f"Twitter API Error: {e}")
@@ -208,19 +226,40 @@ def fetch_tweets_with_tweepy():
             print("⚠️  Authentication failed. Check your API credentials.")
         elif "403" in str(e):
             print("⚠️  Access forbidden. Make sure your app has read permissions.")
-        return pd.DataFrame()
+        return
     
     except Exception as e:
         print(f"Error fetching tweets: {e}")
-        return pd.DataFrame()
+        return
+
+def fetch_tweets_with_tweepy(since_id=None):
+    """Fetch all tweets at once as a DataFrame"""
+    tweets = TweetColumns()
+    for page in iter_tweet_pages(since_id):
+        tweets.extend(page)
+    return tweets.to_frame()
 
 # ============================================================================
 # MAIN PROCESSING PIPELINE
 # ============================================================================
 
-def process_sentiment_data():
+def update_tweet_store(df, fetch_state, searched):
+    """Append newly scored tweets to the store, advance the watermark, return the stored window"""
+    added = append_to_store(df, TWEET_STORE_PATH)
+    # The state only covers tweets the searches actually reached
+    fetch_state = advance_fetch_state(fetch_state, searched)
+    save_fetch_state(WATERMARK_PATH, BRAND_NAME, SEARCH_QUERY, fetch_state)
+    print(f"✓ Added {added} new tweets to {TWEET_STORE_PATH}")
+    if fetch_state['gaps']:
+        print(f"⚠️  {len(fetch_state['gaps'])} gap(s) of older tweets left; later refreshes fill them after fetching new tweets")
+    return load_store(TWEET_STORE_PATH, DATASET_COLUMNS, DAYS_BACK)
+
+def process_sentiment_data(metrics=NULL_METRICS):
     """Main function to fetch, clean, and analyze tweets"""
     
+    # Load the sentiment lexicon in the background while the first pages are fetched
+    preload(SENTIMENT_ENGINE)
+    
     print("\n" + "="*70)
     print("TWITTER SENTIMENT ANALYSIS - POWER BI")
     print("="*70)
@@ -228,56 +267,55 @@ def process_sentiment_data():
     print(f"Query: {SEARCH_QUERY}")
     print("="*70 + "\n")
     
-    # Fetch tweets
-    df = fetch_tweets_with_tweepy()
+    # Incremental mode fetches the tweets newer than the newest stored one,
+    # then spends what is left of MAX_TWEETS on gaps interrupted refreshes left
+    fetch_state = {'newest_id': None, 'gaps': []}
+    if INCREMENTAL:
+        # A replayed export is not bound to the search window
+        fetch_state = load_fetch_state(WATERMARK_PATH, BRAND_NAME, SEARCH_QUERY, None if REPLAY_PATH else DAYS_BACK)
+        if fetch_state['newest_id']:
+            print(f"Incremental refresh: fetching tweets newer than {fetch_state['newest_id']}")
+        if fetch_state['gaps']:
+            print(f"Incremental refresh: {len(fetch_state['gaps'])} gap(s) of older tweets to fill")
+    searched = []
+    
+    # Fetch, clean, score and derive features batch by batch as pages arrive
+    dataset_sink = MemorySink()
+    sinks = [dataset_sink]
+    if OUTPUT_FORMAT == "parquet":
+        sinks.append(PartitionedParquetSink(PARQUET_ROOT))
+    if INFLUENCE_INDEX is not None:
+        sinks.append(INFLUENCE_INDEX)
+    if HOURLY_AGGREGATES is not None:
+        sinks.append(HOURLY_AGGREGATES)
+    dedup = NearDuplicateIndex() if NEAR_DUPLICATES else None
+    processed = run_pipeline(
+        iter_refresh_pages(fetch_state, partial(iter_tweet_pages, metrics=metrics), MAX_TWEETS, searched),
+        sinks, BRAND_NAME, clean_tweets,
+        batch_size=PIPELINE_BATCH_SIZE, metrics=metrics, engine=SENTIMENT_ENGINE,
+        workers=SCORING_WORKERS, chunk_size=SCORING_CHUNK_SIZE, expected_rows=MAX_TWEETS,
+        cache=SENTIMENT_CACHE, dedup=dedup
+    )
+    df = dataset_sink.result()
+    print(f"\nProcessed {processed} tweets")
+    if dedup is not None:
+        print(dedup.summary())
+    
+    if df.empty and INCREMENTAL:
+        print("\nNo new tweets since the last refresh.")
+        with metrics.stage('export'):
+            return update_tweet_store(df, fetch_state, searched)
     
     if df.empty:
         print("\n⚠️  No tweets fetched. Returning empty dataset.")
         print("Check your API credentials and search query.")
-        # Return empty dataframe with expected schema
-        return pd.DataFrame(columns=[
-            'tweet_id', 'created_at', 'date', 'hour', 'day_of_week',
-            'brand', 'username', 'user_display_name', 'text', 'cleaned_text',
-            'sentiment_score', 'sentiment_subjectivity', 'sentiment_category',
-            'retweet_count', 'reply_count', 'like_count', 'quote_count',
-            'engagement', 'user_followers', 'user_verified', 'language'
-        ])
-    
-    print(f"\nProcessing {len(df)} tweets...")
-    
-    # Clean tweet text
-    df['cleaned_text'] = df['text'].apply(clean_tweet)
+        # Empty dataframe with expected schema
+        return df
     
-    # Calculate sentiment scores
-    df['sentiment_score'] = df['cleaned_text'].apply(get_sentiment_score)
-    df['sentiment_subjectivity'] = df['cleaned_text'].apply(get_sentiment_subjectivity)
-    df['sentiment_category'] = df['sentiment_score'].apply(categorize_sentiment)
-    
-    # Add brand column
-    df['brand'] = BRAND_NAME
-    
-    # Calculate engagement metric
-    df['engagement'] = (df['like_count'] + 
-                       df['retweet_count'] + 
-                       df['reply_count'] + 
-                       df['quote_count'])
-    
-    # Add time-based features
-    df['created_at'] = pd.to_datetime(df['created_at'])
-    df['date'] = df['created_at'].dt.date
-    df['hour'] = df['created_at'].dt.hour
-    df['day_of_week'] = df['created_at'].dt.day_name()
-    
-    # Select and order columns for Power BI
-    output_columns = [
-        'tweet_id', 'created_at', 'date', 'hour', 'day_of_week',
-        'brand', 'username', 'user_display_name', 'text', 'cleaned_text',
-        'sentiment_score', 'sentiment_subjectivity', 'sentiment_category',
-        'retweet_count', 'reply_count', 'like_count', 'quote_count',
-        'engagement', 'user_followers', 'user_verified', 'language'
-    ]
-    
-    df = df[output_columns]
+    # Merge the new tweets into the store and report on the whole window
+    if INCREMENTAL:
+        with metrics.stage('export', len(df)):
+            df = update_tweet_store(df, fetch_state, searched)
     
     # Print summary
     print("\n" + "="*70)
@@ -293,6 +331,7 @@ def process_sentiment_data():
     print(f"\nAverage sentiment score: {df['sentiment_score'].mean():.3f}")
     print(f"Average engagement: {df['engagement'].mean():.1f}")
     print(f"Total engagement: {df['engagement'].sum():,}")
+    print(SENTIMENT_CACHE.summary())
     print("="*70 + "\n")
     
     return df
@@ -302,22 +341,38 @@ def process_sentiment_data():
 # ============================================================================
 
 
-try:
-    dataset = process_sentiment_data()
-    print(f"✓ Dataset ready for Power BI with {len(dataset)} rows")
-    # Save CSV log 
-    csv_filename = f"twitter_sentiment_{BRAND_NAME}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-    dataset.to_csv(csv_filename, index=False)
-    print(f"✓ Saved dataset to CSV file: {csv_filename}")
-except Exception as e:
-    print(f"✗ Error in main execution: {e}")
-    import traceback
-    traceback.print_exc()
-    # Return empty dataframe with expected schema on error
-    dataset = pd.DataFrame(columns=[
-        'tweet_id', 'created_at', 'date', 'hour', 'day_of_week',
-        'brand', 'username', 'user_display_name', 'text', 'cleaned_text',
-        'sentiment_score', 'sentiment_subjectivity', 'sentiment_category',
-        'retweet_count', 'reply_count', 'like_count', 'quote_count',
-        'engagement', 'user_followers', 'user_verified', 'language'
-    ])
+# Scoring pool workers re-import this script as "__mp_main__" on Windows;
+# only the real run should fetch and score.
+if __name__ != "__mp_main__":
+    metrics = PipelineMetrics("v1") if INSTRUMENT else NULL_METRICS
+    try:
+        with profiled(PROFILE):
+            dataset = process_sentiment_data(metrics)
+            print(f"✓ Dataset ready for Power BI with {len(dataset)} rows")
+            # Save CSV log (incremental mode keeps everything in TWEET_STORE_PATH,
+            # parquet mode already appended each batch under PARQUET_ROOT)
+            if OUTPUT_FORMAT == "parquet":
+                print(f"✓ Appended dataset to Parquet store: {PARQUET_ROOT}")
+            elif not INCREMENTAL:
+                csv_filename = f"twitter_sentiment_{BRAND_NAME}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+                with metrics.stage('export', len(dataset)):
+                    dataset.to_csv(csv_filename, index=False)
+                print(f"✓ Saved dataset to CSV file: {csv_filename}")
+            if HOURLY_AGGREGATES is not None:
+                hourly_summary = HOURLY_AGGREGATES.summary()
+                print(f"✓ Hourly summary ready with {len(hourly_summary)} rows: {HOURLY_AGGREGATES_PATH}")
+            if INFLUENCE_INDEX is not None:
+                top_tweets = INFLUENCE_INDEX.tweets_table()
+                top_authors = INFLUENCE_INDEX.authors_table()
+                print(f"✓ Influence rankings ready: {len(top_tweets)} tweets, {len(top_authors)} authors")
+        if INSTRUMENT:
+            print(f"\nStage timings:\n{metrics.summary()}")
+            metrics.write_json(METRICS_LOG_PATH)
+            if PROMETHEUS_PATH:
+                metrics.write_prometheus(PROMETHEUS_PATH)
+    except Exception as e:
+        print(f"✗ Error in main execution: {e}")
+        import traceback
+        traceback.print_exc()
+        # Return empty dataframe with expected schema on error
+        dataset = empty_dataset(DATASET_COLUMNS)
@@ -1,9 +1,22 @@
 # Real-Time Twitter Sentiment Analysis for Power BI and VS Code
 
-import pandas as pd
 from datetime import datetime, timedelta
-import re
-from textblob import TextBlob
+from functools import partial
+from hourly_aggregates import HourlyAggregates
+from influence_index import InfluenceIndex
+from instrumentation import NULL_METRICS, PipelineMetrics, profiled
+from sentiment_pipeline import CsvSink, MemorySink, run_pipeline
+from sentiment_cache import SentimentCache
+from sentiment_engine import categorize_sentiment as engine_category, preload, score_sentiment_batch
+from near_duplicates import NearDuplicateIndex
+from parquet_store import PartitionedParquetSink
+from tweet_fetcher import (FetchProgress, iter_replay_pages, iter_search_pages, iter_v1_search_pages,
+                           make_client, make_v1_api)
+from tweet_normalizer import clean_tweets
+from tweet_records import TweetColumns
+from tweet_schema import dataset_columns
+from tweet_store import (advance_fetch_state, append_to_store, iter_refresh_pages, load_fetch_state, load_store,
+                         save_fetch_state)
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -22,9 +35,32 @@ BEARER_TOKEN = "Your_Bearer_Token_Here"  # For API v2
 
 BRAND_NAME = "Brand_Name_Here"  # Change this to any brand you want to track
 SEARCH_QUERY = f"{BRAND_NAME} -is:retweet lang:en"
-MAX_TWEETS = 100  # Number of tweets to fetch per refresh (Must be between 10 and 100 for free API)
+MAX_TWEETS = 100  # Number of tweets to fetch per refresh (API v2 pages through 100 per request; free API allows 100)
 DAYS_BACK = 7  # How many days of historical tweets to fetch (Must be <= 7 for free API)
 USE_API_V2 = True # Set to True to use Twitter API v2, False for v1.1
+MAX_RATE_LIMIT_WAIT = 60  # Seconds to wait for a rate-limit reset before returning the pages fetched so far
+API_BASE_URL = None  # e.g. "http://localhost:8000" to replay recorded API responses offline
+REPLAY_PATH = None  # e.g. "twitter_sentiment_Tesla_20251024_212058.csv" to re-score an export instead of calling the API
+SENTIMENT_ENGINE = "textblob"  # "textblob" (reference), "lexicon" (vectorized NumPy, for large backfills), "vader" or "onnx"
+SCORING_WORKERS = 1  # >1 scores in a process pool kept for the run once it has PARALLEL_MIN_ROWS (20000) tweets (None = all cores)
+SCORING_CHUNK_SIZE = 5000  # Texts per worker task in parallel mode
+PIPELINE_BATCH_SIZE = 500  # Tweets cleaned, scored and written together (bounds peak memory)
+SENTIMENT_CACHE_SIZE = 100000  # Scored texts kept in memory (LRU)
+SENTIMENT_CACHE_PATH = None  # e.g. "sentiment_cache.sqlite" to keep scores between refreshes
+INCREMENTAL = False  # True = fetch only tweets newer than the last run, keep a deduplicated store
+TWEET_STORE_PATH = f"twitter_sentiment_{BRAND_NAME}_store.csv"
+WATERMARK_PATH = "twitter_watermarks.json"
+OUTPUT_FORMAT = "csv"  # "csv" (debug-mode log per run) or "parquet" (appends to PARQUET_ROOT)
+PARQUET_ROOT = "twitter_sentiment_parquet"  # Partitioned by brand and date, compact dtypes
+INSTRUMENT = DEBUG  # Per-stage timings, rows and memory (off = no-op in Power BI mode)
+METRICS_LOG_PATH = "pipeline_metrics.jsonl"  # One JSON line per instrumented run
+PROMETHEUS_PATH = None  # e.g. "tweet_sentiment.prom" for the node_exporter textfile collector
+PROFILE = None  # "cprofile" or "tracemalloc" to profile a whole run
+HOURLY_AGGREGATES_PATH = None  # e.g. f"twitter_sentiment_{BRAND_NAME}_hourly.csv" for the `hourly_summary` dashboard table
+NEAR_DUPLICATES = False  # Score one tweet per near-duplicate cluster (MinHash/LSH); adds cluster_id, dup_rank
+DOWNWEIGHT_DUPLICATES = False  # Count each near-duplicate cluster as one tweet in the hourly summary
+INFLUENCE_INDEX_PATH = None  # e.g. f"twitter_influence_{BRAND_NAME}.pkl" for the `top_tweets` / `top_authors` tables
+INFLUENCE_TOP_K = 20  # Tweets per hourly ranking and authors per ranking
 
 # ========================================================================
 # SENTIMENT HELPERS
@@ -35,170 +71,179 @@ def log(msg):
     if DEBUG:
         print(msg)
 
-def clean_tweet(tweet):
-    tweet = re.sub(r'http\S+|www.\S+', '', tweet)
-    tweet = re.sub(r'@\w+', '', tweet)
-    tweet = re.sub(r'#(\w+)', r'\1', tweet)
-    tweet = re.sub(r'\s+', ' ', tweet).strip()
-    return tweet
+SENTIMENT_CACHE = SentimentCache(max_entries=SENTIMENT_CACHE_SIZE, path=SENTIMENT_CACHE_PATH)
+INFLUENCE_INDEX = InfluenceIndex.load(INFLUENCE_INDEX_PATH, INFLUENCE_TOP_K) if INFLUENCE_INDEX_PATH else None
+HOURLY_AGGREGATES = HourlyAggregates(HOURLY_AGGREGATES_PATH, DOWNWEIGHT_DUPLICATES) if HOURLY_AGGREGATES_PATH else None
+
+def get_cached_sentiment(text):
+    scores = score_sentiment_batch([text], engine=SENTIMENT_ENGINE, cache=SENTIMENT_CACHE)
+    return next(scores.itertuples(index=False, name=None))
 
 def get_sentiment_score(text):
-    try:
-        return TextBlob(text).sentiment.polarity
-    except:
-        return 0.0
+    return get_cached_sentiment(text)[0]
 
 def get_sentiment_subjectivity(text):
-    try:
-        return TextBlob(text).sentiment.subjectivity
-    except:
-        return 0.0
+    return get_cached_sentiment(text)[1]
 
 def categorize_sentiment(score):
-    if score > 0.1:
-        return "Positive"
-    elif score < -0.1:
-        return "Negative"
-    else:
-        return "Neutral"
+    return engine_category(score, SENTIMENT_ENGINE)
 
 # ========================================================================
 # TWITTER FETCHING
 # ========================================================================
 
-def fetch_tweets_with_tweepy():
-    import tweepy
-    tweets_data = []
+def iter_tweet_pages(since_id=None, metrics=NULL_METRICS, progress=None, until_id=None, max_tweets=MAX_TWEETS):
+    """Yield fetched tweets page by page, as TweetColumns pages; `progress` says how far the search got"""
+    progress = progress if progress is not None else FetchProgress()
+    fetched = 0
 
     try:
-        if USE_API_V2:
+        if REPLAY_PATH:
+            log(f"Replaying {REPLAY_PATH}...")
+            for page in iter_replay_pages(REPLAY_PATH, max_tweets, since_id, progress=progress, until_id=until_id):
+                fetched += len(page)
+                yield page
+        elif USE_API_V2:
             log("Using Twitter API v2...")
-            client = tweepy.Client(
+            client = make_client(
                 bearer_token=BEARER_TOKEN,
                 consumer_key=API_KEY,
                 consumer_secret=API_SECRET,
                 access_token=ACCESS_TOKEN,
                 access_token_secret=ACCESS_TOKEN_SECRET,
-                wait_on_rate_limit=True
+                max_wait=MAX_RATE_LIMIT_WAIT,
+                api_base_url=API_BASE_URL
             )
 
             start_time = datetime.utcnow() - timedelta(days=DAYS_BACK)
-            response = client.search_recent_tweets(
-                query=SEARCH_QUERY,
-                max_results=min(MAX_TWEETS, 100),
-                tweet_fields=['created_at', 'public_metrics', 'lang', 'author_id'],
-                user_fields=['username', 'name', 'verified', 'public_metrics'],
-                expansions=['author_id'],
-                start_time=start_time.strftime('%Y-%m-%dT%H:%M:%SZ')
+            pages = iter_search_pages(
+                client, SEARCH_QUERY, max_tweets,
+                start_time=start_time.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                since_id=since_id,  # Only tweets newer than the last refresh (incremental mode)
+                until_id=until_id,  # ...or older than where an interrupted refresh stopped
+                progress=progress, metrics=metrics
             )
+            for page in pages:
+                fetched += len(page)
+                log(f"Fetched page of {len(page)} tweets ({fetched} total)")
+                yield page
 
-            if response.data:
-                users = {u.id: u for u in response.includes['users']}
-                for tweet in response.data:
-                    user = users.get(tweet.author_id)
-                    tweets_data.append({
-                        'tweet_id': str(tweet.id),
-                        'created_at': tweet.created_at,
-                        'username': user.username if user else 'unknown',
-                        'user_display_name': user.name if user else 'unknown',
-                        'text': tweet.text,
-                        'retweet_count': tweet.public_metrics['retweet_count'],
-                        'reply_count': tweet.public_metrics['reply_count'],
-                        'like_count': tweet.public_metrics['like_count'],
-                        'quote_count': tweet.public_metrics['quote_count'],
-                        'user_followers': user.public_metrics['followers_count'] if user else 0,
-                        'user_verified': user.verified if user else False,
-                        'language': tweet.lang
-                    })
-            else:
+            metrics.record('fetch', rate_limit_wait_seconds=client.session.budget.waited)
+            if not fetched:
                 log("No tweets found.")
         else:
             log("Using Twitter API v1.1...")
-            auth = tweepy.OAuthHandler(API_KEY, API_SECRET)
-            auth.set_access_token(ACCESS_TOKEN, ACCESS_TOKEN_SECRET)
-            api = tweepy.API(auth, wait_on_rate_limit=True)
-            tweets = tweepy.Cursor(
-                api.search_tweets,
-                q=SEARCH_QUERY,
-                lang='en',
-                tweet_mode='extended',
-                result_type='recent'
-            ).items(MAX_TWEETS)
-
-            for tweet in tweets:
-                tweets_data.append({
-                    'tweet_id': str(tweet.id),
-                    'created_at': tweet.created_at,
-                    'username': tweet.user.screen_name,
-                    'user_display_name': tweet.user.name,
-                    'text': tweet.full_text,
-                    'retweet_count': tweet.retweet_count,
-                    'reply_count': 0,
-                    'like_count': tweet.favorite_count,
-                    'quote_count': 0,
-                    'user_followers': tweet.user.followers_count,
-                    'user_verified': tweet.user.verified,
-                    'language': tweet.lang
-                })
-
-        log(f"Fetched {len(tweets_data)} tweets.")
+            api = make_v1_api(API_KEY, API_SECRET, ACCESS_TOKEN, ACCESS_TOKEN_SECRET)
+            for page in iter_v1_search_pages(api, SEARCH_QUERY, max_tweets, since_id=since_id,
+                                             until_id=until_id, progress=progress, metrics=metrics):
+                fetched += len(page)
+                yield page
+
+        log(f"Fetched {fetched} tweets.")
+        if progress.stopped and progress.stopped != "max_tweets":
+            log(f"Fetch stopped early ({progress.stopped}); older matching tweets were not fetched")
     except Exception as e:
         log(f"Fetch error: {e}")
-        return pd.DataFrame()
 
-    return pd.DataFrame(tweets_data)
+def fetch_tweets_with_tweepy(since_id=None):
+    tweets = TweetColumns()
+    for page in iter_tweet_pages(since_id):
+        tweets.extend(page)
+    return tweets.to_frame()
 
 # ========================================================================
 # MAIN SENTIMENT PIPELINE
 # ========================================================================
 
-def process_sentiment_data():
-    df = fetch_tweets_with_tweepy()
+def update_tweet_store(df, fetch_state, searched):
+    added = append_to_store(df, TWEET_STORE_PATH)
+    # The state only covers tweets the searches actually reached
+    fetch_state = advance_fetch_state(fetch_state, searched)
+    save_fetch_state(WATERMARK_PATH, BRAND_NAME, SEARCH_QUERY, fetch_state)
+    log(f"Added {added} new tweets to: {TWEET_STORE_PATH}")
+    if fetch_state['gaps']:
+        log(f"{len(fetch_state['gaps'])} gap(s) of older tweets left; later refreshes fill them after fetching new tweets")
+    return load_store(TWEET_STORE_PATH, dataset_columns(NEAR_DUPLICATES), DAYS_BACK)
 
-    if df.empty:
+def process_sentiment_data():
+    metrics = PipelineMetrics("v2") if INSTRUMENT else NULL_METRICS
+    preload(SENTIMENT_ENGINE)  # the lexicon loads in the background while pages are fetched
+    fetch_state = {'newest_id': None, 'gaps': []}
+    if INCREMENTAL:
+        # A replayed export is not bound to the search window
+        fetch_state = load_fetch_state(WATERMARK_PATH, BRAND_NAME, SEARCH_QUERY, None if REPLAY_PATH else DAYS_BACK)
+        log(f"Incremental refresh since tweet {fetch_state['newest_id']}, "
+            f"then {len(fetch_state['gaps'])} gap(s) of older tweets")
+    searched = []
+
+    # Each batch goes to the in-memory dataset (and the CSV log in debug mode) as soon as it is scored
+    dataset_sink = MemorySink()
+    sinks = [dataset_sink]
+    csv_filename = None
+    if OUTPUT_FORMAT == "parquet":
+        sinks.append(PartitionedParquetSink(PARQUET_ROOT))
+    elif DEBUG and not INCREMENTAL:
+        csv_filename = f"twitter_sentiment_{BRAND_NAME}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        sinks.append(CsvSink(csv_filename))
+    if INFLUENCE_INDEX is not None:
+        sinks.append(INFLUENCE_INDEX)
+    if HOURLY_AGGREGATES is not None:
+        sinks.append(HOURLY_AGGREGATES)
+    dedup = NearDuplicateIndex() if NEAR_DUPLICATES else None
+
+    run_pipeline(
+        iter_refresh_pages(fetch_state, partial(iter_tweet_pages, metrics=metrics), MAX_TWEETS, searched),
+        sinks, BRAND_NAME, clean_tweets,
+        batch_size=PIPELINE_BATCH_SIZE, metrics=metrics, engine=SENTIMENT_ENGINE,
+        workers=SCORING_WORKERS, chunk_size=SCORING_CHUNK_SIZE, expected_rows=MAX_TWEETS, report=log,
+        cache=SENTIMENT_CACHE, dedup=dedup
+    )
+    df = dataset_sink.result()
+
+    if INCREMENTAL:
+        if df.empty:
+            log("No new tweets.")
+        with metrics.stage('export', len(df)):
+            df = update_tweet_store(df, fetch_state, searched)
+    elif df.empty:
         log("No data fetched.")
-        return pd.DataFrame(columns=[
-            'tweet_id', 'created_at', 'date', 'hour', 'day_of_week',
-            'brand', 'username', 'user_display_name', 'text', 'cleaned_text',
-            'sentiment_score', 'sentiment_subjectivity', 'sentiment_category',
-            'retweet_count', 'reply_count', 'like_count', 'quote_count',
-            'engagement', 'user_followers', 'user_verified', 'language'
-        ])
-
-    df['cleaned_text'] = df['text'].apply(clean_tweet)
-    df['sentiment_score'] = df['cleaned_text'].apply(get_sentiment_score)
-    df['sentiment_subjectivity'] = df['cleaned_text'].apply(get_sentiment_subjectivity)
-    df['sentiment_category'] = df['sentiment_score'].apply(categorize_sentiment)
-    df['brand'] = BRAND_NAME
-    df['engagement'] = df['like_count'] + df['retweet_count'] + df['reply_count'] + df['quote_count']
-    df['created_at'] = pd.to_datetime(df['created_at'])
-    df['date'] = df['created_at'].dt.date
-    df['hour'] = df['created_at'].dt.hour
-    df['day_of_week'] = df['created_at'].dt.day_name()
-
-    columns = [
-        'tweet_id', 'created_at', 'date', 'hour', 'day_of_week',
-        'brand', 'username', 'user_display_name', 'text', 'cleaned_text',
-        'sentiment_score', 'sentiment_subjectivity', 'sentiment_category',
-        'retweet_count', 'reply_count', 'like_count', 'quote_count',
-        'engagement', 'user_followers', 'user_verified', 'language'
-    ]
-
-    df = df[columns]
 
-    if DEBUG:
+    if DEBUG and not df.empty:
         log(f"\nTotal tweets analyzed: {len(df)}")
         sentiment_counts = df['sentiment_category'].value_counts()
         for cat, count in sentiment_counts.items():
             log(f"{cat}: {count}")
-        csv_filename = f"twitter_sentiment_{BRAND_NAME}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        df.to_csv(csv_filename, index=False)
-        log(f"Saved dataset to: {csv_filename}")
-
+        log(SENTIMENT_CACHE.summary())
+        if dedup is not None:
+            log(dedup.summary())
+        if csv_filename:
+            log(f"Saved dataset to: {csv_filename}")
+        if OUTPUT_FORMAT == "parquet":
+            log(f"Appended dataset to: {PARQUET_ROOT}")
+
+    if INSTRUMENT:
+        report_metrics(metrics)
     return df
 
+def report_metrics(metrics):
+    log(f"\n{metrics.summary()}")
+    metrics.write_json(METRICS_LOG_PATH)
+    if PROMETHEUS_PATH:
+        metrics.write_prometheus(PROMETHEUS_PATH)
+
 # ========================================================================
-# OUTPUT (Power BI reads this variable)
+# OUTPUT (Power BI reads these variables)
 # ========================================================================
 
-dataset = process_sentiment_data()
+# Scoring pool workers re-import this script as "__mp_main__" on Windows;
+# only the real run should fetch and score.
+if __name__ != "__mp_main__":
+    with profiled(PROFILE, report=log):
+        dataset = process_sentiment_data()
+    if HOURLY_AGGREGATES is not None:
+        hourly_summary = HOURLY_AGGREGATES.summary()
+        log(f"Updated hourly summary ({len(hourly_summary)} rows): {HOURLY_AGGREGATES_PATH}")
+    if INFLUENCE_INDEX is not None:
+        top_tweets = INFLUENCE_INDEX.tweets_table()
+        top_authors = INFLUENCE_INDEX.authors_table()
+        log(f"Influence rankings: {len(top_tweets)} tweets, {len(top_authors)} authors")
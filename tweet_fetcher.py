@@ -0,0 +1,436 @@
+# Paginated, Rate-limit-aware Tweet Fetcher (Twitter API v2, v1.1 and offline replay)
+
+import math
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+
+from instrumentation import NULL_METRICS
+from tweet_records import RECORD_FIELDS, TweetColumns
+from tweet_schema import TEXT_COLUMNS, csv_read_options
+
+# ========================================================================
+# CONFIGURATION
+# ========================================================================
+
+TWITTER_API_HOST = "https://api.twitter.com"
+PAGE_SIZE = 100               # API maximum per search request (minimum is 10)
+V1_PAGE_SIZE = 100            # Tweets per yielded page from the v1.1 cursor
+MAX_RATE_LIMIT_WAIT = 60      # Seconds we are willing to wait for a window reset
+MAX_RATE_LIMIT_RETRIES = 3    # 429 responses retried per request
+
+# ========================================================================
+# RATE LIMIT SCHEDULING
+# ========================================================================
+
+class RateLimitExceeded(Exception):
+    """Raised when the next request would have to wait longer than allowed"""
+
+class RateLimitBudget:
+    """
+    Remaining requests per endpoint, read from the x-rate-limit-* headers.
+
+    Requests wait for the window reset only when the budget is spent, and
+    give up instead of blocking when that wait exceeds `max_wait` seconds.
+    Safe to share between threads: each request reserves one call before
+    it is sent, so concurrent fetches cannot overspend the window.
+    """
+
+    def __init__(self, max_wait=MAX_RATE_LIMIT_WAIT, clock=time.time, sleep=time.sleep):
+        self.max_wait = max_wait
+        self.clock = clock
+        self.sleep = sleep
+        self.limits = {}       # route -> (remaining, reset_epoch)
+        self.waited = 0.0      # total seconds spent waiting on resets
+        self._lock = threading.Lock()
+
+    def wait(self, route):
+        while True:
+            with self._lock:
+                remaining, reset = self.limits.get(route, (None, None))
+                if remaining is None:
+                    return
+                delay = reset - self.clock() + 1
+                if remaining > 0 or delay <= 0:
+                    if remaining > 0:
+                        self.limits[route] = (remaining - 1, reset)
+                    return
+                if delay > self.max_wait:
+                    raise RateLimitExceeded(
+                        f"Rate limit for {route} resets in {delay:.0f}s (max wait {self.max_wait}s)"
+                    )
+                self.waited += delay
+            self.sleep(delay)
+            with self._lock:
+                # The window has reset; let the next response headers refill it
+                if self.limits.get(route, (None, None))[1] == reset:
+                    del self.limits[route]
+
+    def update(self, route, headers, status_code=200):
+        if "x-rate-limit-reset" not in headers:
+            return
+        reset = int(headers["x-rate-limit-reset"])
+        remaining = int(headers.get("x-rate-limit-remaining", 0))
+        if status_code == 429:
+            remaining = 0
+        with self._lock:
+            known_remaining, known_reset = self.limits.get(route, (None, None))
+            if known_reset == reset and known_remaining is not None:
+                # Responses can arrive out of order; within one window the lowest count is current
+                remaining = min(remaining, known_remaining)
+            self.limits[route] = (remaining, reset)
+
+class RateLimitedSession(requests.Session):
+    """
+    requests.Session for tweepy.Client that schedules calls against the
+    rate-limit budget. `api_base_url` points the client at another host,
+    e.g. a local mock server replaying recorded responses. `pool_size`
+    keeps that many connections open for threads sharing the session.
+    """
+
+    def __init__(self, budget=None, api_base_url=None, pool_size=None):
+        super().__init__()
+        self.budget = budget or RateLimitBudget()
+        self.api_base_url = api_base_url
+        if pool_size:
+            adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            self.mount("https://", adapter)
+            self.mount("http://", adapter)
+
+    def request(self, method, url, *args, **kwargs):
+        route = urlsplit(url).path
+        if self.api_base_url and url.startswith(TWITTER_API_HOST):
+            url = self.api_base_url.rstrip('/') + url[len(TWITTER_API_HOST):]
+        for _ in range(MAX_RATE_LIMIT_RETRIES + 1):
+            self.budget.wait(route)
+            response = super().request(method, url, *args, **kwargs)
+            self.budget.update(route, response.headers, response.status_code)
+            if response.status_code != 429:
+                break
+        return response
+
+# ========================================================================
+# PAGINATED SEARCH
+# ========================================================================
+
+class FetchProgress:
+    """
+    What one search covered, filled in as its pages are yielded.
+
+    `complete` is True once the results ran out. Otherwise `stopped` says
+    why the fetch ended early ("max_tweets" or the rate-limit message) and
+    only tweets from oldest_id to newest_id were fetched.
+    """
+
+    def __init__(self):
+        self.fetched = 0
+        self.newest_id = None
+        self.oldest_id = None
+        self.complete = False
+        self.stopped = None
+
+    def add(self, page):
+        if not len(page):
+            return
+        ids = [int(tweet_id) for tweet_id in page.tweet_id]
+        self.fetched += len(ids)
+        self.newest_id = max(ids) if self.newest_id is None else max(self.newest_id, *ids)
+        self.oldest_id = min(ids) if self.oldest_id is None else min(self.oldest_id, *ids)
+
+    def stop(self, reason, metrics=NULL_METRICS, stage='fetch'):
+        """Record that the fetch ended before the results ran out"""
+        self.stopped = reason
+        metrics.record(stage, truncated=1, truncated_reason=reason)
+
+def make_client(bearer_token, consumer_key=None, consumer_secret=None,
+                access_token=None, access_token_secret=None,
+                max_wait=MAX_RATE_LIMIT_WAIT, api_base_url=None, pool_size=None):
+    """
+    tweepy.Client that leaves rate limiting to our session instead of sleeping
+    inside tweepy. One client can be shared by several fetch threads.
+    """
+    import tweepy
+    client = tweepy.Client(
+        bearer_token=bearer_token,
+        consumer_key=consumer_key,
+        consumer_secret=consumer_secret,
+        access_token=access_token,
+        access_token_secret=access_token_secret,
+        wait_on_rate_limit=False
+    )
+    client.session = RateLimitedSession(RateLimitBudget(max_wait), api_base_url, pool_size)
+    return client
+
+def v2_page_columns(response):
+    """Turn one search_recent_tweets response into a TweetColumns page"""
+    page = TweetColumns()
+    if not response.data:
+        return page
+    users = {u.id: u for u in response.includes.get('users', [])}
+    append = page.append
+    for tweet in response.data:
+        user = users.get(tweet.author_id)
+        metrics = tweet.public_metrics
+        append(
+            str(tweet.id), tweet.created_at,
+            user.username if user else 'unknown',
+            user.name if user else 'unknown',
+            tweet.text,
+            metrics['retweet_count'], metrics['reply_count'],
+            metrics['like_count'], metrics['quote_count'],
+            user.public_metrics['followers_count'] if user else 0,
+            user.verified if user else False,
+            tweet.lang
+        )
+    return page
+
+def iter_search_pages(client, query, max_tweets, start_time=None, since_id=None,
+                      page_size=PAGE_SIZE, progress=None, metrics=NULL_METRICS, until_id=None):
+    """
+    Yield TweetColumns pages, following next_token until `max_tweets`
+    tweets were returned or the results run out. `since_id` / `until_id`
+    limit the search to tweets between the two IDs (both exclusive).
+
+    Stops early (keeping the pages already yielded) when the rate-limit
+    budget would need a longer wait than the client's max_wait. Pass a
+    FetchProgress to find out whether the results ran out; an early stop is
+    also recorded in `metrics` as truncated / truncated_reason.
+    """
+    progress = progress if progress is not None else FetchProgress()
+    import tweepy
+    page_size = max(10, min(page_size, PAGE_SIZE, max_tweets))
+    pages = tweepy.Paginator(
+        client.search_recent_tweets,
+        query=query,
+        max_results=page_size,
+        tweet_fields=['created_at', 'public_metrics', 'lang', 'author_id'],
+        user_fields=['username', 'name', 'verified', 'public_metrics'],
+        expansions=['author_id'],
+        since_id=since_id,
+        until_id=until_id,
+        start_time=start_time,
+        limit=math.ceil(max_tweets / page_size)
+    )
+    try:
+        for response in pages:
+            page = v2_page_columns(response)
+            more = bool((response.meta or {}).get('next_token'))
+            if len(page) > max_tweets - progress.fetched:
+                page = page.slice(0, max_tweets - progress.fetched)
+                more = True
+            progress.add(page)
+            if len(page):
+                yield page
+            if not more:
+                progress.complete = True
+                return
+            if progress.fetched >= max_tweets:
+                break
+        progress.stop("max_tweets", metrics)
+    except RateLimitExceeded as e:
+        progress.stop(f"rate limit: {e}", metrics)
+
+# ========================================================================
+# OTHER BACKENDS (same TweetColumns pages)
+# ========================================================================
+
+def make_v1_api(consumer_key, consumer_secret, access_token, access_token_secret):
+    """tweepy.API for the legacy v1.1 search endpoint"""
+    import tweepy
+    auth = tweepy.OAuthHandler(consumer_key, consumer_secret)
+    auth.set_access_token(access_token, access_token_secret)
+    return tweepy.API(auth, wait_on_rate_limit=True)
+
+def iter_v1_search_pages(api, query, max_tweets, since_id=None, page_size=V1_PAGE_SIZE,
+                         progress=None, metrics=NULL_METRICS, until_id=None):
+    """
+    Yield TweetColumns pages from the v1.1 search cursor. v1.1 has no reply
+    or quote counts, so those columns are 0. The cursor waits out rate
+    limits itself, so the fetch is complete unless `max_tweets` was reached.
+    """
+    progress = progress if progress is not None else FetchProgress()
+    import tweepy
+    tweets = tweepy.Cursor(
+        api.search_tweets,
+        q=query,
+        lang='en',
+        tweet_mode='extended',
+        result_type='recent',
+        since_id=since_id,
+        max_id=int(until_id) - 1 if until_id is not None else None  # max_id is inclusive
+    ).items(max_tweets)
+
+    page = TweetColumns()
+    for tweet in tweets:
+        user = tweet.user
+        page.append(
+            str(tweet.id), tweet.created_at, user.screen_name, user.name, tweet.full_text,
+            tweet.retweet_count, 0, tweet.favorite_count, 0,
+            user.followers_count, user.verified, tweet.lang
+        )
+        if len(page) == page_size:
+            progress.add(page)
+            yield page
+            page = TweetColumns()
+    if len(page):
+        progress.add(page)
+        yield page
+    if progress.fetched < max_tweets:
+        progress.complete = True
+    else:
+        progress.stop("max_tweets", metrics)
+
+def v2_payload_row(payload):
+    """Turn one v2 JSON payload ({"data": tweet, "includes": ...}) into a tweet row (RECORD_FIELDS order)"""
+    tweet = payload['data']
+    users = {u['id']: u for u in payload.get('includes', {}).get('users', [])}
+    user = users.get(tweet.get('author_id'))
+    metrics = tweet.get('public_metrics', {})
+    return (
+        str(tweet['id']),
+        tweet.get('created_at'),
+        user['username'] if user else 'unknown',
+        user['name'] if user else 'unknown',
+        tweet['text'],
+        metrics.get('retweet_count', 0),
+        metrics.get('reply_count', 0),
+        metrics.get('like_count', 0),
+        metrics.get('quote_count', 0),
+        user['public_metrics']['followers_count'] if user else 0,
+        user.get('verified', False) if user else False,
+        tweet.get('lang')
+    )
+
+def _replay_columns(available):
+    return [c for c in RECORD_FIELDS + ['brand'] if c in available]
+
+def _csv_chunks(path, page_size):
+    import pandas as pd
+    columns = _replay_columns(pd.read_csv(path, nrows=0).columns)
+    return pd.read_csv(path, usecols=columns, dtype={'tweet_id': str}, chunksize=page_size,
+                       **csv_read_options(columns))
+
+def _ndjson_chunks(path, page_size):
+    """Lines are either v2 payloads (as streamed) or flat records (as DataFrame.to_json(lines=True))"""
+    import gzip
+    import json
+    import pandas as pd
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        rows = []
+        for line in f:
+            if not line.strip():
+                continue
+            obj = json.loads(line)
+            rows.append(dict(zip(RECORD_FIELDS, v2_payload_row(obj))) if 'data' in obj else obj)
+            if len(rows) == page_size:
+                yield pd.DataFrame.from_records(rows)
+                rows = []
+        if rows:
+            yield pd.DataFrame.from_records(rows)
+
+def _parquet_chunks(path, page_size):
+    """A single file is memory-mapped; a directory is read as a hive-partitioned dataset"""
+    import os
+    import pyarrow.dataset
+    import pyarrow.parquet
+    if os.path.isdir(path):
+        dataset = pyarrow.dataset.dataset(path, format='parquet', partitioning='hive')
+        batches = dataset.to_batches(columns=_replay_columns(dataset.schema.names), batch_size=page_size)
+    else:
+        parquet = pyarrow.parquet.ParquetFile(path, memory_map=True)
+        batches = parquet.iter_batches(batch_size=page_size,
+                                       columns=_replay_columns(parquet.schema_arrow.names))
+    for batch in batches:
+        if batch.num_rows:
+            yield batch.to_pandas()
+
+def _replay_chunks(path, page_size):
+    import os
+    name = path.lower()
+    if name.endswith(('.ndjson', '.jsonl', '.json', '.ndjson.gz', '.jsonl.gz')):
+        return _ndjson_chunks(path, page_size)
+    if name.endswith('.parquet') or os.path.isdir(path):
+        return _parquet_chunks(path, page_size)
+    return _csv_chunks(path, page_size)
+
+def iter_replay_pages(path, max_tweets=None, since_id=None, page_size=PAGE_SIZE, progress=None,
+                      until_id=None):
+    """
+    Yield TweetColumns pages from an archived export, for offline runs,
+    re-scoring and benchmarks: CSV (read in chunks), ndjson (line by line)
+    or Parquet (a memory-mapped file, or a partitioned store directory).
+    Only `page_size` rows are held at a time.
+    """
+    import pandas as pd
+    progress = progress if progress is not None else FetchProgress()
+    fetched = 0
+    for chunk in _replay_chunks(path, page_size):
+        if pd.api.types.is_numeric_dtype(chunk['created_at']):
+            chunk['created_at'] = pd.to_datetime(chunk['created_at'], unit='ms', utc=True)
+        text_columns = [c for c in TEXT_COLUMNS if c in chunk.columns]
+        chunk[text_columns] = chunk[text_columns].fillna('')  # null in ndjson or Parquet
+        if since_id is not None:
+            chunk = chunk[chunk['tweet_id'].astype('int64') > int(since_id)]
+        if until_id is not None:
+            chunk = chunk[chunk['tweet_id'].astype('int64') < int(until_id)]
+        if max_tweets is not None:
+            chunk = chunk.iloc[:max_tweets - fetched]
+        if not chunk.empty:
+            fetched += len(chunk)
+            page = TweetColumns.from_frame(chunk)
+            progress.add(page)
+            yield page
+        if max_tweets is not None and fetched >= max_tweets:
+            progress.stopped = "max_tweets"
+            return
+    progress.complete = True
+
+# ========================================================================
+# CONCURRENT MULTI-BRAND SEARCH
+# ========================================================================
+
+_DONE = object()
+
+def iter_brand_pages(client, specs, max_tweets, start_time=None, since_ids=None,
+                     workers=4, page_size=PAGE_SIZE, on_error=None, progress=None):
+    """
+    Fetch several (brand, query) specs at once through one shared client and
+    yield pages as they arrive, each page tagged with its brand.
+
+    The client's session and rate-limit budget are shared by every thread.
+    A brand that fails is reported to `on_error(brand, exc)` and skipped.
+    `progress` (brand -> FetchProgress) is filled in per brand.
+    """
+    since_ids = since_ids or {}
+    progress = progress if progress is not None else {}
+    pages = queue.Queue()
+
+    def fetch(brand, query):
+        try:
+            brand_progress = progress.setdefault(brand, FetchProgress())
+            for page in iter_search_pages(client, query, max_tweets, start_time=start_time,
+                                          since_id=since_ids.get(brand), page_size=page_size,
+                                          progress=brand_progress):
+                page.tag(brand)
+                pages.put(page)
+        except Exception as e:
+            if on_error is not None:
+                on_error(brand, e)
+        finally:
+            pages.put(_DONE)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(specs)))) as pool:
+        for brand, query in specs:
+            pool.submit(fetch, brand, query)
+        pending = len(specs)
+        while pending:
+            page = pages.get()
+            if page is _DONE:
+                pending -= 1
+            else:
+                yield page
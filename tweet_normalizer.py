@@ -0,0 +1,94 @@
+# Single-pass Tweet Normalizer: URLs, mentions and hashtags in one compiled regex
+
+import re
+import time
+
+import pandas as pd
+
+# ========================================================================
+# PATTERNS
+# ========================================================================
+
+# Same result as the original four chained substitutions
+#     http\S+|www.\S+  ->  ''       @\w+   ->  ''
+#     #(\w+)           ->  \1       \s+    ->  ' '   then strip()
+# except that the dot after "www" is now escaped (it used to match any
+# character, so words like "awwwww" were cut as if they were URLs).
+#
+# URLs, mentions and hashtags share one alternation. URLs used to be removed
+# first, so a mention or hashtag stops where a URL would start
+# ("@userhttp://t.co/x" -> "", "#taghttp://t.co/x" -> "tag"). Only the
+# hashtag alternative has a group; the others substitute as ''.
+# Whitespace is collapsed with str.split/join, which splits on exactly the
+# characters \s matches and runs in C instead of once per regex match.
+_URL_START = r'http\S|www\.\S'
+_WORD = rf'(?:(?!{_URL_START})\w)+'
+
+TWEET_PATTERN = re.compile(rf'http\S+|www\.\S+|@{_WORD}|#({_WORD})')
+
+# Joins a batch into one string for a single regex call. "\n" ends every
+# token (no pattern crosses a newline), so texts cannot leak into each other.
+_BATCH_SEPARATOR = "\n\x00\n"
+
+# ========================================================================
+# NORMALIZER
+# ========================================================================
+
+def clean_tweet(tweet):
+    """Remove URLs and mentions, keep hashtag text, collapse whitespace"""
+    return ' '.join(TWEET_PATTERN.sub(r'\1', tweet).split())
+
+def clean_tweets(texts):
+    """
+    clean_tweet over a whole column (Series or list) with one regex call.
+    Returns a Series aligned with `texts`; missing texts clean to "".
+    """
+    texts = texts if isinstance(texts, pd.Series) else pd.Series(texts, dtype=object)
+    texts = texts.fillna('')
+    if texts.empty:
+        return texts.astype(object)
+    joined = _BATCH_SEPARATOR.join(texts.tolist())
+    if joined.count("\x00") != len(texts) - 1:
+        # A tweet contains the separator itself; fall back to one call per tweet
+        return texts.map(clean_tweet)
+    pieces = TWEET_PATTERN.sub(r'\1', joined).split("\x00")
+    return pd.Series([' '.join(piece.split()) for piece in pieces], index=texts.index, dtype=object)
+
+# ========================================================================
+# MICRO-BENCHMARK
+# ========================================================================
+
+def _chained_clean_tweet(tweet):
+    """The original four-pass cleaner, kept for the benchmark comparison"""
+    tweet = re.sub(r'http\S+|www.\S+', '', tweet)
+    tweet = re.sub(r'@\w+', '', tweet)
+    tweet = re.sub(r'#(\w+)', r'\1', tweet)
+    tweet = re.sub(r'\s+', ' ', tweet).strip()
+    return tweet
+
+def benchmark(path="twitter_sentiment_Tesla_20251024_212058.csv", repeat=200):
+    """Time the chained cleaner against clean_tweet and clean_tweets on the bundled CSV"""
+    texts = pd.read_csv(path)['text'].astype(str)
+    expected = [_chained_clean_tweet(t) for t in texts]
+    assert [clean_tweet(t) for t in texts] == expected
+    assert clean_tweets(texts).tolist() == expected
+
+    column = pd.concat([texts] * repeat, ignore_index=True)
+    timings = {}
+    for name, run in [
+        ("chained re.sub", lambda: column.map(_chained_clean_tweet)),
+        ("clean_tweet", lambda: column.map(clean_tweet)),
+        ("clean_tweets", lambda: clean_tweets(column)),
+    ]:
+        start = time.perf_counter()
+        run()
+        timings[name] = time.perf_counter() - start
+
+    baseline = timings["chained re.sub"]
+    print(f"{len(column):,} tweets (output identical to the chained cleaner)")
+    for name, seconds in timings.items():
+        print(f"  {name:15s} {seconds * 1000:8.1f} ms  {baseline / seconds:5.1f}x")
+    return timings
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,121 @@
+# Compact Tweet Records: typed column buffers shared by every fetch backend
+
+from array import array
+
+import numpy as np
+import pandas as pd
+
+# ========================================================================
+# CONFIGURATION
+# ========================================================================
+
+RECORD_FIELDS = [
+    'tweet_id', 'created_at', 'username', 'user_display_name', 'text',
+    'retweet_count', 'reply_count', 'like_count', 'quote_count',
+    'user_followers', 'user_verified', 'language'
+]
+# Stored in array('q') buffers; every other field is a plain list
+COUNT_FIELDS = ['retweet_count', 'reply_count', 'like_count', 'quote_count', 'user_followers']
+
+# ========================================================================
+# COLUMN BUFFERS
+# ========================================================================
+
+class TweetColumns:
+    """
+    A page or batch of fetched tweets stored column by column.
+
+    Counts go into array('q') buffers and the verified flag into array('b'),
+    so a tweet costs a few machine words instead of a 12-key dict, and
+    to_frame() hands the numeric buffers to pandas without copying them.
+    `brand` is None until tag() is called (multi-brand runs).
+    """
+
+    __slots__ = RECORD_FIELDS + ['brand']
+
+    def __init__(self):
+        for field in RECORD_FIELDS:
+            setattr(self, field, array('q') if field in COUNT_FIELDS else [])
+        self.user_verified = array('b')
+        self.brand = None
+
+    def __len__(self):
+        return len(self.tweet_id)
+
+    def append(self, tweet_id, created_at, username, user_display_name, text,
+               retweet_count, reply_count, like_count, quote_count,
+               user_followers, user_verified, language):
+        self.tweet_id.append(tweet_id)
+        self.created_at.append(created_at)
+        self.username.append(username)
+        self.user_display_name.append(user_display_name)
+        self.text.append(text)
+        self.retweet_count.append(retweet_count)
+        self.reply_count.append(reply_count)
+        self.like_count.append(like_count)
+        self.quote_count.append(quote_count)
+        self.user_followers.append(user_followers)
+        self.user_verified.append(bool(user_verified))
+        self.language.append(language)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build from tuples in RECORD_FIELDS order"""
+        columns = cls()
+        for row in rows:
+            columns.append(*row)
+        return columns
+
+    @classmethod
+    def from_frame(cls, df):
+        """Build from a DataFrame holding (at least) RECORD_FIELDS, e.g. a replayed export"""
+        columns = cls()
+        for field in RECORD_FIELDS:
+            values = df[field]
+            if field in COUNT_FIELDS:
+                getattr(columns, field).frombytes(values.fillna(0).to_numpy(dtype=np.int64).tobytes())
+            elif field == 'user_verified':
+                columns.user_verified.frombytes(values.fillna(False).to_numpy(dtype=np.int8).tobytes())
+            elif field == 'tweet_id':
+                columns.tweet_id.extend(values.astype(str).tolist())
+            else:
+                getattr(columns, field).extend(values.tolist())
+        if 'brand' in df.columns:
+            columns.brand = df['brand'].tolist()
+        return columns
+
+    def tag(self, brand):
+        """Mark every tweet as belonging to `brand`"""
+        self.brand = [brand] * len(self)
+
+    def extend(self, other):
+        if other.brand is not None or self.brand is not None:
+            self.brand = (self.brand or [None] * len(self)) + (other.brand or [None] * len(other))
+        for field in RECORD_FIELDS:
+            getattr(self, field).extend(getattr(other, field))
+
+    def slice(self, start, stop=None):
+        """A new TweetColumns holding tweets [start:stop]"""
+        part = TweetColumns()
+        for field in RECORD_FIELDS:
+            setattr(part, field, getattr(self, field)[start:stop])
+        if self.brand is not None:
+            part.brand = self.brand[start:stop]
+        return part
+
+    def to_frame(self):
+        """
+        DataFrame of the tweets. The numeric columns are read-only views of
+        the buffers, so don't append to this object afterwards.
+        """
+        data = {}
+        for field in RECORD_FIELDS:
+            values = getattr(self, field)
+            if field in COUNT_FIELDS:
+                values = np.frombuffer(values, dtype=np.int64) if len(values) else np.zeros(0, np.int64)
+            elif field == 'user_verified':
+                values = np.frombuffer(values, dtype=np.bool_) if len(values) else np.zeros(0, np.bool_)
+            data[field] = values
+        if self.brand is not None:
+            data['brand'] = self.brand
+        return pd.DataFrame(data, copy=False)
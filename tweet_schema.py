@@ -0,0 +1,110 @@
+# Output Schema: the dataset columns and dtypes shared by every script, sink and store
+
+import pandas as pd
+
+# ========================================================================
+# CONFIGURATION
+# ========================================================================
+
+SENTIMENT_CATEGORIES = ["Positive", "Neutral", "Negative"]
+DAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# Fixed categories, so batches concatenate without falling back to object columns
+SENTIMENT_CATEGORY_DTYPE = pd.CategoricalDtype(SENTIMENT_CATEGORIES)
+DAY_OF_WEEK_DTYPE = pd.CategoricalDtype(DAY_NAMES)
+
+# Column -> dtype of the dataset handed to Power BI, in output order.
+# `date` is the UTC calendar day as a tz-naive midnight timestamp (written to CSV as YYYY-MM-DD).
+OUTPUT_SCHEMA = {
+    'tweet_id': 'object',
+    'created_at': 'datetime64[ns, UTC]',
+    'date': 'datetime64[ns]',
+    'hour': 'int8',
+    'day_of_week': DAY_OF_WEEK_DTYPE,
+    'brand': 'object',
+    'username': 'object',
+    'user_display_name': 'object',
+    'text': 'object',
+    'cleaned_text': 'object',
+    'sentiment_score': 'float64',
+    'sentiment_subjectivity': 'float64',
+    'sentiment_category': SENTIMENT_CATEGORY_DTYPE,
+    'retweet_count': 'int64',
+    'reply_count': 'int64',
+    'like_count': 'int64',
+    'quote_count': 'int64',
+    'engagement': 'int64',
+    'user_followers': 'int64',
+    'user_verified': 'bool',
+    'language': 'object',
+}
+OUTPUT_COLUMNS = list(OUTPUT_SCHEMA)
+TIME_COLUMNS = ['date', 'hour', 'day_of_week']
+# Free text: "NA", "null" or "nan" are tweets, not missing values
+TEXT_COLUMNS = ['username', 'user_display_name', 'text', 'cleaned_text']
+
+# Extra columns of a near-duplicate run (near_duplicates.NearDuplicateIndex).
+# Nullable: rows stored before near-duplicate collapsing was turned on have none.
+DUPLICATE_SCHEMA = {
+    'cluster_id': 'object',  # tweet_id (string) of the cluster's representative
+    'dup_rank': 'Int64',     # position in the cluster in arrival order, 0 = representative
+}
+LEGACY_COLUMNS = {'dup_count': 'dup_rank'}  # renamed columns in stores written by older versions
+DUPLICATE_COLUMNS = list(DUPLICATE_SCHEMA)
+DATASET_SCHEMA = {**OUTPUT_SCHEMA, **DUPLICATE_SCHEMA}
+
+# ========================================================================
+# SCHEMA HELPERS
+# ========================================================================
+
+def dataset_columns(near_duplicates=False):
+    """The dataset's columns: OUTPUT_COLUMNS, plus the cluster columns of a near-duplicate run"""
+    return OUTPUT_COLUMNS + DUPLICATE_COLUMNS if near_duplicates else OUTPUT_COLUMNS
+
+def time_columns(created_at):
+    """date, hour and day_of_week for a created_at column, in one vectorized pass (UTC)"""
+    utc = pd.to_datetime(created_at, utc=True).dt.tz_localize(None)
+    return pd.DataFrame({
+        'date': utc.dt.normalize(),
+        'hour': utc.dt.hour.astype('int8'),
+        'day_of_week': pd.Categorical.from_codes(utc.dt.dayofweek.to_numpy(), dtype=DAY_OF_WEEK_DTYPE),
+    }, index=utc.index)
+
+def csv_read_options(columns):
+    """
+    read_csv keywords that keep TEXT_COLUMNS verbatim: only an empty cell
+    of another column is missing (what to_csv writes for NaN).
+    """
+    return {'keep_default_na': False, 'na_values': {c: [''] for c in columns if c not in TEXT_COLUMNS}}
+
+def empty_dataset(columns=OUTPUT_COLUMNS):
+    """A 0-row dataset with the output dtypes (extra columns are object)"""
+    return pd.DataFrame({column: pd.Series(dtype=DATASET_SCHEMA.get(column, 'object'))
+                         for column in columns})
+
+def apply_schema(df, columns=OUTPUT_COLUMNS):
+    """
+    Conform a dataset read back from a store: reindex to `columns`, rebuild
+    the time columns from created_at and restore the categorical and cluster
+    column dtypes. Other columns keep the dtype they were read with.
+    """
+    if df.empty:
+        return empty_dataset(columns)
+    df = df.rename(columns={old: new for old, new in LEGACY_COLUMNS.items() if new not in df.columns})
+    df = df.reindex(columns=columns)
+    if 'created_at' in df.columns:
+        df['created_at'] = pd.to_datetime(df['created_at'], utc=True)
+        times = time_columns(df['created_at'])
+        for column in TIME_COLUMNS:
+            if column in df.columns:
+                df[column] = times[column]
+    if 'sentiment_category' in df.columns:
+        df['sentiment_category'] = df['sentiment_category'].astype(SENTIMENT_CATEGORY_DTYPE)
+    if 'cluster_id' in df.columns:
+        cluster_id = df['cluster_id']
+        if pd.api.types.is_integer_dtype(cluster_id):
+            cluster_id = cluster_id.astype(str)  # IDs parsed as numbers by a reader without dtypes
+        df['cluster_id'] = cluster_id.astype(object).where(cluster_id.notna(), None)
+    if 'dup_rank' in df.columns:
+        df['dup_rank'] = df['dup_rank'].astype(DUPLICATE_SCHEMA['dup_rank'])
+    return df
@@ -0,0 +1,255 @@
+# Incremental Refresh: since_id Watermarks and an Append-only Tweet Store
+
+import bisect
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from tweet_fetcher import FetchProgress
+from tweet_schema import apply_schema, csv_read_options, empty_dataset
+
+# ========================================================================
+# CONFIGURATION
+# ========================================================================
+
+TWITTER_EPOCH_MS = 1288834974657  # Snowflake tweet IDs count from this instant
+
+# ========================================================================
+# WATERMARKS
+# ========================================================================
+
+def tweet_id_time(tweet_id):
+    """Creation time (UTC) encoded in a snowflake tweet ID"""
+    ms = (int(tweet_id) >> 22) + TWITTER_EPOCH_MS
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc)
+
+def _watermark_key(brand, query):
+    return f"{brand}|{query}"
+
+def _read_json(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def _in_window(tweet_id, days_back):
+    if tweet_id is None or days_back is None:
+        return tweet_id is not None
+    return tweet_id_time(tweet_id) >= datetime.now(timezone.utc) - timedelta(days=days_back)
+
+def _write_json(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+def load_fetch_state(path, brand, query, days_back=None):
+    """
+    Return what earlier refreshes of this brand/query fetched, as a dict:
+
+        newest_id  the newest tweet stored (None on a fresh store)
+        gaps       [lo, hi] ID pairs, oldest first: a refresh stopped early
+                   and the tweets between lo and hi (both exclusive) are
+                   still missing; lo None means the start of the window
+
+    Gaps older than the search window are dropped, since the recent search
+    endpoint rejects them and they can no longer be filled.
+    """
+    state = _read_json(path).get(_watermark_key(brand, query))
+    if not isinstance(state, dict):
+        state = {'newest_id': state}  # older files store the since_id alone
+    elif 'gaps' not in state:
+        # Older files keep one gap as since_id / until_id
+        if state.get('until_id') is not None:
+            state = {'newest_id': state.get('newest_id'), 'gaps': [[state.get('since_id'), state['until_id']]]}
+        else:
+            state = {'newest_id': state.get('since_id')}
+    newest_id = None if state.get('newest_id') is None else str(state['newest_id'])
+    if not _in_window(newest_id, days_back):
+        return {'newest_id': None, 'gaps': []}
+    gaps = []
+    for lo, hi in state.get('gaps', []):
+        if _in_window(hi, days_back):
+            gaps.append([str(lo) if _in_window(lo, days_back) else None, str(hi)])
+    return {'newest_id': newest_id, 'gaps': gaps}
+
+def refresh_searches(state):
+    """
+    The (since_id, until_id) searches of one refresh, in order: tweets newer
+    than the newest stored first, so the dashboard always gets the latest,
+    then the gaps, newest first.
+    """
+    return [(state['newest_id'], None)] + [tuple(gap) for gap in reversed(state['gaps'])]
+
+def iter_refresh_pages(state, search, max_tweets, searched):
+    """
+    Run the refresh searches while the `max_tweets` budget lasts, yielding
+    their pages. `search(since_id=, until_id=, max_tweets=, progress=)`
+    yields the pages of one search; each (since_id, until_id, FetchProgress) run
+    is appended to `searched` for advance_fetch_state. Stops after a search
+    cut short by anything but the budget (e.g. the rate limit).
+    """
+    remaining = max_tweets
+    for since_id, until_id in refresh_searches(state):
+        if remaining <= 0:
+            return
+        progress = FetchProgress()
+        searched.append((since_id, until_id, progress))
+        yield from search(since_id=since_id, until_id=until_id, max_tweets=remaining, progress=progress)
+        remaining -= progress.fetched
+        if not progress.complete and progress.stopped != "max_tweets":
+            return
+
+def advance_fetch_state(state, searched):
+    """
+    The fetch state after the searches in `searched` ((since_id, until_id,
+    FetchProgress) triples, as filled by iter_refresh_pages).
+
+    Searches return the newest tweets first, so one stopped by MAX_TWEETS or
+    the rate limit leaves a gap below its oldest tweet; a search that ran
+    out of results closes the gap it searched.
+    """
+    newest_id = state['newest_id']
+    gaps = [list(gap) for gap in state['gaps']]
+    for since_id, until_id, progress in searched:
+        if until_id is None:
+            # New tweets above the newest stored one
+            if progress.fetched and not progress.complete:
+                gaps.append([since_id, str(progress.oldest_id)])
+            if progress.newest_id is not None and (newest_id is None or progress.newest_id > int(newest_id)):
+                newest_id = str(progress.newest_id)
+        elif progress.complete:
+            gaps.remove([since_id, until_id])
+        elif progress.fetched:
+            gaps[gaps.index([since_id, until_id])][1] = str(progress.oldest_id)
+    gaps.sort(key=lambda gap: int(gap[1]))
+    return {'newest_id': newest_id, 'gaps': gaps}
+
+def save_fetch_state(path, brand, query, state):
+    """Store the fetch state for this brand/query (atomically replaces the file)"""
+    marks = _read_json(path)
+    marks[_watermark_key(brand, query)] = state
+    _write_json(path, marks)
+
+def load_watermark(path, brand, query, days_back=None):
+    """
+    Return the newest stored tweet_id for this brand/query, or None (see
+    load_fetch_state for the gaps below it).
+    """
+    return load_fetch_state(path, brand, query, days_back)['newest_id']
+
+def save_watermark(path, brand, query, tweet_id):
+    """Record tweet_id as the newest stored (never moves backwards, keeps pending gaps)"""
+    state = load_fetch_state(path, brand, query)
+    if state['newest_id'] is not None and int(state['newest_id']) >= int(tweet_id):
+        return
+    state['newest_id'] = str(tweet_id)
+    save_fetch_state(path, brand, query, state)
+
+# ========================================================================
+# COUNTED RANGES
+# ========================================================================
+
+class CountedRanges:
+    """
+    The tweet-ID ranges a sink has already counted, per brand, so tweets
+    fetched again by a later refresh are skipped.
+
+    A search returns every matching tweet between its oldest and newest ID,
+    so each run adds one [oldest, newest] range per brand on commit(). Tweets
+    between ranges (a gap left by an interrupted refresh, or an older export
+    replayed later) still count whenever they arrive, however old: ranges are
+    only merged where they overlap, never folded together, so the file grows
+    by one pair per refresh and brand.
+    """
+
+    def __init__(self, ranges=None):
+        self.ranges = {brand: sorted((int(lo), int(hi)) for lo, hi in spans)
+                       for brand, spans in (ranges or {}).items()}
+        self.run_ids = set()   # tweet_ids counted since the last commit()
+        self.run_bounds = {}   # brand -> (oldest, newest) tweet_id counted since the last commit()
+
+    @classmethod
+    def up_to(cls, newest_ids):
+        """Ranges covering everything up to a per-brand newest tweet_id (older single watermarks)"""
+        return cls({brand: [(0, int(newest))] for brand, newest in newest_ids.items()})
+
+    def _covered(self, brand, tweet_id):
+        spans = self.ranges.get(brand)
+        if not spans:
+            return False
+        i = bisect.bisect_right(spans, (tweet_id, float('inf'))) - 1
+        return i >= 0 and spans[i][1] >= tweet_id
+
+    def take(self, brands, tweet_ids):
+        """
+        Mask of the rows not counted yet (nor earlier in this run or batch);
+        those rows are counted from now on.
+        """
+        fresh = np.zeros(len(tweet_ids), dtype=bool)
+        for i, (brand, tweet_id) in enumerate(zip(brands, tweet_ids)):
+            tweet_id = int(tweet_id)
+            if tweet_id in self.run_ids or self._covered(brand, tweet_id):
+                continue
+            fresh[i] = True
+            self.run_ids.add(tweet_id)
+            oldest, newest = self.run_bounds.get(brand, (tweet_id, tweet_id))
+            self.run_bounds[brand] = (min(oldest, tweet_id), max(newest, tweet_id))
+        return fresh
+
+    def commit(self):
+        """Record this run's ranges, merging overlaps"""
+        for brand, span in self.run_bounds.items():
+            merged = []
+            for lo, hi in sorted(self.ranges.get(brand, []) + [span]):
+                if merged and lo <= merged[-1][1]:
+                    merged[-1] = (merged[-1][0], max(merged[-1][1], hi))
+                else:
+                    merged.append((lo, hi))
+            self.ranges[brand] = merged
+        self.run_ids = set()
+        self.run_bounds = {}
+
+    def to_dict(self):
+        return {brand: [list(span) for span in spans] for brand, spans in self.ranges.items()}
+
+# ========================================================================
+# APPEND-ONLY STORE
+# ========================================================================
+
+def append_to_store(df, path):
+    """
+    Append scored tweets to the CSV store, skipping tweet_ids already in it.
+    Rows are written in the store's existing column order (columns it does
+    not have are dropped, missing ones left empty).
+    Returns the number of rows appended.
+    """
+    if df.empty:
+        return 0
+    df = df.drop_duplicates('tweet_id')
+    exists = os.path.exists(path)
+    if exists:
+        stored_ids = pd.read_csv(path, usecols=['tweet_id'], dtype={'tweet_id': str})['tweet_id']
+        df = df[~df['tweet_id'].astype(str).isin(stored_ids)]
+        df = df.reindex(columns=pd.read_csv(path, nrows=0).columns)
+    if not df.empty:
+        df.to_csv(path, mode='a', header=not exists, index=False)
+    return len(df)
+
+def load_store(path, columns, days_back=None):
+    """
+    Read the tweet store back, optionally keeping only the last `days_back`
+    days. Columns the store doesn't have (e.g. added later) come back empty.
+    """
+    if not os.path.exists(path):
+        return empty_dataset(columns)
+    df = pd.read_csv(path, dtype={'tweet_id': str, 'cluster_id': str},
+                     **csv_read_options(pd.read_csv(path, nrows=0).columns))
+    df['created_at'] = pd.to_datetime(df['created_at'], utc=True)
+    if days_back is not None:
+        oldest = datetime.now(timezone.utc) - timedelta(days=days_back)
+        df = df[df['created_at'] >= oldest]
+    return apply_schema(df, columns).reset_index(drop=True)
@@ -0,0 +1,124 @@
+# Warm-start Worker: keeps pandas, TextBlob, tweepy and the lexicon loaded between Power BI refreshes
+#
+#   python warm_worker.py                 start the worker (leave it running)
+#
+# and in the Power BI script, instead of running the scraper in-process:
+#
+#   from warm_worker import request_dataset
+#   dataset = request_dataset("tweepy_scrapper_v2.py")
+#
+# Only the standard library is imported here at module level, so the client
+# side costs a socket round trip plus unpickling the DataFrame.
+
+import os
+import secrets
+import sys
+import time
+
+# ========================================================================
+# CONFIGURATION
+# ========================================================================
+
+WARM_WORKER_ADDRESS = ("127.0.0.1", 47613)
+AUTHKEY_PATH = os.path.join(os.path.expanduser("~"), ".tweet_sentiment_worker.key")
+PRELOAD_ENGINES = ("textblob", "lexicon")
+REQUEST_TIMEOUT = 600  # Seconds a client waits for a refresh before giving up
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+
+# ========================================================================
+# AUTH
+# ========================================================================
+
+def _read_authkey():
+    with open(AUTHKEY_PATH, 'rb') as f:
+        return f.read()
+
+def _create_authkey():
+    """New random key shared with clients through a user-only file"""
+    key = secrets.token_hex(32).encode('ascii')
+    fd = os.open(AUTHKEY_PATH, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(key)
+    return key
+
+# ========================================================================
+# WORKER
+# ========================================================================
+
+def _script_path(script):
+    return script if os.path.isabs(script) else os.path.join(_HERE, script)
+
+def run_script(script):
+    """Run a scraper script in this process and return its `dataset`"""
+    import runpy
+    return runpy.run_path(_script_path(script), run_name="__warm_worker__")['dataset']
+
+def warm_up():
+    """Import the heavy modules and load every analyzer once"""
+    import pandas  # noqa: F401
+    import tweepy  # noqa: F401
+    from sentiment_engine import preload
+    for engine in PRELOAD_ENGINES:
+        preload(engine).join()
+
+def serve(address=WARM_WORKER_ADDRESS):
+    """Answer dataset requests one at a time until interrupted"""
+    from multiprocessing.connection import Listener
+    import traceback
+
+    sys.path.insert(0, _HERE)
+    start = time.perf_counter()
+    warm_up()
+    print(f"Warm worker ready on {address[0]}:{address[1]} "
+          f"(warm-up {time.perf_counter() - start:.1f}s)")
+
+    with Listener(address, authkey=_create_authkey()) as listener:
+        while True:
+            try:
+                conn = listener.accept()
+            except KeyboardInterrupt:
+                break
+            except Exception as e:  # failed handshake, e.g. wrong key
+                print(f"Rejected connection: {e}")
+                continue
+            with conn:
+                try:
+                    script = conn.recv()
+                    start = time.perf_counter()
+                    conn.send(('ok', run_script(script)))
+                    print(f"Served {script} in {time.perf_counter() - start:.2f}s")
+                except (EOFError, ConnectionError):
+                    pass
+                except Exception:
+                    conn.send(('error', traceback.format_exc()))
+
+# ========================================================================
+# CLIENT
+# ========================================================================
+
+def request_dataset(script="tweepy_scrapper_v2.py", fallback=True, timeout=REQUEST_TIMEOUT):
+    """
+    Ask the running worker to refresh `script` and return its dataset.
+
+    If no worker is running (or it cannot be reached), the script runs in
+    this process instead when `fallback` is True.
+    """
+    from multiprocessing.connection import Client
+    try:
+        conn = Client(WARM_WORKER_ADDRESS, authkey=_read_authkey())
+    except (OSError, EOFError):
+        if not fallback:
+            raise
+        return run_script(script)
+    with conn:
+        conn.send(script)
+        if not conn.poll(timeout):
+            raise TimeoutError(f"Warm worker did not answer within {timeout}s")
+        status, payload = conn.recv()
+    if status != 'ok':
+        raise RuntimeError(f"Warm worker failed to run {script}:\n{payload}")
+    return payload
+
+if __name__ == "__main__":
+    serve()